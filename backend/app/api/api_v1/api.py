@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .endpoints import auth, organizations, users, valuesets, wallets
+from .endpoints import auth, organizations, profiles, users, valuesets, wallets
 
 api_v1_router = APIRouter()
 api_v1_router.include_router(auth.router, prefix="/auth", tags=["Auth"])
@@ -10,3 +10,4 @@ api_v1_router.include_router(
     organizations.router, prefix="/organizations", tags=["Corporates"]
 )
 api_v1_router.include_router(wallets.router, prefix="/wallets", tags=["Wallets"])
+api_v1_router.include_router(profiles.router, prefix="/profiles", tags=["Profiles"])
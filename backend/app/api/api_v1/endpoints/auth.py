@@ -6,9 +6,10 @@ from app import crud, models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
+from app.core.rate_limit import RateLimit, get_client_ip, rate_limit
 from app.exceptions import ErrorCode, get_api_error_message
-from app.utils import parse_mobile_number
-from fastapi import APIRouter, Depends, HTTPException
+from app.utils import ModeOfMessageDelivery, parse_mobile_number
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -19,6 +20,7 @@ logger = getLogger(__name__)
 
 @router.post("/login/access-token", response_model=schemas.Token)
 async def login_access_token(
+    request: Request,
     db: AsyncSession = Depends(deps.get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
@@ -26,6 +28,20 @@ async def login_access_token(
     OAuth2 compatible token login, get an access token for future requests.
     Authentication is done via the user's mobile and their pin
     """
+    client_ip = get_client_ip(request)
+    # guesses at a user's password are limited per client, so that nobody can lock
+    # a user out of their account by failing to log in as them
+    await rate_limit(
+        "login",
+        [
+            ("ip", client_ip, RateLimit(*settings.LOGIN_RATE_LIMIT_PER_IP)),
+            (
+                "user",
+                f"{client_ip}:{form_data.username}",
+                RateLimit(*settings.LOGIN_RATE_LIMIT_PER_USER),
+            ),
+        ],
+    )
     user = await crud.user.authenticate(
         db,
         mobile=form_data.username,
@@ -55,14 +71,28 @@ async def login_access_token(
     }
 
 
+def get_otp_destination(
+    user: models.User, mode: Optional[ModeOfMessageDelivery]
+) -> Optional[str]:
+    """Returns the address an OTP sent in `mode` is delivered to"""
+    if mode == ModeOfMessageDelivery.EMAIL:
+        return user.email and user.email.lower()
+    return user.mobile
+
+
 @router.post(
     "/generate-otp",
 )
 async def generate_otp(
+    request: Request,
     otp_in: models.OTPCreate,
     db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """Generates an OTP for 2FA, user verification, password reset, etc."""
+    await rate_limit(
+        "otp",
+        [("ip", get_client_ip(request), RateLimit(*settings.OTP_RATE_LIMIT_PER_IP))],
+    )
     try:
         user = await crud.user.get_by_email(db, email=otp_in.email)
         if not user:
@@ -71,6 +101,18 @@ async def generate_otp(
                 status_code=400,
                 detail=get_api_error_message(error_code=ErrorCode.USER_NOT_FOUND),
             )
+        # the OTP is sent to the mobile or email of the user, depending on the mode
+        await rate_limit(
+            "otp",
+            [
+                ("user", str(user.uuid), RateLimit(*settings.OTP_RATE_LIMIT_PER_USER)),
+                (
+                    "destination",
+                    get_otp_destination(user, otp_in.mode),
+                    RateLimit(*settings.OTP_RATE_LIMIT_PER_DESTINATION),
+                ),
+            ],
+        )
         otp = await crud.otp.create_with_owner(
             db=db,
             obj_in=otp_in,
@@ -83,6 +125,8 @@ async def generate_otp(
             "success": client_response.is_sent,
             "message": client_response.message,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     return response
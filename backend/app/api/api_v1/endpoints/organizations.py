@@ -1,14 +1,30 @@
+import csv
 import datetime
-from typing import Any
+import io
+import uuid as uuid_pkg
+from typing import Any, Optional
 
 from app import crud, models
 from app.api import deps
-from app.core import security
-from app.core.config import OAuthScopeType
-from app.middleware.pagination import JsonApiPage
+from app.core import response_cache, security
+from app.core.celery_app import celery_app
+from app.core.config import OAuthScopeType, settings
+from app.core.responses import etag_matches, make_etag, not_modified, trusted_response
+from app.middleware.pagination import JsonApiPage, paginate_trusted
 from app.session import engine
-from fastapi import APIRouter, Body, Depends, HTTPException, Security
-from fastapi_pagination import paginate
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Request,
+    Response,
+    Security,
+    UploadFile,
+    status,
+)
 from pydantic.networks import EmailStr
 from sqlalchemy.orm import Session
 from sqlmodel import select
@@ -18,6 +34,7 @@ router = APIRouter()
 
 @router.get("/", response_model=JsonApiPage[models.OrganizationRead])
 async def read_organizations(
+    request: Request,
     db: Session = Depends(deps.get_async_db),
     offset: int = 0,
     limit: int = 100,
@@ -28,12 +45,22 @@ async def read_organizations(
 ) -> Any:
     """
     Retrieves a list of organizations owned by the user.
-    In future versions, this will also include organizations the user can administrate
+    In future versions, this will also include organizations the user can administrate.
+    Responses are cached per user until their organizations change
     """
-    organizations = await crud.organization.get_multi(
-        db=db, limit=limit, skip=offset, owner_id=current_user.uuid
+
+    async def render():
+        organizations = await crud.organization.get_multi(
+            db=db, limit=limit, skip=offset, owner_id=current_user.uuid
+        )
+        return paginate_trusted(organizations, models.OrganizationRead)
+
+    return await response_cache.cached_response(
+        request,
+        user_id=current_user.uuid,
+        tags=[response_cache.organizations_tag(current_user.uuid)],
+        render=render,
     )
-    return paginate(organizations)
 
 
 @router.post("/", response_model=models.OrganizationRead)
@@ -71,14 +98,18 @@ async def update_organization(
     )
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
-    organization = await crud.organization.update(
-        db=db, db_obj=organization, obj_in=organization_in
-    )
+    try:
+        organization = await crud.organization.update(
+            db=db, db_obj=organization, obj_in=organization_in
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
     return organization
 
 
 @router.get("/{organization_id}", response_model=models.OrganizationRead)
 async def read_organization_by_id(
+    request: Request,
     organization_id: str,
     current_user: models.User = Security(
         deps.get_current_active_user,
@@ -87,8 +118,16 @@ async def read_organization_by_id(
     db: Session = Depends(deps.get_async_db),
 ) -> Any:
     """
-    Get a specific organization by id
+    Get a specific organization by id. Answers `304 Not Modified` when the
+    `If-None-Match` header matches the organization's current `ETag`
     """
+    version = await crud.organization.get_version(
+        db, organization_id, owner_id=current_user.uuid
+    )
+    if version:
+        etag = make_etag(version.uuid, version.updated_at)
+        if etag_matches(request, etag):
+            return not_modified(etag)
     organization = await crud.organization.get(
         db=db, uuid=organization_id, owner_id=current_user.uuid
     )
@@ -100,4 +139,245 @@ async def read_organization_by_id(
         organization.owner_id != current_user.uuid
     ):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    return organization
+    return trusted_response(
+        organization,
+        models.OrganizationRead,
+        headers={"ETag": make_etag(organization.uuid, organization.updated_at)},
+    )
+
+
+async def enroll_employees(
+    db: Session,
+    organization_id: str,
+    enrollment_in: models.EmployeeEnrollmentCreate,
+    current_user: models.User,
+) -> Response:
+    """Enrolls small enrollments within the request and queues larger ones"""
+    organization = await crud.organization.get(
+        db=db,
+        uuid=organization_id,
+        owner_id=None if crud.user.is_superuser(current_user) else current_user.uuid,
+    )
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    try:
+        enrollment = await crud.employee_enrollment.create(
+            db=db,
+            obj_in=enrollment_in,
+            organization=organization,
+            current_user=current_user,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    if enrollment.total_rows > settings.EMPLOYEE_ENROLLMENT_SYNC_LIMIT:
+        celery_app.send_task("app.worker.enroll_employees", args=[str(enrollment.uuid)])
+        return trusted_response(
+            enrollment,
+            models.EmployeeEnrollmentRead,
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+    enrollment = await crud.employee_enrollment.run(db=db, enrollment=enrollment)
+    return trusted_response(
+        enrollment, models.EmployeeEnrollmentRead, status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.post(
+    "/{organization_id}/enrollments",
+    response_model=models.EmployeeEnrollmentRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_employee_enrollment(
+    *,
+    db: Session = Depends(deps.get_async_db),
+    organization_id: str,
+    enrollment_in: models.EmployeeEnrollmentCreate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Enrolls employees into the organization: creates a user for every employee
+    without one and an organization managed wallet for every employee without one.
+    Returns the outcome of every row. Enrollments of more than
+    `EMPLOYEE_ENROLLMENT_SYNC_LIMIT` employees run in the background (202 Accepted)
+    and can be followed with `GET /{organization_id}/enrollments/{enrollment_id}`
+    """
+    return await enroll_employees(db, organization_id, enrollment_in, current_user)
+
+
+@router.post(
+    "/{organization_id}/enrollments/csv",
+    response_model=models.EmployeeEnrollmentRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_employee_enrollment(
+    *,
+    db: Session = Depends(deps.get_async_db),
+    organization_id: str,
+    file: UploadFile = File(
+        ...,
+        description="CSV file with a header row naming the fields of"
+        + " `EmployeeEnrollmentRow`",
+    ),
+    policy_id: Optional[uuid_pkg.UUID] = Form(None),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Enrolls the employees listed in a CSV file into the organization.
+    See `POST /{organization_id}/enrollments`
+    """
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+        enrollment_in = models.EmployeeEnrollmentCreate(
+            policy_id=policy_id, employees=list(csv.DictReader(io.StringIO(content)))
+        )
+    except (UnicodeDecodeError, csv.Error, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV file: {e}")
+    return await enroll_employees(db, organization_id, enrollment_in, current_user)
+
+
+@router.get(
+    "/{organization_id}/enrollments/{enrollment_id}",
+    response_model=models.EmployeeEnrollmentRead,
+)
+async def read_employee_enrollment(
+    organization_id: str,
+    enrollment_id: str,
+    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(deps.get_async_db),
+) -> Any:
+    """
+    Get the progress and report of an employee enrollment
+    """
+    organization = await crud.organization.get(
+        db=db,
+        uuid=organization_id,
+        owner_id=None if crud.user.is_superuser(current_user) else current_user.uuid,
+    )
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    enrollment = await crud.employee_enrollment.get(
+        db=db, uuid=enrollment_id, organization_id=organization.uuid
+    )
+    if not enrollment:
+        raise HTTPException(status_code=404, detail="Enrollment not found")
+    return trusted_response(enrollment, models.EmployeeEnrollmentRead)
+
+
+@router.post(
+    "/{organization_id}/policies/{policy_id}/apply",
+    response_model=models.WalletPolicyApplyRead,
+)
+async def apply_policy_to_wallets(
+    *,
+    db: Session = Depends(deps.get_async_db),
+    organization_id: str,
+    policy_id: str,
+    wallet_filter: models.WalletPolicyApply = Body(None),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Applies a policy to the organization's wallets selected by the filter (every
+    wallet of the organization by default). Returns the number of wallets selected,
+    updated, and skipped for having a different currency than the policy or for
+    being locked by other writers
+    """
+    organization = await crud.organization.get(
+        db=db,
+        uuid=organization_id,
+        owner_id=None if crud.user.is_superuser(current_user) else current_user.uuid,
+    )
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    policy = await crud.wallet_policy.get(
+        db=db, uuid=policy_id, managing_organization_id=organization.uuid
+    )
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    try:
+        return await crud.wallet.apply_policy_bulk(
+            db=db, policy_obj=policy, wallet_filter=wallet_filter
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+
+
+@router.put(
+    "/{organization_id}/policies/{policy_id}",
+    response_model=models.WalletPolicyPropagationRead,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def update_policy(
+    *,
+    db: Session = Depends(deps.get_async_db),
+    organization_id: str,
+    policy_id: str,
+    policy_in: models.WalletPolicyUpdate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Updates a policy. The new terms are copied onto the wallets the policy is
+    applied to in the background. Returns the propagation to the wallets, whose
+    progress can be followed with
+    `GET /{organization_id}/policies/{policy_id}/propagations/{propagation_id}`
+    """
+    organization = await crud.organization.get(
+        db=db,
+        uuid=organization_id,
+        owner_id=None if crud.user.is_superuser(current_user) else current_user.uuid,
+    )
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    policy = await crud.wallet_policy.get(
+        db=db, uuid=policy_id, managing_organization_id=organization.uuid
+    )
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    try:
+        propagation = await crud.wallet_policy_propagation.update_policy(
+            db=db, policy_obj=policy, obj_in=policy_in
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    # sent once the propagation is committed, so the worker always finds it
+    celery_app.send_task(
+        "app.worker.propagate_wallet_policy", args=[str(propagation.uuid)]
+    )
+    return trusted_response(
+        propagation,
+        models.WalletPolicyPropagationRead,
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@router.get(
+    "/{organization_id}/policies/{policy_id}/propagations/{propagation_id}",
+    response_model=models.WalletPolicyPropagationRead,
+)
+async def read_policy_propagation(
+    organization_id: str,
+    policy_id: str,
+    propagation_id: str,
+    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(deps.get_async_db),
+) -> Any:
+    """
+    Get the progress of the propagation of a policy's terms to its wallets
+    """
+    organization = await crud.organization.get(
+        db=db,
+        uuid=organization_id,
+        owner_id=None if crud.user.is_superuser(current_user) else current_user.uuid,
+    )
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    policy = await crud.wallet_policy.get(
+        db=db, uuid=policy_id, managing_organization_id=organization.uuid
+    )
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    propagation = await crud.wallet_policy_propagation.get(
+        db=db, uuid=propagation_id, policy_id=policy.uuid
+    )
+    if not propagation:
+        raise HTTPException(status_code=404, detail="Propagation not found")
+    return trusted_response(propagation, models.WalletPolicyPropagationRead)
@@ -0,0 +1,51 @@
+import datetime
+from typing import Any, List
+
+from app import models, schemas
+from app.api import deps
+from app.core.config import OAuthScopeType
+from app.core.profiling import get_profile_store
+from fastapi import APIRouter, HTTPException, Security
+from fastapi.responses import FileResponse
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[schemas.RequestProfileFile])
+def read_profiles(
+    current_user: models.User = Security(
+        deps.get_current_active_superuser, scopes=[OAuthScopeType.READ_PROFILES]
+    ),
+) -> Any:
+    """
+    Retrieves the CPU profiles of slow (or sampled) requests, newest first
+    """
+    profiles = []
+    for path in get_profile_store().list():
+        stat = path.stat()
+        profiles.append(
+            schemas.RequestProfileFile(
+                name=path.name,
+                size=stat.st_size,
+                created_at=datetime.datetime.fromtimestamp(
+                    stat.st_mtime, tz=datetime.timezone.utc
+                ),
+            )
+        )
+    return profiles
+
+
+@router.get("/{name}", response_class=FileResponse)
+def read_profile(
+    name: str,
+    current_user: models.User = Security(
+        deps.get_current_active_superuser, scopes=[OAuthScopeType.READ_PROFILES]
+    ),
+) -> Any:
+    """
+    Downloads a CPU profile: its wall clock and CPU samples as folded stacks
+    """
+    path = get_profile_store().get(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
@@ -5,9 +5,10 @@ from app import crud, models
 from app.api import deps
 from app.core import security
 from app.core.config import OAuthScopeType
+from app.core.responses import etag_matches, make_etag, not_modified, trusted_response
 from app.middleware.pagination import JsonApiPage
 from app.session import engine
-from fastapi import APIRouter, Body, Depends, HTTPException, Security
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response, Security
 from fastapi_pagination import paginate
 from pydantic.networks import EmailStr
 from sqlalchemy.orm import Session
@@ -50,14 +51,21 @@ async def update_user(
 
 @router.get("/me", response_model=models.UserRead)
 def read_user_me(
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Security(
         deps.get_current_active_user, scopes=[OAuthScopeType.READ_CURRENT_USER]
     ),
 ) -> Any:
     """
-    Get current user.
+    Get current user. Answers `304 Not Modified` when the `If-None-Match` header
+    matches the user's current `ETag`
     """
+    etag = make_etag(current_user.uuid, current_user.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return current_user
 
 
@@ -135,6 +143,6 @@ async def read_user_by_id(
     user = await crud.user.get(db=db, uuid=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not crud.user.is_superuser(current_user) and (user.user_id != current_user.id):
+    if not crud.user.is_superuser(current_user) and (user.uuid != current_user.uuid):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    return user
+    return trusted_response(user, models.UserRead)
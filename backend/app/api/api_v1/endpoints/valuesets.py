@@ -1,7 +1,6 @@
 import datetime
 from typing import Any, Optional
 
-import pycountry
 from app import schemas, utils
 from fastapi import APIRouter, HTTPException
 
@@ -25,6 +24,8 @@ def read_countries() -> Any:
     """
     Retrieves a list of countries
     """
+    import pycountry
+
     return schemas.GenericValueset(
         name="Countries", choices=[country.name for country in pycountry.countries]
     )
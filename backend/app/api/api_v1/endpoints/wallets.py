@@ -4,12 +4,12 @@ from typing import Any, Optional
 
 from app import crud, models
 from app.api import deps
-from app.core import security
+from app.core import response_cache, security
 from app.core.config import OAuthScopeType
-from app.middleware.pagination import JsonApiPage
+from app.core.responses import etag_matches, make_etag, not_modified, trusted_response
+from app.middleware.pagination import JsonApiPage, paginate_trusted
 from app.session import engine
-from fastapi import APIRouter, Body, Depends, HTTPException, Security
-from fastapi_pagination import paginate
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Security
 from pydantic.networks import EmailStr
 from sqlalchemy.orm import Session
 from sqlmodel import select
@@ -19,6 +19,7 @@ router = APIRouter()
 
 @router.get("/", response_model=JsonApiPage[models.WalletRead])
 async def read_wallets(
+    request: Request,
     db: Session = Depends(deps.get_async_db),
     offset: int = 0,
     limit: int = 100,
@@ -29,20 +30,31 @@ async def read_wallets(
     managing_organization_id: Optional[uuid_pkg.UUID] = None,
 ) -> Any:
     """
-    Retrieves a list of wallets
+    Retrieves a list of wallets. Responses are cached per user until their wallets
+    change
     """
-    wallets = await crud.wallet.get_multi(
-        db=db,
-        limit=limit,
-        skip=offset,
-        managing_organization_id=managing_organization_id,
-        owner_id=current_user.uuid,
+
+    async def render():
+        wallets = await crud.wallet.get_multi(
+            db=db,
+            limit=limit,
+            skip=offset,
+            managing_organization_id=managing_organization_id,
+            owner_id=current_user.uuid,
+        )
+        return paginate_trusted(wallets, models.WalletRead)
+
+    return await response_cache.cached_response(
+        request,
+        user_id=current_user.uuid,
+        tags=[response_cache.wallets_tag(current_user.uuid)],
+        render=render,
     )
-    return paginate(wallets)
 
 
 @router.get("/{wallet_id}", response_model=models.WalletRead)
 async def read_wallet_by_id(
+    request: Request,
     wallet_id: str,
     current_user: models.User = Security(
         deps.get_current_active_user,
@@ -51,13 +63,48 @@ async def read_wallet_by_id(
     db: Session = Depends(deps.get_async_db),
 ) -> Any:
     """
-    Get a specific wallet by id
+    Get a specific wallet by id. Answers `304 Not Modified` when the `If-None-Match`
+    header matches the wallet's current `ETag`
+    """
+    version = await crud.wallet.get_version(db, wallet_id, models.Wallet.owner_id)
+    if version and (
+        crud.user.is_superuser(current_user) or version.owner_id == current_user.uuid
+    ):
+        etag = make_etag(version.uuid, version.updated_at)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    wallet = await crud.wallet.get(db=db, uuid=wallet_id)
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    if not crud.user.is_superuser(current_user) and (
+        wallet.owner_id != current_user.uuid
+    ):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return trusted_response(
+        wallet,
+        models.WalletRead,
+        headers={"ETag": make_etag(wallet.uuid, wallet.updated_at)},
+    )
+
+
+@router.get("/{wallet_id}/balance", response_model=models.WalletBalanceRead)
+async def read_wallet_balance(
+    wallet_id: uuid_pkg.UUID,
+    as_of: Optional[datetime.datetime] = None,
+    current_user: models.User = Security(
+        deps.get_current_active_user,
+        scopes=[OAuthScopeType.READ_CURRENT_USER],
+    ),
+    db: Session = Depends(deps.get_async_db),
+) -> Any:
+    """
+    Get the balance of a wallet, currently or as of a point in time
     """
     wallet = await crud.wallet.get(db=db, uuid=wallet_id)
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
-    if not crud.wallet.is_superuser(current_user) and (
-        wallet.wallet_id != current_user.id
+    if not crud.user.is_superuser(current_user) and (
+        wallet.owner_id != current_user.uuid
     ):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    return wallet
+    return await crud.wallet_balance.get_balance(db, wallet=wallet, as_of=as_of)
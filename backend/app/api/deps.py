@@ -3,10 +3,10 @@ from typing import Annotated, Generator
 from app import crud, models, schemas
 from app.core import security
 from app.core.config import OAuth2Scopes, OAuthScopeType, settings
+from app.core.tracing import traced
 from app.session import AsyncSessionLocal, SessionLocal
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
-from jose import jwt
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
@@ -33,12 +33,15 @@ async def get_async_db() -> AsyncSession:
             await db.close()
 
 
+@traced("deps.get_current_user")
 async def get_current_user(
     *,
     db: Session = Depends(get_async_db),
     token: str = Depends(reusable_oauth2),
     security_scopes: SecurityScopes,
 ) -> models.User:
+    from jose import jwt
+
     authenticate_value = (
         f'Bearer scope="{security_scopes.scope_str}"'
         if security_scopes.scope_str
@@ -0,0 +1,100 @@
+"""The :mod:`app.core.cache` module contains the key-value clients shared by the OTP
+store, the response cache and the rate limiter
+
+Redis is used in production. `TTLCache` implements, in process, the subset of the Redis
+client they use, for tests and development (and single worker deployments).
+"""
+# Author: Christopher Dare
+
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    from redis import asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover
+    aioredis = None
+    RedisError = None
+
+# errors raised while the key-value backend is unavailable, e.g. Redis is down
+BACKEND_ERRORS = (OSError, asyncio.TimeoutError) + ((RedisError,) if RedisError else ())
+
+
+class TTLCache:
+    """An in-process key-value store implementing the subset of the Redis client
+    used by the OTP store and the response cache. Keys expire lazily, when they are
+    next read; beyond `max_keys`, expired and then the oldest keys are evicted.
+
+    Keys are kept in the order they were set, and their expiry times in a heap, so
+    evicting a key costs O(log n) rather than a scan of every key. The heap keeps
+    the expiry times of keys since overwritten or deleted: they are skipped when
+    popped, and dropped when there are more than twice `max_keys` of them.
+    """
+
+    def __init__(
+        self, clock: Callable[[], float] = time.monotonic, max_keys: int = None
+    ):
+        self.clock = clock
+        self.max_keys = max_keys
+        self.data: Dict[str, Tuple[float, Any]] = OrderedDict()
+        self.expiries: List[Tuple[float, str]] = []
+
+    async def get(self, name: str) -> Optional[Any]:
+        expires_at, value = self.data.get(name, (0, None))
+        if expires_at <= self.clock():
+            self.data.pop(name, None)
+            return None
+        return value
+
+    async def mget(self, names: List[str]) -> List[Optional[Any]]:
+        return [await self.get(name) for name in names]
+
+    async def set(self, name: str, value: Any, ex: int) -> bool:
+        expires_at = self.clock() + ex
+        self.data[name] = (expires_at, value)
+        # set again, a key moves to the end of the order
+        self.data.move_to_end(name)
+        if self.max_keys:
+            heapq.heappush(self.expiries, (expires_at, name))
+            if len(self.data) > self.max_keys or len(self.expiries) > 2 * self.max_keys:
+                self.evict()
+        return True
+
+    async def delete(self, *names: str) -> int:
+        now = self.clock()
+        deleted = 0
+        for name in names:
+            expires_at, _ = self.data.pop(name, (0, None))
+            deleted += expires_at > now
+        return deleted
+
+    def evict(self) -> None:
+        """Evicts the expired keys, then the oldest keys, down to `max_keys`, and
+        drops the stale expiry times"""
+        now = self.clock()
+        while self.expiries and self.expiries[0][0] <= now:
+            expires_at, name = heapq.heappop(self.expiries)
+            if self.data.get(name, (None,))[0] == expires_at:
+                del self.data[name]
+        while len(self.data) > self.max_keys:
+            self.data.popitem(last=False)
+        if len(self.expiries) > 2 * len(self.data):
+            self.expiries = [(at, name) for name, (at, _) in self.data.items()]
+            heapq.heapify(self.expiries)
+
+
+@lru_cache(maxsize=None)
+def get_key_value_client(backend: str) -> Any:
+    """Returns the client of a key-value backend ("memory" or "redis"), shared by
+    requests"""
+    if backend == "memory":
+        return TTLCache()
+    if aioredis is None:
+        raise ImportError("The redis package is required by the redis backend")
+    return aioredis.from_url(settings.REDIS_URL)
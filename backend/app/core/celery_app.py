@@ -1,5 +1,34 @@
+from app.core.config import settings
 from celery import Celery
 
 celery_app = Celery("worker", broker="amqp://guest@queue//")
 
-celery_app.conf.task_routes = {"app.worker.test_celery": "main-queue"}
+celery_app.conf.task_routes = {
+    "app.worker.test_celery": "main-queue",
+    "app.worker.compact_wallet_balances": "main-queue",
+    "app.worker.reconcile_wallet_accumulators": "main-queue",
+    "app.worker.maintain_otp_partitions": "main-queue",
+    "app.worker.enroll_employees": "main-queue",
+    "app.worker.propagate_wallet_policy": "main-queue",
+    "app.worker.resume_wallet_policy_propagations": "main-queue",
+    "app.worker.propagate_user_details": "main-queue",
+    "app.worker.propagate_organization_name": "main-queue",
+}
+celery_app.conf.beat_schedule = {
+    "compact-wallet-balances": {
+        "task": "app.worker.compact_wallet_balances",
+        "schedule": settings.WALLET_SNAPSHOT_INTERVAL_SECONDS,
+    },
+    "reconcile-wallet-accumulators": {
+        "task": "app.worker.reconcile_wallet_accumulators",
+        "schedule": settings.WALLET_ACCUMULATOR_RECONCILE_INTERVAL_SECONDS,
+    },
+    "maintain-otp-partitions": {
+        "task": "app.worker.maintain_otp_partitions",
+        "schedule": settings.OTP_PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+    },
+    "resume-wallet-policy-propagations": {
+        "task": "app.worker.resume_wallet_policy_propagations",
+        "schedule": settings.WALLET_POLICY_PROPAGATION_STALE_SECONDS,
+    },
+}
@@ -1,7 +1,7 @@
 import enum
 import secrets
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
 
@@ -13,6 +13,71 @@ class Settings(BaseSettings):
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     OTP_EXPIRE_MINUTES: int = 15
+    # where OTPs are kept until they are used or expire. One of "postgres", "redis"
+    # or "memory" (a per-process store for tests and development)
+    OTP_STORE_BACKEND: str = "postgres"
+    REDIS_URL: str = "redis://redis:6379/0"
+    # token bucket rate limits of the OTP and login routes, as (burst, requests
+    # refilled per minute), per client IP and per OTP user and destination or per
+    # client IP and login user. Buckets are shared by the workers through "redis";
+    # "memory" keeps them per process, which multiplies the limits by the number of
+    # workers (for development and tests). While the backend is unavailable,
+    # requests are let through (fail open) or answered with a 503
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "redis"
+    RATE_LIMIT_FAIL_OPEN: bool = True
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    OTP_RATE_LIMIT_PER_IP: Tuple[int, float] = (20, 10)
+    OTP_RATE_LIMIT_PER_USER: Tuple[int, float] = (5, 2)
+    OTP_RATE_LIMIT_PER_DESTINATION: Tuple[int, float] = (3, 1)
+    LOGIN_RATE_LIMIT_PER_IP: Tuple[int, float] = (30, 20)
+    LOGIN_RATE_LIMIT_PER_USER: Tuple[int, float] = (10, 5)
+    # proxies (addresses or networks) whose X-Forwarded-For entries are trusted to
+    # find the client IP, e.g. Traefik on the private Docker network
+    TRUSTED_PROXIES: List[str] = [
+        "127.0.0.1/32",
+        "10.0.0.0/8",
+        "172.16.0.0/12",
+        "192.168.0.0/16",
+    ]
+
+    @validator("RATE_LIMIT_BACKEND")
+    def validate_rate_limit_backend(cls, v: str) -> str:
+        if v not in ("memory", "redis"):
+            raise ValueError(f"Unsupported rate limit backend {v}")
+        return v
+
+    # per-user cache of the wallet and organization list responses, shared by the
+    # workers through "redis". Writes invalidate the cached responses of the users
+    # they affect; responses otherwise expire after this many seconds. "memory"
+    # keeps them per process, where the invalidations of other workers and of
+    # Celery tasks never arrive (for development and tests)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "redis"
+    RESPONSE_CACHE_EXPIRE_SECONDS: int = 60
+    RESPONSE_CACHE_MAX_KEYS: int = 10_000
+
+    @validator("RESPONSE_CACHE_BACKEND")
+    def validate_response_cache_backend(cls, v: str) -> str:
+        if v not in ("memory", "redis"):
+            raise ValueError(f"Unsupported response cache backend {v}")
+        return v
+
+    # the otp table is partitioned by day. Partitions are created this many days
+    # ahead, and dropped once every OTP in them is this many days old
+    OTP_PARTITIONS_AHEAD_DAYS: int = 7
+    OTP_RETENTION_DAYS: int = 7
+    OTP_PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 60 * 60
+    # how long creating or dropping a partition waits for the otp table lock before
+    # giving up (until the next run), so it never queues in front of OTP lookups
+    OTP_PARTITION_LOCK_TIMEOUT_MS: int = 2000
+
+    @validator("OTP_STORE_BACKEND")
+    def validate_otp_store_backend(cls, v: str) -> str:
+        if v not in ("postgres", "redis", "memory"):
+            raise ValueError(f"Unsupported OTP store backend {v}")
+        return v
+
     SERVER_NAME: str = "serenity.health"
     SERVER_HOST: AnyHttpUrl = "http://api.serenity.health"
     CLIENT_APP_HOST: Optional[AnyHttpUrl] = "https://app.serenity.health"
@@ -24,6 +89,87 @@ class Settings(BaseSettings):
     # "http://localhost:8080", "http://local.dockertoolbox.tiangolo.com"]'
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
     DEFAULT_TRANSACTION_FEE: Decimal = Decimal("0.05")
+    # a wallet gets a new balance snapshot once this many ledger entries have been
+    # posted since its last one, bounding the entries summed on a balance read
+    WALLET_SNAPSHOT_MIN_ENTRIES: int = 100
+    # wallets scanned per transaction by the snapshot compaction job
+    WALLET_SNAPSHOT_BATCH_SIZE: int = 1000
+    WALLET_SNAPSHOT_INTERVAL_SECONDS: int = 300
+    # month (1-12) plan years start on. Deductibles and out-of-pocket limits reset
+    # at the start of every plan year
+    PLAN_YEAR_START_MONTH: int = 1
+    # wallets locked per transaction by the accumulator reconciliation job
+    WALLET_ACCUMULATOR_BATCH_SIZE: int = 1000
+    WALLET_ACCUMULATOR_RECONCILE_INTERVAL_SECONDS: int = 60 * 60 * 24
+    # wallets updated per statement when a policy is applied to many wallets
+    WALLET_POLICY_BATCH_SIZE: int = 1000
+    # how long a chunk of background wallet updates (policy changes, refreshed owner
+    # and organization names) waits for wallet row locks before giving up, so they
+    # never queue behind (or block) payments
+    WALLET_POLICY_LOCK_TIMEOUT_MS: int = 2000
+    WALLET_POLICY_PROPAGATION_MAX_RETRIES: int = 10
+    # propagations still pending this long after they were recorded (e.g. their task
+    # could not be sent) are sent again, by a job run at the same interval
+    WALLET_POLICY_PROPAGATION_STALE_SECONDS: int = 300
+    # wallets refreshed per transaction when a user or organization they copy a name
+    # or mobile number from changes it
+    DENORMALIZED_FIELDS_BATCH_SIZE: int = 1000
+    DENORMALIZED_FIELDS_MAX_RETRIES: int = 10
+    # employees validated and inserted per transaction by bulk enrollments
+    EMPLOYEE_ENROLLMENT_BATCH_SIZE: int = 1000
+    # bulk enrollments with more employees than this run as a background job
+    EMPLOYEE_ENROLLMENT_SYNC_LIMIT: int = 1000
+
+    @validator("PLAN_YEAR_START_MONTH")
+    def validate_plan_year_start_month(cls, v: int) -> int:
+        if not 1 <= v <= 12:
+            raise ValueError("Plan years must start on a month from 1 to 12")
+        return v
+
+    # JSON library used to render API responses. One of "orjson" or "json"
+    JSON_RESPONSE_BACKEND: str = "orjson"
+
+    @validator("JSON_RESPONSE_BACKEND")
+    def validate_json_response_backend(cls, v: str) -> str:
+        if v not in ("orjson", "json"):
+            raise ValueError(f"Unsupported JSON response backend {v}")
+        return v
+
+    # SQL statements are counted and timed per request. Requests running more than
+    # SQL_QUERY_BUDGET statements, or the same statement more than
+    # SQL_REPEATED_STATEMENT_LIMIT times (an N+1), are ignored ("off"), logged
+    # ("warn") or failed ("raise", for development and tests)
+    SQL_QUERY_BUDGET_MODE: str = "off"
+    SQL_QUERY_BUDGET: int = 25
+    SQL_REPEATED_STATEMENT_LIMIT: int = 5
+    # statements slower than this are logged with the route which ran them
+    SQL_SLOW_STATEMENT_SECONDS: float = 0.5
+
+    # calls to outside providers (messaging, Paystack) time out after these many
+    # seconds, and are retried up to PROVIDER_MAX_RETRIES times when safe, backing
+    # off exponentially from PROVIDER_RETRY_BACKOFF_SECONDS
+    PROVIDER_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    PROVIDER_TIMEOUT_SECONDS: float = 10.0
+    PROVIDER_MAX_RETRIES: int = 2
+    PROVIDER_RETRY_BACKOFF_SECONDS: float = 0.2
+    # fraction of requests whose spans (see app.core.tracing) are logged as a trace
+    TRACE_SAMPLE_RATE: float = 0.0
+
+    # sampling CPU profiles of requests slower than PROFILE_SLOW_REQUEST_SECONDS, or
+    # of a PROFILE_SAMPLE_RATE fraction of them, taking a sample of the stacks every
+    # PROFILE_INTERVAL_SECONDS. The last PROFILE_MAX_FILES profiles are kept
+    PROFILING_ENABLED: bool = False
+    PROFILE_SLOW_REQUEST_SECONDS: float = 1.0
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_DIR: str = "/tmp/request-profiles"
+    PROFILE_MAX_FILES: int = 100
+
+    @validator("SQL_QUERY_BUDGET_MODE")
+    def validate_sql_query_budget_mode(cls, v: str) -> str:
+        if v not in ("off", "warn", "raise"):
+            raise ValueError(f"Unsupported SQL query budget mode {v}")
+        return v
 
     @validator("BACKEND_CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -127,6 +273,7 @@ class OAuthScopeType(str, enum.Enum):
     WRITE_ORGANIZATIONS_AS_ADMIN = "organizations_as_admin:write"
     READ_ORGANIZATIONS_AS_ADMIN = "organizations_as_admin:read"
     READ_WALLETS_AS_ADMIN = "wallets_as_admin:read"
+    READ_PROFILES = "profiles:read"
 
 
 settings = Settings()
@@ -147,4 +294,5 @@ OAuth2Scopes = {
         as an administrator",
     OAuthScopeType.READ_WALLETS_AS_ADMIN: "Read information about healthcare wallets \
         as an administrator",
+    OAuthScopeType.READ_PROFILES: "Read the CPU profiles of slow requests",
 }
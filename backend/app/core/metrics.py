@@ -0,0 +1,65 @@
+"""The :mod:`app.core.metrics` module exposes the Prometheus metrics of the API, summed
+over every worker process of the server
+
+Each gunicorn worker keeps its own metrics, so a scrape answered from the registry of
+one worker would only see that worker's requests. When `PROMETHEUS_MULTIPROC_DIR` is
+set (by `gunicorn_conf.py`), `prometheus_client` keeps the metrics of every worker in
+files in that directory instead, and `/metrics` aggregates them: counters and
+histograms are summed, gauges summed over live workers (`multiprocess_mode`). The
+gunicorn master empties the directory on start, and marks the gauges of workers that
+exit as dead, so workers restarted (e.g. by `max_requests`) are not counted twice.
+Without the variable (development, tests, Celery) metrics are served per process.
+"""
+# Author: Christopher Dare
+
+import os
+import shutil
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+MULTIPROC_DIR_VARIABLE = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def get_multiprocess_dir() -> Optional[str]:
+    return os.environ.get(MULTIPROC_DIR_VARIABLE)
+
+
+def get_registry() -> CollectorRegistry:
+    """Returns the registry of the metrics of every worker, read from their files,
+    or the metrics of this process when not running multiprocess"""
+    directory = get_multiprocess_dir()
+    if not directory:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=directory)
+    return registry
+
+
+def metrics(request: Request) -> Response:
+    """Serves the Prometheus metrics of the API"""
+    return Response(
+        generate_latest(get_registry()), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+def prepare_multiprocess_dir(directory: str) -> None:
+    """Empties (or creates) the metric files directory, before workers start, so
+    metrics of an earlier run of the server are not added to this one's"""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drops the live gauges of an exited worker. Its counters and histograms are
+    kept, as the requests it served did happen"""
+    if get_multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
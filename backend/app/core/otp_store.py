@@ -0,0 +1,216 @@
+"""The :mod:`app.core.otp_store` module contains the stores OTPs are kept in until
+they are used or expire
+
+OTPs are looked up by (user, token type, code). The Postgres store keeps them in the
+`otp` table; the key-value store keeps them under keys named after that triple, which
+expire with the OTP, in Redis (or any client with the same `get`/`set`/`delete`
+methods, such as the in-memory `app.core.cache.TTLCache` used in tests and
+development).
+"""
+# Author: Christopher Dare
+
+import abc
+import datetime
+import json
+import math
+import uuid as uuid_pkg
+from typing import Any, Optional
+
+from app import models
+from app.core.cache import get_key_value_client
+from app.core.config import settings
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# tokens of these types are random uuids, unique across users, so they can be looked
+# up by their code alone (e.g. from a password reset link)
+UNIQUE_CODE_TOKEN_TYPES = frozenset({models.OTPTypeChoice.PASSWORD_RESET})
+
+
+class OTPStore(abc.ABC):
+    @abc.abstractmethod
+    async def add(self, otp: models.OTP) -> models.OTP:
+        """Stores a new OTP until it expires"""
+
+    @abc.abstractmethod
+    async def get(
+        self,
+        *,
+        token_type: models.OTPTypeChoice,
+        user_id: Optional[uuid_pkg.UUID] = None,
+        code: Optional[str] = None,
+        valid_until: Optional[datetime.datetime] = None,
+    ) -> Optional[models.OTP]:
+        """
+        Returns the unused OTP of a user with `code`, or their latest unused OTP
+        without one. Tokens of `UNIQUE_CODE_TOKEN_TYPES` can be found by their code
+        alone. Only OTPs which are still valid at `valid_until` (default: now) are
+        returned.
+        """
+
+    @abc.abstractmethod
+    async def consume(self, otp: models.OTP) -> bool:
+        """Marks an OTP as used. Returns False if it had already been used"""
+
+
+class PostgresOTPStore(OTPStore):
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add(self, otp: models.OTP) -> models.OTP:
+        self.db.add(otp)
+        await self.db.commit()
+        await self.db.refresh(otp)
+        return otp
+
+    async def get(
+        self,
+        *,
+        token_type: models.OTPTypeChoice,
+        user_id: Optional[uuid_pkg.UUID] = None,
+        code: Optional[str] = None,
+        valid_until: Optional[datetime.datetime] = None,
+    ) -> Optional[models.OTP]:
+        valid_until = valid_until or utcnow()
+        statement = select(models.OTP).where(
+            models.OTP.token_type == token_type.value,
+            models.OTP.is_used.is_(False),
+            models.OTP.expires_at > valid_until,
+            # OTPs expire OTP_EXPIRE_MINUTES after they are created, so only the
+            # partitions of the last OTP_EXPIRE_MINUTES are scanned
+            models.OTP.created_at
+            > valid_until - datetime.timedelta(minutes=settings.OTP_EXPIRE_MINUTES),
+        )
+        if user_id:
+            statement = statement.where(models.OTP.user_id == user_id)
+        if code:
+            statement = statement.where(models.OTP.code == code)
+        statement = statement.order_by(models.OTP.created_at.desc()).limit(1)
+        results = await self.db.execute(statement=statement)
+        return results.scalars().first()
+
+    async def consume(self, otp: models.OTP) -> bool:
+        now = utcnow()
+        result = await self.db.execute(
+            update(models.OTP)
+            .where(
+                models.OTP.id == otp.id,
+                models.OTP.created_at == otp.created_at,
+                models.OTP.is_used.is_(False),
+            )
+            .values(is_used=True, used_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        otp.is_used, otp.used_at = True, now
+        return result.rowcount == 1
+
+
+class KeyValueOTPStore(OTPStore):
+    """
+    Keeps every OTP under `otp:{token_type}:{user_id}:{code}`, with the code of the
+    user's latest OTP under `otp:{token_type}:{user_id}` (and the user of unique
+    codes under `otp:{token_type}::{code}`). Keys expire with their OTP, so expired
+    OTPs are never read and never need to be purged. Using an OTP deletes it.
+    """
+
+    def __init__(self, client: Any, prefix: str = "otp"):
+        self.client = client
+        self.prefix = prefix
+
+    def get_key(self, token_type: models.OTPTypeChoice, *parts: Any) -> str:
+        return ":".join([self.prefix, token_type.value, *map(str, parts)])
+
+    async def add(self, otp: models.OTP) -> models.OTP:
+        token_type = models.OTPTypeChoice(otp.token_type)
+        otp.created_at = otp.created_at or utcnow()
+        ttl = math.ceil((otp.expires_at - utcnow()).total_seconds())
+        if ttl <= 0:
+            raise ValueError("Technical error: OTP has already expired")
+        value = json.dumps(
+            {
+                "uuid": str(otp.uuid),
+                "user_id": str(otp.user_id),
+                "token_type": token_type.value,
+                "code": otp.code,
+                "created_at": otp.created_at.isoformat(),
+                "expires_at": otp.expires_at.isoformat(),
+            }
+        )
+        await self.client.set(
+            self.get_key(token_type, otp.user_id, otp.code), value, ex=ttl
+        )
+        await self.client.set(self.get_key(token_type, otp.user_id), otp.code, ex=ttl)
+        if token_type in UNIQUE_CODE_TOKEN_TYPES:
+            await self.client.set(
+                self.get_key(token_type, "", otp.code), str(otp.user_id), ex=ttl
+            )
+        return otp
+
+    async def get(
+        self,
+        *,
+        token_type: models.OTPTypeChoice,
+        user_id: Optional[uuid_pkg.UUID] = None,
+        code: Optional[str] = None,
+        valid_until: Optional[datetime.datetime] = None,
+    ) -> Optional[models.OTP]:
+        if not user_id:
+            if not code or token_type not in UNIQUE_CODE_TOKEN_TYPES:
+                return None
+            user_id = await self.client.get(self.get_key(token_type, "", code))
+            if not user_id:
+                return None
+            user_id = decode(user_id)
+        if not code:
+            code = await self.client.get(self.get_key(token_type, user_id))
+            if not code:
+                return None
+            code = decode(code)
+        value = await self.client.get(self.get_key(token_type, user_id, code))
+        if not value:
+            return None
+        value = json.loads(value)
+        otp = models.OTP(
+            uuid=uuid_pkg.UUID(value["uuid"]),
+            user_id=uuid_pkg.UUID(value["user_id"]),
+            token_type=models.OTPTypeChoice(value["token_type"]),
+            code=value["code"],
+            created_at=datetime.datetime.fromisoformat(value["created_at"]),
+            expires_at=datetime.datetime.fromisoformat(value["expires_at"]),
+        )
+        if otp.expires_at <= (valid_until or utcnow()):
+            return None
+        return otp
+
+    async def consume(self, otp: models.OTP) -> bool:
+        token_type = models.OTPTypeChoice(otp.token_type)
+        # deleting the OTP is atomic, so only one of concurrent uses succeeds
+        deleted = await self.client.delete(
+            self.get_key(token_type, otp.user_id, otp.code)
+        )
+        keys = [self.get_key(token_type, otp.user_id)]
+        if token_type in UNIQUE_CODE_TOKEN_TYPES:
+            keys.append(self.get_key(token_type, "", otp.code))
+        if decode(await self.client.get(keys[0])) == otp.code:
+            await self.client.delete(*keys)
+        elif len(keys) > 1:
+            await self.client.delete(keys[1])
+        otp.is_used, otp.used_at = True, utcnow()
+        return deleted == 1
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def get_otp_store(db: AsyncSession, backend: str = None) -> OTPStore:
+    """Returns the configured OTP store. Postgres stores use the session `db`"""
+    backend = backend or settings.OTP_STORE_BACKEND
+    if backend == "postgres":
+        return PostgresOTPStore(db)
+    return KeyValueOTPStore(get_key_value_client(backend))
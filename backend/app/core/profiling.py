@@ -0,0 +1,209 @@
+"""The :mod:`app.core.profiling` module captures sampling CPU profiles of slow requests,
+to find out why a request (e.g. an organization create or a sign-up) sometimes takes
+seconds in production
+
+While `PROFILING_ENABLED` and requests are in flight, a `SamplingProfiler` thread
+samples the stacks of the threads handling them every `PROFILE_INTERVAL_SECONDS`.
+Each sample is kept as a wall clock sample and, if the thread used CPU since the
+previous sample, as a CPU sample. A request slower than
+`PROFILE_SLOW_REQUEST_SECONDS`, or one of a `PROFILE_SAMPLE_RATE` fraction, is saved
+with the samples taken while it ran, as folded stacks (the input of flame graph
+tools, e.g. speedscope). Requests share the event loop thread, so a profile shows
+everything the worker did during the request, which includes the other requests it
+was slowed down by. Profiles are kept in `PROFILE_DIR`, the oldest deleted beyond
+`PROFILE_MAX_FILES`, and listed and downloaded by superusers at `/v1/profiles`.
+"""
+# Author: Christopher Dare
+
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.query_metrics import get_route_label
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# samples kept in memory, at most this many seconds of them at the default interval
+MAX_SAMPLES = 60 * 200
+MAX_STACK_DEPTH = 128
+PROFILE_NAME = re.compile(r"[\w.-]+\.json")
+
+
+def get_thread_cpu_time(ident: int) -> Optional[float]:
+    """Returns the CPU seconds used by a thread, where the platform can tell"""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+def get_folded_stack(frame: Any) -> str:
+    """Returns the stack of `frame`, outermost frame first, as `module:function`
+    names separated by semicolons (one line of a folded stacks profile)"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads handling requests, while there are any"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        # (time, stack, whether the thread was on CPU) of every sample
+        self.samples: Deque[Tuple[float, str, bool]] = deque(maxlen=MAX_SAMPLES)
+        self.threads: Counter = Counter()
+        self.cpu_times: Dict[int, Optional[float]] = {}
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, ident: int) -> None:
+        """Samples the thread `ident` until a matching `stop`"""
+        with self.lock:
+            self.threads[ident] += 1
+            self.active.set()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="sampling-profiler", daemon=True
+                )
+                self.thread.start()
+
+    def stop(self, ident: int) -> None:
+        with self.lock:
+            self.threads[ident] -= 1
+            if self.threads[ident] <= 0:
+                del self.threads[ident]
+                self.cpu_times.pop(ident, None)
+            if not self.threads:
+                self.active.clear()
+
+    def sample(self) -> None:
+        now = time.monotonic()
+        frames = sys._current_frames()
+        with self.lock:
+            idents = list(self.threads)
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            cpu_time = get_thread_cpu_time(ident)
+            previous = self.cpu_times.get(ident)
+            self.cpu_times[ident] = cpu_time
+            on_cpu = (
+                cpu_time is not None and previous is not None and cpu_time > previous
+            )
+            self.samples.append((now, get_folded_stack(frame), on_cpu))
+
+    def run(self) -> None:
+        while True:
+            self.active.wait()
+            self.sample()
+            time.sleep(self.interval)
+
+    def collect(self, started: float, ended: float) -> Dict[str, Dict[str, int]]:
+        """Returns the wall clock and CPU samples taken between `started` and `ended`
+        (`time.monotonic` times), counted per folded stack"""
+        wall, cpu = Counter(), Counter()
+        for at, stack, on_cpu in list(self.samples):
+            if started <= at <= ended:
+                wall[stack] += 1
+                if on_cpu:
+                    cpu[stack] += 1
+        return {"wall": dict(wall.most_common()), "cpu": dict(cpu.most_common())}
+
+
+@lru_cache(maxsize=None)
+def get_profiler() -> SamplingProfiler:
+    return SamplingProfiler(settings.PROFILE_INTERVAL_SECONDS)
+
+
+class ProfileStore:
+    """A bounded directory of profiles, the oldest deleted first"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def list(self) -> List[Path]:
+        """Returns the saved profiles, newest first"""
+        if not self.directory.is_dir():
+            return []
+        # names start with the time the request started
+        return sorted(self.directory.glob("*.json"), reverse=True)
+
+    def get(self, name: str) -> Optional[Path]:
+        """Returns the path of the profile `name`, if it exists"""
+        if not PROFILE_NAME.fullmatch(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def save(self, name: str, profile: Dict[str, Any]) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / name
+        # written aside then renamed, so profiles are never listed half written
+        partial = self.directory / f".{name}.partial"
+        partial.write_text(json.dumps(profile))
+        os.replace(partial, path)
+        for stale in self.list()[self.max_files :]:
+            stale.unlink(missing_ok=True)
+        return path
+
+
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+
+def get_profile_name(scope: Scope, started_at: datetime.datetime, ms: float) -> str:
+    route = re.sub(r"[^\w]+", "-", get_route_label(scope)).strip("-")
+    return f"{started_at:%Y%m%dT%H%M%S%f}-{os.getpid()}-{route}-{ms:.0f}ms.json"
+
+
+class ProfilingMiddleware:
+    """Profiles slow or randomly sampled requests, when `PROFILING_ENABLED`"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        profiler, ident = get_profiler(), threading.get_ident()
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        started = time.monotonic()
+        profiler.start(ident)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop(ident)
+            ended = time.monotonic()
+            seconds = ended - started
+            if (
+                seconds >= settings.PROFILE_SLOW_REQUEST_SECONDS
+                or random.random() < settings.PROFILE_SAMPLE_RATE
+            ):
+                get_profile_store().save(
+                    get_profile_name(scope, started_at, seconds * 1e3),
+                    {
+                        "route": get_route_label(scope),
+                        "path": scope["path"],
+                        "started_at": started_at.isoformat(),
+                        "duration_ms": seconds * 1e3,
+                        "interval_ms": profiler.interval * 1e3,
+                        **profiler.collect(started, ended),
+                    },
+                )
@@ -0,0 +1,157 @@
+"""The :mod:`app.core.provider_metrics` module measures the calls made to outside
+providers (Twilio, Hubtel, SendGrid, Mailgun, Paystack), so that their slowness and
+failures can be told apart from our own regressions
+
+Calls go through `call_provider` (or `call_provider_async`), which records every
+attempt's latency by provider, operation and status class ("2xx", "4xx", "5xx",
+"timeout" or "error"), and retries failed attempts: always when no connection to the
+provider could be made, and, for `idempotent` calls only, on timeouts, 5xx responses
+and other connection errors. A connection reset or aborted may have happened after
+the provider received the request, and sending an SMS twice is worse than failing
+to send it. Retries and timeouts are
+also counted. Each call runs as a `provider.<provider>.<operation>` span (see
+`app.core.tracing`).
+"""
+# Author: Christopher Dare
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import httpx
+import requests
+from app.core.config import settings
+from app.core.tracing import span
+from prometheus_client import Counter, Histogram
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "provider_request_seconds",
+    "Latency of calls to outside providers, by provider, operation and status class",
+    ["provider", "operation", "status_class"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+PROVIDER_RETRIES = Counter(
+    "provider_request_retries_total",
+    "Calls to outside providers retried, by provider and operation",
+    ["provider", "operation"],
+)
+PROVIDER_TIMEOUTS = Counter(
+    "provider_request_timeouts_total",
+    "Calls to outside providers which timed out, by provider and operation",
+    ["provider", "operation"],
+)
+
+TIMEOUT_ERRORS = (requests.Timeout, httpx.TimeoutException)
+# errors raised before a connection to the provider was made, so always safe to retry
+NOT_SENT_ERRORS = (
+    requests.exceptions.ConnectTimeout,
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+)
+# errors of connections which may have been lost once the request was sent (e.g.
+# "Connection aborted", reset by peer), only retried for idempotent calls
+CONNECTION_ERRORS = (requests.ConnectionError, httpx.TransportError)
+
+
+def get_status_class(result: Any = None, error: Optional[BaseException] = None) -> str:
+    """Returns the status class of a provider response, or of the error it raised"""
+    if isinstance(error, TIMEOUT_ERRORS):
+        return "timeout"
+    status = getattr(result, "status_code", None)
+    if error is not None:
+        # requests' HTTPError carries its response, Twilio's errors their status
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        status = status or getattr(error, "status", None)
+        if not isinstance(status, int):
+            return "error"
+    # SDK results without a status (e.g. a Twilio message) are successes
+    return f"{status // 100}xx" if isinstance(status, int) else "2xx"
+
+
+def should_retry(
+    status_class: str, error: Optional[BaseException], idempotent: bool
+) -> bool:
+    if isinstance(error, NOT_SENT_ERRORS):
+        return True
+    return idempotent and (
+        status_class in ("timeout", "5xx") or isinstance(error, CONNECTION_ERRORS)
+    )
+
+
+def record_attempt(
+    provider: str, operation: str, started: float, result: Any, error: Any
+) -> str:
+    status_class = get_status_class(result, error)
+    PROVIDER_REQUEST_SECONDS.labels(provider, operation, status_class).observe(
+        time.perf_counter() - started
+    )
+    if status_class == "timeout":
+        PROVIDER_TIMEOUTS.labels(provider, operation).inc()
+    return status_class
+
+
+def get_retry_delay(attempt: int) -> float:
+    return settings.PROVIDER_RETRY_BACKOFF_SECONDS * 2**attempt
+
+
+def call_provider(
+    provider: str,
+    operation: str,
+    call: Callable[[], Any],
+    *,
+    idempotent: bool = False,
+    max_retries: Optional[int] = None,
+) -> Any:
+    """Calls (and retries) a provider, recording every attempt. Returns the result
+    of the last attempt, or raises its error"""
+    max_retries = settings.PROVIDER_MAX_RETRIES if max_retries is None else max_retries
+    with span(f"provider.{provider}.{operation}"):
+        for attempt in range(max_retries + 1):
+            started, result, error = time.perf_counter(), None, None
+            try:
+                result = call()
+            except Exception as e:
+                error = e
+            status_class = record_attempt(provider, operation, started, result, error)
+            if attempt < max_retries and should_retry(status_class, error, idempotent):
+                PROVIDER_RETRIES.labels(provider, operation).inc()
+                time.sleep(get_retry_delay(attempt))
+                continue
+            if error is not None:
+                raise error
+            return result
+
+
+async def call_provider_async(
+    provider: str,
+    operation: str,
+    call: Callable[[], Awaitable[Any]],
+    *,
+    idempotent: bool = False,
+    max_retries: Optional[int] = None,
+) -> Any:
+    """`call_provider` for coroutines, e.g. the calls of an `httpx.AsyncClient`"""
+    max_retries = settings.PROVIDER_MAX_RETRIES if max_retries is None else max_retries
+    with span(f"provider.{provider}.{operation}"):
+        for attempt in range(max_retries + 1):
+            started, result, error = time.perf_counter(), None, None
+            try:
+                result = await call()
+            except Exception as e:
+                error = e
+            status_class = record_attempt(provider, operation, started, result, error)
+            if attempt < max_retries and should_retry(status_class, error, idempotent):
+                PROVIDER_RETRIES.labels(provider, operation).inc()
+                await asyncio.sleep(get_retry_delay(attempt))
+                continue
+            if error is not None:
+                raise error
+            return result
+
+
+def get_timeout() -> Tuple[float, float]:
+    """The (connect, read) timeout of calls made with `requests`"""
+    return (
+        settings.PROVIDER_CONNECT_TIMEOUT_SECONDS,
+        settings.PROVIDER_TIMEOUT_SECONDS,
+    )
@@ -0,0 +1,205 @@
+"""The :mod:`app.core.query_metrics` module counts and times the SQL statements every
+request runs, and catches routes which run too many of them
+
+Engines are instrumented with SQLAlchemy cursor events, which record each statement
+into the `QueryStats` of the current request (a context variable set by
+`QueryMetricsMiddleware`). Once the request is answered, its statement count, total
+database time and slowest statement are observed in histograms labelled by route.
+The connections checked out of the pool are kept in a gauge.
+
+Statements are also grouped by shape, their text with the bound parameters and
+`IN` lists collapsed, so that a route loading related rows one at a time (an N+1)
+shows up as one shape run many times. `SQL_QUERY_BUDGET_MODE` sets what happens to
+routes over `SQL_QUERY_BUDGET` statements, or running one shape more than
+`SQL_REPEATED_STATEMENT_LIMIT` times: nothing ("off"), a warning ("warn") or, for
+development and tests, a `QueryBudgetExceeded` error from the offending statement
+("raise").
+"""
+# Author: Christopher Dare
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from app.core.config import settings
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements run per request, by route",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Total time spent in SQL statements per request, by route",
+    ["route"],
+)
+REQUEST_SLOWEST_QUERY_SECONDS = Histogram(
+    "http_request_db_slowest_query_seconds",
+    "Time of the slowest SQL statement of each request, by route",
+    ["route"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections checked out of the pool, summed over live workers",
+    multiprocess_mode="livesum",
+)
+
+# the cursor execution `info` key the start time of a statement is kept under
+STARTED_AT = "query_metrics_started_at"
+
+PARAMETERS = re.compile(r"\$\d+|%\(\w+\)s|\?")
+PARAMETER_LISTS = re.compile(r"\(\?(?:, \?)*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def get_route_label(scope: Scope) -> str:
+    """Returns the method and path template of the route of a request, e.g.
+    `GET /v1/wallets/{id}`, once routing has matched one"""
+    route = getattr(scope.get("route"), "path", "unmatched")
+    return f"{scope['method']} {route}"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised, in "raise" mode, by the statement which puts a request over budget"""
+
+
+def get_statement_shape(statement: str) -> str:
+    """Returns `statement` with bound parameters and `IN` lists collapsed, so that
+    statements differing only in their parameters have the same shape"""
+    shape = PARAMETERS.sub("?", statement)
+    return WHITESPACE.sub(" ", PARAMETER_LISTS.sub("(?)", shape)).strip()
+
+
+class QueryStats:
+    """The SQL statements run by one request"""
+
+    def __init__(self, route: str = "", scope: Optional[Scope] = None):
+        self._route = route
+        self.scope = scope
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Counter = Counter()
+
+    @property
+    def route(self) -> str:
+        return self._route if self.scope is None else get_route_label(self.scope)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        self.shapes[get_statement_shape(statement)] += 1
+
+    def get_violations(self) -> List[str]:
+        """Describes how the request exceeds its query budget, if it does"""
+        violations = []
+        if self.count > settings.SQL_QUERY_BUDGET:
+            violations.append(
+                f"{self.count} SQL statements, over the budget of "
+                f"{settings.SQL_QUERY_BUDGET}"
+            )
+        for shape, count in self.shapes.most_common():
+            if count <= settings.SQL_REPEATED_STATEMENT_LIMIT:
+                break
+            violations.append(f"the same statement {count} times (N+1?): {shape}")
+        return violations
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries(
+    route: str = "", scope: Optional[Scope] = None
+) -> Iterator[QueryStats]:
+    """Records the statements run within the block, e.g. by a request or a task"""
+    stats = QueryStats(route, scope)
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(STARTED_AT, []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info[STARTED_AT].pop()
+    stats = current_stats.get()
+    if stats is None:
+        return
+    stats.record(statement, seconds)
+    if seconds > settings.SQL_SLOW_STATEMENT_SECONDS:
+        logger.warning(
+            "Slow SQL statement (%.3fs) on %s: %s", seconds, stats.route, statement
+        )
+    if settings.SQL_QUERY_BUDGET_MODE == "raise":
+        violations = stats.get_violations()
+        if violations:
+            raise QueryBudgetExceeded(f"{stats.route} ran {'; '.join(violations)}")
+
+
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Records the statements and pool usage of `engine` (the `sync_engine` of an
+    async engine)"""
+    if not event.contains(engine, "after_cursor_execute", after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+
+
+def observe(stats: QueryStats) -> None:
+    """Observes the statements of a finished request in the histograms"""
+    REQUEST_QUERIES.labels(stats.route).observe(stats.count)
+    REQUEST_DB_SECONDS.labels(stats.route).observe(stats.total_seconds)
+    REQUEST_SLOWEST_QUERY_SECONDS.labels(stats.route).observe(stats.slowest_seconds)
+    if settings.SQL_QUERY_BUDGET_MODE == "warn":
+        violations = stats.get_violations()
+        if violations:
+            logger.warning("%s ran %s", stats.route, "; ".join(violations))
+
+
+class QueryMetricsMiddleware:
+    """Records the SQL statements of every HTTP request, labelled by the path
+    template of its route so that label values stay few"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries(scope=scope) as stats:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                observe(stats)
@@ -0,0 +1,210 @@
+"""The :mod:`app.core.rate_limit` module contains the token bucket rate limiter which
+sheds load on expensive routes (sending OTPs, hashing passwords)
+
+Every request takes a token from a bucket per key (e.g. the client IP and the
+destination of an OTP). Buckets hold up to `burst` tokens and are refilled at
+`per_minute` tokens a minute. Requests finding a bucket empty are answered with a
+`429` and a `Retry-After` header before any work is done. Buckets are shared between
+workers in Redis or, in development and tests, kept in process. While Redis is
+unavailable, requests are let through with a warning or, unless
+`RATE_LIMIT_FAIL_OPEN`, answered with a `503`.
+
+Behind a reverse proxy, the address requests come from is the proxy's. The client IP
+is read from the X-Forwarded-For header instead, walking it back from the nearest
+hop for as long as the hops are `TRUSTED_PROXIES`: entries before the first
+untrusted hop could have been written by the client itself.
+"""
+# Author: Christopher Dare
+
+import abc
+import ipaddress
+import logging
+import math
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REQUESTS = Counter(
+    "rate_limit_requests_total",
+    "Requests checked by the rate limiter, by scope and outcome",
+    ["scope", "outcome"],
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the rate limiter, by scope and the key which was limited",
+    ["scope", "key"],
+)
+
+
+class RateLimit(NamedTuple):
+    burst: int
+    per_minute: float
+
+
+def take_token(
+    tokens: float, updated_at: float, now: float, limit: RateLimit
+) -> Tuple[float, float]:
+    """
+    Refills a bucket holding `tokens` at `updated_at` up to `now` and takes a token
+    from it. Returns the tokens left and, if the bucket was empty, the seconds until
+    a token is available (0 if one was taken).
+    """
+    rate = limit.per_minute / 60
+    tokens = min(limit.burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class TokenBuckets(abc.ABC):
+    @abc.abstractmethod
+    async def take(self, key: str, limit: RateLimit) -> float:
+        """Takes a token from the bucket of `key`. Returns 0 if a token was taken,
+        or the seconds until one is available"""
+
+
+class InMemoryTokenBuckets(TokenBuckets):
+    """Buckets of a single process. The least recently used buckets are evicted
+    beyond `max_keys`; a full bucket is the same as no bucket"""
+
+    def __init__(
+        self, max_keys: int = None, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_keys = max_keys or settings.RATE_LIMIT_MAX_KEYS
+        self.clock = clock
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        now = self.clock()
+        tokens, updated_at = self.buckets.pop(key, (limit.burst, now))
+        tokens, retry_after = take_token(tokens, updated_at, now, limit)
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisTokenBuckets(TokenBuckets):
+    """Buckets shared by every process, each a Redis hash updated by a script so
+    that concurrent requests are applied one after the other. Buckets expire once
+    they would be full again"""
+
+    SCRIPT = """
+    local burst = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, client, prefix: str = "rate-limit"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        retry_after = await self.client.eval(
+            self.SCRIPT,
+            1,
+            f"{self.prefix}:{key}",
+            limit.burst,
+            limit.per_minute / 60,
+        )
+        return float(retry_after)
+
+
+@lru_cache(maxsize=None)
+def get_token_buckets(backend: str = None) -> TokenBuckets:
+    """Returns the token buckets of the configured backend, shared by requests"""
+    from app.core.cache import get_key_value_client
+
+    backend = backend or settings.RATE_LIMIT_BACKEND
+    if backend == "redis":
+        return RedisTokenBuckets(get_key_value_client("redis"))
+    return InMemoryTokenBuckets()
+
+
+@lru_cache(maxsize=None)
+def get_trusted_networks(proxies: Tuple[str, ...]) -> Tuple[Any, ...]:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    networks = get_trusted_networks(tuple(settings.TRUSTED_PROXIES))
+    return any(ip in network for network in networks)
+
+
+def get_client_ip(request: Request) -> str:
+    """Returns the IP of the client of a request, as forwarded by trusted proxies"""
+    address = request.client.host if request.client else None
+    forwarded = [
+        entry.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for entry in header.split(",")
+        if entry.strip()
+    ]
+    while address and forwarded and is_trusted_proxy(address):
+        address = forwarded.pop()
+    return address or "unknown"
+
+
+async def rate_limit(
+    scope: str,
+    keys: Sequence[Tuple[str, Optional[str], RateLimit]],
+    buckets: TokenBuckets = None,
+) -> None:
+    """
+    Takes a token from the bucket of every (key name, key value, limit) of `keys`
+    in `scope`, and raises a `429` if any of them is empty. Keys without a value
+    are skipped.
+    """
+    from app.core.cache import BACKEND_ERRORS
+
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    buckets = buckets or get_token_buckets()
+    for name, value, limit in keys:
+        if value is None:
+            continue
+        try:
+            retry_after = await buckets.take(f"{scope}:{name}:{value}", limit)
+        except BACKEND_ERRORS as e:
+            RATE_LIMIT_REQUESTS.labels(scope, "unavailable").inc()
+            if settings.RATE_LIMIT_FAIL_OPEN:
+                logger.warning(f"Rate limiter unavailable, {scope} not limited: {e!r}")
+                return
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service temporarily unavailable. Please try again later",
+            )
+        if retry_after:
+            RATE_LIMIT_REQUESTS.labels(scope, "rejected").inc()
+            RATE_LIMIT_REJECTIONS.labels(scope, name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+    RATE_LIMIT_REQUESTS.labels(scope, "allowed").inc()
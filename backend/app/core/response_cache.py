@@ -0,0 +1,192 @@
+"""The :mod:`app.core.response_cache` module contains the per-user cache of read-only
+list responses (e.g. `GET /wallets`), invalidated by tags
+
+Every cached response is tagged with the data it was rendered from, e.g. the wallets
+of its user. Each tag has a version, a random token kept next to the responses, and
+responses are cached under their user, path, query parameters and the versions of
+their tags. Writers invalidate a tag, after committing, by deleting its version; its
+next reader gives it a new one, so the responses rendered before are never read
+again and expire on their own. Tags and responses are kept in Redis, so that the
+invalidations made by any worker or background job reach every API worker; kept in
+process ("memory"), they are only invalidated by writes made in that process, which
+is only right for a single process (development and tests). While the backend is
+unavailable, responses are rendered without the cache, and invalidations are logged
+and dropped (the cached responses they miss are not being served either, and expire).
+"""
+# Author: Christopher Dare
+
+import hashlib
+import logging
+import uuid as uuid_pkg
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Sequence
+
+from app.core.config import settings
+from app.core.responses import etag_matches, make_etag, not_modified
+from fastapi import Request, Response
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Requests to cached routes, by route and whether the response was cached",
+    ["route", "outcome"],
+)
+
+logger = logging.getLogger(__name__)
+
+# the session `info` key of tags to invalidate once the session commits
+PENDING_TAGS = "response_cache_tags"
+
+
+def wallets_tag(owner_id: Any) -> str:
+    """Tags responses listing the wallets of a user"""
+    return f"wallets:owner:{owner_id}"
+
+
+def organizations_tag(owner_id: Any) -> str:
+    """Tags responses listing the organizations owned by a user"""
+    return f"organizations:owner:{owner_id}"
+
+
+class ResponseCache:
+    def __init__(self, client: Any, prefix: str = "response-cache"):
+        self.client = client
+        self.prefix = prefix
+
+    def get_tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def get_versions(self, tags: Sequence[str]) -> List[str]:
+        """Returns the current versions of `tags`. Tags without a version (never
+        invalidated, or expired) are given a new one, so responses cached under an
+        earlier version of a tag are never mistaken for current ones"""
+        versions = await self.client.mget([self.get_tag_key(tag) for tag in tags])
+        for i, (tag, version) in enumerate(zip(tags, versions)):
+            if version is None:
+                versions[i] = uuid_pkg.uuid4().hex
+                await self.client.set(
+                    self.get_tag_key(tag),
+                    versions[i],
+                    ex=settings.RESPONSE_CACHE_EXPIRE_SECONDS,
+                )
+        return [v.decode() if isinstance(v, bytes) else v for v in versions]
+
+    async def invalidate(self, *tags: str) -> None:
+        """Deletes the versions of `tags`: their next readers give them new ones"""
+        from app.core.cache import BACKEND_ERRORS
+
+        if not tags:
+            return
+        try:
+            await self.client.delete(*{self.get_tag_key(tag) for tag in tags})
+        except BACKEND_ERRORS as e:
+            logger.warning(f"Response cache unavailable, {tags} not invalidated: {e!r}")
+
+    async def get_or_render(
+        self,
+        key: str,
+        tags: Sequence[str],
+        render: Callable[[], Awaitable[Response]],
+        route: str = "",
+    ) -> Response:
+        """
+        Returns the response cached under `key` and the current versions of `tags`,
+        or renders, caches and returns it. Only successful responses are cached.
+        Responses are rendered without the cache while its backend is unavailable.
+        """
+        from app.core.cache import BACKEND_ERRORS
+
+        try:
+            # versions are read before rendering, so a write committed while the
+            # response is rendered invalidates it
+            versions = await self.get_versions(tags)
+            digest = hashlib.sha256("\n".join([key, *versions]).encode()).hexdigest()
+            name = f"{self.prefix}:response:{digest}"
+            body = await self.client.get(name)
+        except BACKEND_ERRORS as e:
+            logger.warning(f"Response cache unavailable, rendering {key}: {e!r}")
+            RESPONSE_CACHE_REQUESTS.labels(route, "unavailable").inc()
+            response = await render()
+            response.headers["X-Cache"] = "BYPASS"
+            return response
+        if body is not None:
+            RESPONSE_CACHE_REQUESTS.labels(route, "hit").inc()
+            return Response(
+                content=body,
+                media_type="application/json",
+                headers={"X-Cache": "HIT"},
+            )
+        RESPONSE_CACHE_REQUESTS.labels(route, "miss").inc()
+        response = await render()
+        if response.status_code == 200:
+            try:
+                await self.client.set(
+                    name, response.body, ex=settings.RESPONSE_CACHE_EXPIRE_SECONDS
+                )
+            except BACKEND_ERRORS as e:
+                logger.warning(f"Response cache unavailable, {key} not cached: {e!r}")
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+
+@lru_cache(maxsize=None)
+def get_response_cache(backend: str = None) -> ResponseCache:
+    """Returns the response cache of the configured backend, shared by requests"""
+    from app.core.cache import TTLCache, get_key_value_client
+
+    backend = backend or settings.RESPONSE_CACHE_BACKEND
+    if backend == "redis":
+        return ResponseCache(get_key_value_client("redis"))
+    return ResponseCache(TTLCache(max_keys=settings.RESPONSE_CACHE_MAX_KEYS))
+
+
+async def cached_response(
+    request: Request,
+    *,
+    user_id: Any,
+    tags: Sequence[str],
+    render: Callable[[], Awaitable[Response]],
+) -> Response:
+    """Returns the response of `render` for the user, cached under the path and
+    query parameters of the request until `tags` are invalidated. Responses carry
+    an `ETag` of their body, and requests whose `If-None-Match` header matches it
+    are answered with a `304 Not Modified`"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        response = await render()
+    else:
+        query = "&".join(
+            f"{k}={v}" for k, v in sorted(request.query_params.multi_items())
+        )
+        response = await get_response_cache().get_or_render(
+            f"{user_id}:{request.url.path}?{query}",
+            tags,
+            render,
+            route=request.scope["route"].path if "route" in request.scope else "",
+        )
+    if response.status_code != 200:
+        return response
+    etag = make_etag(response.body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return response
+
+
+async def invalidate(*tags: str) -> None:
+    """Invalidates the responses tagged with any of `tags`. Call it once the writes
+    to the tagged data are committed"""
+    if tags and settings.RESPONSE_CACHE_ENABLED:
+        await get_response_cache().invalidate(*tags)
+
+
+def invalidate_on_commit(db: AsyncSession, *tags: str) -> None:
+    """Marks `tags` to be invalidated by the next `commit` of the session `db`. For
+    writes whose affected users are only known as they are made (bulk updates)"""
+    db.info.setdefault(PENDING_TAGS, set()).update(tags)
+
+
+async def commit(db: AsyncSession) -> None:
+    """Commits the session `db`, then invalidates the tags marked on it"""
+    await db.commit()
+    await invalidate(*db.info.pop(PENDING_TAGS, ()))
@@ -0,0 +1,140 @@
+"""The :mod:`app.core.responses` module contains the JSON response class used by the API
+and the helpers for conditional GETs (ETags)
+"""
+# Author: Christopher Dare
+
+import datetime
+import enum
+import hashlib
+import json
+import uuid as uuid_pkg
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Type
+
+from app.core.config import settings
+from pydantic import BaseModel
+from pydantic.json import decimal_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def default_encoder(obj: Any) -> Any:
+    """Encodes the types the JSON backends do not support natively.
+
+    Decimals are encoded exactly as FastAPI's `jsonable_encoder` does
+    (integers when there is no fractional part, floats otherwise),
+    so monetary amounts are formatted the same regardless of the backend
+    """
+    if isinstance(obj, Decimal):
+        return decimal_encoder(obj)
+    if isinstance(obj, uuid_pkg.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def dumps(content: Any, backend: str = None) -> bytes:
+    """Serializes `content` to JSON bytes with the configured backend"""
+    backend = backend or settings.JSON_RESPONSE_BACKEND
+    if backend == "orjson" and orjson is not None:
+        return orjson.dumps(
+            content, default=default_encoder, option=orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        content,
+        default=default_encoder,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (when installed and enabled via
+    `JSON_RESPONSE_BACKEND`), with native encoders for Decimal, UUID and datetime"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def get_schema_fields(schema: Type[BaseModel]) -> Tuple[Tuple[str, str, Any], ...]:
+    """Returns the (name, alias, default) of every field of a response schema"""
+    return tuple(
+        (name, field.alias, field.default) for name, field in schema.__fields__.items()
+    )
+
+
+def project(obj: Any, schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Projects a trusted object (typically an ORM row) into a dictionary shaped like
+    `schema`, keyed by field alias, without running the schema's validators.
+
+    Only use this for data that was validated on its way into the database;
+    the values are rendered as they are stored
+    """
+    content = {}
+    for name, alias, default in get_schema_fields(schema):
+        value = getattr(obj, name, default)
+        if isinstance(value, BaseModel):
+            value = value.dict(by_alias=True)
+        content[alias] = value
+    return content
+
+
+def trusted_response(
+    obj: Any,
+    schema: Type[BaseModel],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> FastJSONResponse:
+    """Builds a response for a trusted object, skipping `response_model` validation
+    and `jsonable_encoder`. Keep `response_model` on the route for the OpenAPI docs
+    """
+    return FastJSONResponse(
+        project(obj, schema), status_code=status_code, headers=headers
+    )
+
+
+def make_etag(*parts: Any) -> str:
+    """Returns a weak ETag of `parts`, e.g. the `uuid` and `updated_at` of an object
+    or the rendered body of a list. Weak, as equal ETags promise the same content,
+    not the same bytes"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Returns whether the `If-None-Match` header of the request matches `etag`,
+    with the weak comparison conditional GETs use"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque_tag
+        for tag in (tag.strip() for tag in header.split(","))
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """Builds the `304 Not Modified` response of a matching conditional GET"""
+    return Response(status_code=304, headers={"ETag": etag})
@@ -1,17 +1,22 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from random import randint
 from typing import Any, List, Union
 
 from app import models
 from app.core.config import OAuthScopeType, settings
 from fastapi import HTTPException, status
-from jose import jwt
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ALGORITHM = "HS256"
 
 
-ALGORITHM = "HS256"
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Builds the password hashing context on first use, so passlib and bcrypt
+    are not loaded when the app is imported"""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def create_access_token(
@@ -35,17 +40,19 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
+    from jose import jwt
+
     to_encode = {"exp": expire, "sub": str(subject), "scopes": scopes}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def generate_otp_code(n=6):
@@ -1,13 +1,24 @@
 from app.core.config import settings
+from app.core.query_metrics import instrument_engine
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 async_db_url = settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI
+# used by the celery tasks, each of which runs in a new event loop (asyncio.run).
+# asyncpg connections belong to the loop they were opened in, so they are closed
+# at the end of every session instead of being pooled for the next task
 AsyncSessionLocal: AsyncSession = sessionmaker(
     create_async_engine(
-        settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI, echo=True, future=True
+        settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI,
+        echo=True,
+        future=True,
+        poolclass=NullPool,
     ),
     class_=AsyncSession,
     expire_on_commit=False,
 )
+
+# count and time the statements of every request
+instrument_engine(AsyncSessionLocal.kw["bind"].sync_engine)
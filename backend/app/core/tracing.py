@@ -0,0 +1,138 @@
+"""The :mod:`app.core.tracing` module contains lightweight in-process spans, to break
+the latency of a request down into dependency resolution, CRUD calls and calls to
+providers (messaging, Paystack)
+
+Code is wrapped in `span("name")` blocks, or decorated with `traced`. While a request
+is handled (`TracingMiddleware` sets the current `Trace`), every span's duration is
+observed in a histogram labelled by route and span name; spans outside requests cost
+one context variable lookup. A `TRACE_SAMPLE_RATE` fraction of requests also logs its
+spans, in order and with their nesting, as one JSON line, together with the SQL
+statements of the request (see `app.core.query_metrics`).
+"""
+# Author: Christopher Dare
+
+import asyncio
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.query_metrics import current_stats, get_route_label
+from prometheus_client import Histogram
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+SPAN_SECONDS = Histogram(
+    "http_request_span_seconds",
+    "Time spent in spans (dependencies, CRUD calls, provider calls), by route",
+    ["route", "span"],
+)
+
+
+class Trace:
+    """The spans of one request. Only sampled traces keep their spans"""
+
+    def __init__(self, scope: Optional[Scope] = None, sampled: bool = False):
+        self.scope = scope
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.depth = 0
+        # (name, seconds since the request started, duration, depth) of every span
+        self.spans: List[Tuple[str, float, float, int]] = []
+
+    @property
+    def route(self) -> str:
+        return get_route_label(self.scope) if self.scope is not None else ""
+
+    def dump(self) -> str:
+        """Returns the spans of the trace as one line of JSON"""
+        stats = current_stats.get()
+        return json.dumps(
+            {
+                "route": self.route,
+                "duration_ms": round((time.perf_counter() - self.started) * 1e3, 3),
+                "sql_statements": stats.count if stats else None,
+                "sql_ms": round(stats.total_seconds * 1e3, 3) if stats else None,
+                "spans": [
+                    {
+                        "name": name,
+                        "start_ms": round(start * 1e3, 3),
+                        "duration_ms": round(seconds * 1e3, 3),
+                        "depth": depth,
+                    }
+                    for name, start, seconds, depth in self.spans
+                ],
+            }
+        )
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the block as a span of the current trace, if any"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    trace.depth += 1
+    try:
+        yield
+    finally:
+        trace.depth -= 1
+        seconds = time.perf_counter() - started
+        SPAN_SECONDS.labels(trace.route, name).observe(seconds)
+        if trace.sampled:
+            trace.spans.append((name, started - trace.started, seconds, trace.depth))
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorates a function (or coroutine function) to run as the span `name`.
+    FastAPI dependencies keep their signature, as `wraps` exposes it"""
+
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """Starts a trace for every HTTP request, and logs the sampled ones"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(scope, sampled=random.random() < settings.TRACE_SAMPLE_RATE)
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_trace.reset(token)
+            if trace.sampled:
+                logger.info("trace %s", trace.dump())
@@ -1,5 +1,10 @@
+from .crud_employee_enrollment import employee_enrollment
+from .crud_ledger import ledger
 from .crud_organization import organization
 from .crud_otp import otp
 from .crud_user import user
 from .crud_wallet import wallet
+from .crud_wallet_accumulator import wallet_accumulator
+from .crud_wallet_balance import wallet_balance
 from .crud_wallet_policy import wallet_policy
+from .crud_wallet_policy_propagation import wallet_policy_propagation
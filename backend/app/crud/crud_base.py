@@ -1,10 +1,13 @@
+import asyncio
 import datetime
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from functools import lru_cache, wraps
+from typing import Any, Dict, FrozenSet, Generic, List, Optional, Type, TypeVar, Union
 
+from app.core.tracing import span
 from app.schemas.base_class import Base
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -12,7 +15,35 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+@lru_cache(maxsize=None)
+def get_model_fields(model: Type[Any]) -> FrozenSet[str]:
+    """Returns the names of the mapped column attributes of a model"""
+    return frozenset(attr.key for attr in inspect(model).column_attrs)
+
+
+def traced_crud_method(fn: Any) -> Any:
+    """Runs a CRUD coroutine method as the span `crud.<model>.<method>`"""
+
+    @wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        with span(f"crud.{self.model.__name__}.{fn.__name__}"):
+            return await fn(self, *args, **kwargs)
+
+    return wrapper
+
+
+def trace_crud_methods(cls: Type[Any]) -> None:
+    """Traces the public coroutine methods defined on a CRUD class"""
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and asyncio.iscoroutinefunction(attr):
+            setattr(cls, name, traced_crud_method(attr))
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        trace_crud_methods(cls)
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -24,6 +55,32 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    @property
+    def fields(self) -> FrozenSet[str]:
+        """Column attributes of the model, computed once per model on first use"""
+        return get_model_fields(self.model)
+
+    def get_obj_in_data(
+        self, obj_in: Union[BaseModel, Dict[str, Any]], exclude_unset: bool = False
+    ) -> Dict[str, Any]:
+        """Returns the values of `obj_in` which map to columns of the model.
+        Values keep their python types (Decimal, UUID, datetime), so they are not
+        serialized to JSON types only for the ORM to convert them back
+        """
+        if not isinstance(obj_in, dict):
+            obj_in = obj_in.dict(exclude_unset=exclude_unset)
+        return {key: value for key, value in obj_in.items() if key in self.fields}
+
+    def get_changes(
+        self, db_obj: ModelType, obj_in: Union[BaseModel, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Returns the fields of `obj_in` whose values differ from those of `db_obj`"""
+        return {
+            key: value
+            for key, value in self.get_obj_in_data(obj_in, exclude_unset=True).items()
+            if getattr(db_obj, key) != value
+        }
+
     async def get(
         self,
         db: AsyncSession,
@@ -38,6 +95,23 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = await db.execute(statement=statement)
         return obj.scalar_one_or_none()
 
+    async def get_version(
+        self,
+        db: AsyncSession,
+        uuid: Any,
+        *columns: Any,
+        **filters: Any,
+    ) -> Optional[Row]:
+        """Returns the `uuid`, `updated_at` and `columns` of the object with `uuid`
+        matching `filters`, without loading the object. Enough to answer conditional
+        GETs of unchanged objects (see `app.core.responses.make_etag`)"""
+        statement = select(self.model.uuid, self.model.updated_at, *columns).where(
+            self.model.uuid == uuid,
+            *(getattr(self.model, key) == value for key, value in filters.items()),
+        )
+        result = await db.execute(statement=statement)
+        return result.first()
+
     async def get_multi(
         self,
         db: AsyncSession,
@@ -53,7 +127,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return results.scalars().all()  # type: ModelType | None
 
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = self.get_obj_in_data(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
         await db.commit()
@@ -67,14 +141,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        # only changed columns are set, so the UPDATE only includes those columns
+        changes = self.get_changes(db_obj, obj_in)
+        if not changes:
+            return db_obj
+        for field, value in changes.items():
+            setattr(db_obj, field, value)
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
@@ -104,3 +176,6 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.delete(obj)
         await db.commit()
         return obj
+
+
+trace_crud_methods(CRUDBase)
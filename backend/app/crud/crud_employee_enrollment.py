@@ -0,0 +1,384 @@
+import datetime
+import json
+import uuid as uuid_pkg
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+from app import models, schemas
+from app.core import response_cache
+from app.core.config import OAuthScopeType, settings
+from app.utils import (
+    normalize_mobile_number,
+    parse_mobile_number,
+    quantize_monetary_number,
+)
+from pydantic import ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .crud_base import CRUDBase
+
+
+class CRUDEmployeeEnrollment(
+    CRUDBase[
+        models.EmployeeEnrollment,
+        models.EmployeeEnrollmentCreate,
+        models.EmployeeEnrollmentRead,
+    ]
+):
+    async def create(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: models.EmployeeEnrollmentCreate,
+        organization: models.Organization,
+        current_user: models.User,
+    ) -> models.EmployeeEnrollment:
+        """Records a bulk enrollment, to be enrolled with `run`"""
+        policy = await self.get_policy(
+            db, organization=organization, policy_id=obj_in.policy_id
+        )
+        db_obj = models.EmployeeEnrollment(
+            organization_id=organization.uuid,
+            policy_id=policy.uuid if policy else None,
+            created_by_id=current_user.uuid,
+            total_rows=len(obj_in.employees),
+            employees=obj_in.employees,
+        )
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def get(
+        self,
+        db: AsyncSession,
+        uuid: uuid_pkg.UUID,
+        organization_id: uuid_pkg.UUID = None,
+    ) -> Optional[models.EmployeeEnrollment]:
+        stmt = select(self.model).where(self.model.uuid == uuid)
+        if organization_id:
+            stmt = stmt.where(self.model.organization_id == organization_id)
+        obj = await db.execute(statement=stmt)
+        return obj.scalar_one_or_none()
+
+    async def get_policy(
+        self,
+        db: AsyncSession,
+        *,
+        organization: models.Organization,
+        policy_id: Optional[uuid_pkg.UUID] = None,
+    ) -> Optional[models.WalletPolicy]:
+        """Returns the policy `policy_id` of the organization or, if not given, its
+        default (core) policy"""
+        stmt = select(models.WalletPolicy).where(
+            models.WalletPolicy.managing_organization_id == organization.uuid
+        )
+        if policy_id:
+            stmt = stmt.where(models.WalletPolicy.uuid == policy_id)
+        else:
+            stmt = stmt.where(models.WalletPolicy.is_core.is_(True))
+        policy = (await db.execute(stmt.limit(1))).scalar_one_or_none()
+        if policy_id and not policy:
+            raise ValueError("Policy not found in organization")
+        return policy
+
+    async def run(
+        self,
+        db: AsyncSession,
+        *,
+        enrollment: models.EmployeeEnrollment,
+        batch_size: int = None,
+    ) -> models.EmployeeEnrollment:
+        """
+        Enrolls the employees of a bulk enrollment in batches, one transaction per
+        batch. The report and counts of the enrollment are updated as every batch is
+        committed, so progress can be followed and an interrupted enrollment resumes
+        after its last committed batch.
+        """
+        from app import crud
+
+        batch_size = batch_size or settings.EMPLOYEE_ENROLLMENT_BATCH_SIZE
+        if enrollment.status == schemas.JobStatusType.COMPLETED:
+            return enrollment
+        pk = enrollment.pk
+        enrollment.status = schemas.JobStatusType.RUNNING
+        db.add(enrollment)
+        await db.commit()
+        try:
+            organization = await crud.organization.get(
+                db, uuid=enrollment.organization_id
+            )
+            policy = await self.get_policy(
+                db, organization=organization, policy_id=enrollment.policy_id
+            )
+            employees = enrollment.employees or []
+            for start in range(enrollment.processed_rows, len(employees), batch_size):
+                results = await self.enroll_batch(
+                    db,
+                    organization=organization,
+                    policy=policy,
+                    employees=employees[start : start + batch_size],
+                    first_row=start + 1,
+                )
+                await self.add_results(db, enrollment=enrollment, results=results)
+                await response_cache.commit(db)
+        except Exception as e:
+            await db.rollback()
+            await db.execute(
+                update(self.model)
+                .where(self.model.pk == pk)
+                .values(
+                    status=schemas.JobStatusType.FAILED,
+                    error=f"{e}",
+                    completed_at=datetime.datetime.now(datetime.timezone.utc),
+                )
+            )
+            await db.commit()
+            raise
+        await db.execute(
+            update(self.model)
+            .where(self.model.pk == pk)
+            .values(
+                status=schemas.JobStatusType.COMPLETED,
+                employees=None,
+                completed_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+        )
+        await db.commit()
+        await db.refresh(enrollment)
+        return enrollment
+
+    async def add_results(
+        self,
+        db: AsyncSession,
+        *,
+        enrollment: models.EmployeeEnrollment,
+        results: List[models.EmployeeEnrollmentResult],
+    ) -> None:
+        """Appends the results of a batch to the report of the enrollment. The report
+        is appended to in the database, rather than rewritten from memory"""
+        counts = {result_type: 0 for result_type in schemas.EnrollmentResultType}
+        for result in results:
+            counts[result.result] += 1
+        await db.execute(
+            update(self.model)
+            .where(self.model.pk == enrollment.pk)
+            .values(
+                processed_rows=self.model.processed_rows + len(results),
+                users_created=self.model.users_created
+                + counts[schemas.EnrollmentResultType.CREATED],
+                wallets_created=self.model.wallets_created
+                + counts[schemas.EnrollmentResultType.CREATED]
+                + counts[schemas.EnrollmentResultType.ENROLLED],
+                invalid_rows=self.model.invalid_rows
+                + counts[schemas.EnrollmentResultType.INVALID],
+                report=self.model.report.op("||")(
+                    sa.cast(
+                        [json.loads(result.json()) for result in results],
+                        self.model.report.type,
+                    )
+                ),
+                updated_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+        )
+
+    async def enroll_batch(
+        self,
+        db: AsyncSession,
+        *,
+        organization: models.Organization,
+        policy: Optional[models.WalletPolicy],
+        employees: Sequence[Dict[str, Any]],
+        first_row: int = 1,
+    ) -> List[models.EmployeeEnrollmentResult]:
+        """
+        Enrolls a batch of employees and returns the result of every row.
+
+        Rows are validated and normalized in memory, then users and wallets are
+        written with one `INSERT ... ON CONFLICT DO NOTHING` each, executed for the
+        whole batch. Rows whose user or wallet already exists are skipped by the
+        database, so concurrent or repeated enrollments never fail or duplicate.
+        """
+        results: List[models.EmployeeEnrollmentResult] = []
+        valid: Dict[int, models.EmployeeEnrollmentRow] = {}
+        seen: Dict[str, int] = {}
+        region = schemas.OperatingCountryType(organization.country).name
+        for i, employee in enumerate(employees):
+            result = models.EmployeeEnrollmentResult(
+                row=first_row + i, result=schemas.EnrollmentResultType.INVALID
+            )
+            results.append(result)
+            try:
+                row = models.EmployeeEnrollmentRow.parse_obj(
+                    {k: v for k, v in employee.items() if v not in (None, "")}
+                )
+                row.mobile = normalize_mobile_number(row.mobile, region)
+            except ValidationError as e:
+                result.errors = [
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                ]
+                continue
+            except ValueError as e:
+                result.errors = [f"mobile: {e}"]
+                continue
+            result.mobile = row.mobile
+            duplicates = [seen[key] for key in (row.mobile, row.email) if key in seen]
+            if duplicates:
+                result.errors = [f"Duplicate of row {duplicates[0]}"]
+                continue
+            seen.update({key: result.row for key in (row.mobile, row.email) if key})
+            valid[i] = row
+        if not valid:
+            return results
+
+        user_ids = await self.insert_users(db, employees=valid.values())
+        wallet_ids = await self.insert_wallets(
+            db,
+            organization=organization,
+            policy=policy,
+            users={
+                (user_ids[row.mobile][0], user_ids[row.mobile][1], row.mobile)
+                for row in valid.values()
+                if row.mobile in user_ids
+            },
+        )
+        for i, row in valid.items():
+            result = results[i]
+            user = user_ids.get(row.mobile)
+            if not user:
+                result.errors = ["A user with this email already exists"]
+                continue
+            result.user_id, _, is_new_user = user
+            wallet = wallet_ids.get(result.user_id)
+            if not wallet:
+                result.errors = ["Unable to create the wallet of this user"]
+                continue
+            result.wallet_id, is_new_wallet = wallet
+            if is_new_user:
+                result.result = schemas.EnrollmentResultType.CREATED
+            elif is_new_wallet:
+                result.result = schemas.EnrollmentResultType.ENROLLED
+            else:
+                result.result = schemas.EnrollmentResultType.ALREADY_ENROLLED
+        return results
+
+    async def insert_users(
+        self, db: AsyncSession, *, employees: Sequence[models.EmployeeEnrollmentRow]
+    ) -> Dict[str, tuple]:
+        """Creates the users of employees that do not have one and returns
+        `{mobile: (user uuid, full name, is new user)}` for every employee with a
+        user"""
+        now = datetime.datetime.now()
+        rows = [
+            {
+                "uuid": uuid_pkg.uuid4(),
+                "created_at": now,
+                "updated_at": now,
+                "first_name": employee.first_name,
+                "last_name": employee.last_name,
+                "full_name": f"{employee.first_name} {employee.last_name}",
+                "mobile": employee.mobile,
+                "national_mobile_number": parse_mobile_number(
+                    phone_number=employee.mobile, international_format=False
+                ),
+                "email": employee.email,
+                "birth_date": employee.birth_date,
+                "gender": employee.gender,
+                "oauth2_scopes": ",".join([OAuthScopeType.READ_CURRENT_USER]),
+                "is_active": False,
+                "is_superuser": False,
+                "is_identity_verified": False,
+            }
+            for employee in employees
+        ]
+        await db.execute(
+            pg_insert(models.User.__table__).on_conflict_do_nothing(), rows
+        )
+        new_user_ids = {row["uuid"] for row in rows}
+        result = await db.execute(
+            select(models.User.uuid, models.User.full_name, models.User.mobile).where(
+                models.User.mobile.in_([row["mobile"] for row in rows])
+            )
+        )
+        return {
+            mobile: (uuid, full_name, uuid in new_user_ids)
+            for uuid, full_name, mobile in result
+        }
+
+    async def insert_wallets(
+        self,
+        db: AsyncSession,
+        *,
+        organization: models.Organization,
+        policy: Optional[models.WalletPolicy],
+        users: Iterable[Tuple[uuid_pkg.UUID, str, str]],
+    ) -> Dict[uuid_pkg.UUID, tuple]:
+        """Creates the organization managed wallets of `(uuid, full name, mobile)` users
+        that do not have one and returns `{owner uuid: (wallet uuid, is new wallet)}`"""
+        from app import crud
+
+        if not users:
+            return {}
+        now = datetime.datetime.now(datetime.timezone.utc)
+        policy_values = (
+            crud.wallet.get_policy_values(policy)
+            if policy
+            else {
+                "contribution_type": None,
+                "coinsurance": None,
+                "copay_amount": None,
+                "deductible": None,
+                "out_of_pocket_limit": None,
+                "policy_id": None,
+                "policy_name": None,
+            }
+        )
+        rows = [
+            {
+                "uuid": uuid_pkg.uuid4(),
+                "created_at": now,
+                "updated_at": now,
+                "status": schemas.WalletStatusType.CREATED,
+                "currency": organization.default_wallet_currency,
+                "balance": quantize_monetary_number("0.00"),
+                "description": f"{organization.name} healthcare wallet of {owner_id}",
+                "managing_organization_id": organization.uuid,
+                "managing_organization_name": organization.name,
+                "owner_id": owner_id,
+                "owner_name": owner_name,
+                "owner_mobile": owner_mobile,
+                **policy_values,
+            }
+            for owner_id, owner_name, owner_mobile in users
+        ]
+        await db.execute(
+            pg_insert(models.Wallet.__table__).on_conflict_do_nothing(), rows
+        )
+        new_wallet_ids = {row["uuid"] for row in rows}
+        result = await db.execute(
+            select(models.Wallet.uuid, models.Wallet.owner_id).where(
+                models.Wallet.managing_organization_id == organization.uuid,
+                models.Wallet.owner_id.in_([row["owner_id"] for row in rows]),
+            )
+        )
+        wallets = {
+            owner_id: (uuid, uuid in new_wallet_ids) for uuid, owner_id in result
+        }
+        response_cache.invalidate_on_commit(
+            db,
+            *(
+                response_cache.wallets_tag(owner_id)
+                for owner_id, (_, is_new_wallet) in wallets.items()
+                if is_new_wallet
+            ),
+        )
+        return wallets
+
+    async def update(self, *args, **kwargs):
+        raise NotImplementedError("Bulk enrollments are updated as they run")
+
+
+employee_enrollment = CRUDEmployeeEnrollment(models.EmployeeEnrollment)
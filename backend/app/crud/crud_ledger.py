@@ -0,0 +1,213 @@
+import datetime
+import uuid as uuid_pkg
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+import sqlalchemy as sa
+from app import models, schemas
+from app.core import response_cache
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .crud_base import CRUDBase
+
+
+class CRUDLedger(
+    CRUDBase[models.LedgerJournal, models.LedgerJournalCreate, models.LedgerJournalRead]
+):
+    async def post(
+        self,
+        db: AsyncSession,
+        *,
+        journals: Sequence[models.LedgerJournalCreate],
+        allow_overdraft: bool = False,
+        commit: bool = True,
+    ) -> List[uuid_pkg.UUID]:
+        """
+        Posts a batch of journals to the ledger in a single transaction and
+        returns the uuids of the posted journals, in order.
+
+        Journals are validated in memory, the wallets they touch are locked
+        (`SELECT ... FOR UPDATE`, in primary key order so concurrent batches
+        cannot deadlock), journals and entries are written with one batched INSERT
+        per table and wallet balances are set with one `UPDATE ... FROM unnest(...)`.
+        Either every journal in the batch is posted or none is.
+        """
+        if not journals:
+            return []
+        references = [journal.reference for journal in journals]
+        if len(set(references)) != len(references):
+            raise ValueError("Journal references must be unique within a batch")
+        wallet_ids = {
+            entry.wallet_id
+            for journal in journals
+            for entry in journal.entries
+            if entry.wallet_id
+        }
+        try:
+            wallets = await self.lock_wallets(db, wallet_ids=wallet_ids)
+            # Decimal sums of NUMERIC values are already exact, and several times
+            # faster than converting every amount to Money
+            balances = {uuid: wallet.balance for uuid, wallet in wallets.items()}
+            now = datetime.datetime.now(datetime.timezone.utc)
+            journal_rows, entry_rows = [], []
+            for journal in journals:
+                journal_id = uuid_pkg.uuid4()
+                journal_rows.append(
+                    {
+                        "uuid": journal_id,
+                        "created_at": now,
+                        "updated_at": now,
+                        "reference": journal.reference,
+                        "description": journal.description,
+                        "currency": journal.currency,
+                        "mode_of_payment": journal.mode_of_payment,
+                        "payment_channel": journal.payment_channel,
+                        "status": schemas.TransactionStatusType.SUCCESS,
+                        "posted_at": now,
+                    }
+                )
+                for entry in journal.entries:
+                    balance_after = None
+                    if entry.wallet_id:
+                        self.check_wallet(wallets.get(entry.wallet_id), journal, entry)
+                        balance_after = balances[entry.wallet_id] + entry.amount
+                        if balance_after < Decimal(0) and not allow_overdraft:
+                            raise ValueError(
+                                f"Insufficient balance in wallet {entry.wallet_id}"
+                                + f" to post journal {journal.reference}"
+                            )
+                        balances[entry.wallet_id] = balance_after
+                    entry_rows.append(
+                        {
+                            "uuid": uuid_pkg.uuid4(),
+                            "created_at": now,
+                            "updated_at": now,
+                            "journal_id": journal_id,
+                            "account_type": entry.account_type,
+                            "wallet_id": entry.wallet_id,
+                            "currency": journal.currency,
+                            "amount": entry.amount,
+                            "balance_after": balance_after,
+                        }
+                    )
+            await self.insert_rows(
+                db, table=models.LedgerJournal.__table__, rows=journal_rows
+            )
+            await self.insert_rows(
+                db, table=models.LedgerEntry.__table__, rows=entry_rows
+            )
+            await self.set_wallet_balances(db, balances=balances)
+            if commit:
+                await response_cache.commit(db)
+        except IntegrityError:
+            await db.rollback()
+            raise ValueError(
+                "One or more journals in the batch have already been posted"
+            )
+        except Exception:
+            await db.rollback()
+            raise
+        return [row["uuid"] for row in journal_rows]
+
+    @staticmethod
+    def check_wallet(
+        wallet: Optional[sa.engine.Row],
+        journal: models.LedgerJournalCreate,
+        entry: models.LedgerEntryCreate,
+    ) -> None:
+        if not wallet:
+            raise ValueError(f"Wallet {entry.wallet_id} not found")
+        if wallet.currency != journal.currency:
+            raise ValueError(
+                f"Cannot post {journal.currency} journal {journal.reference}"
+                + f" to {wallet.currency} wallet {entry.wallet_id}"
+            )
+        if wallet.status == schemas.WalletStatusType.SUSPENDED:
+            raise ValueError(f"Wallet {entry.wallet_id} is suspended")
+
+    async def lock_wallets(
+        self, db: AsyncSession, *, wallet_ids: Sequence[uuid_pkg.UUID]
+    ) -> Dict[uuid_pkg.UUID, sa.engine.Row]:
+        """Locks the wallets for the rest of the transaction and returns their
+        balance, currency and status"""
+        if not wallet_ids:
+            return {}
+        stmt = (
+            select(
+                models.Wallet.uuid,
+                models.Wallet.balance,
+                models.Wallet.currency,
+                models.Wallet.status,
+            )
+            .where(models.Wallet.uuid.in_(list(wallet_ids)))
+            .order_by(models.Wallet.pk)
+            .with_for_update()
+        )
+        result = await db.execute(stmt)
+        return {row.uuid: row for row in result}
+
+    async def set_wallet_balances(
+        self, db: AsyncSession, *, balances: Dict[uuid_pkg.UUID, Decimal]
+    ) -> None:
+        """Sets the balances of many wallets in a single statement. The new balances
+        are sent as two typed arrays, so the statement has the same two parameters
+        however many wallets are updated. The cached wallets of their owners are
+        invalidated by the next `response_cache.commit`"""
+        if not balances:
+            return
+        result = await db.execute(
+            sa.text(
+                "UPDATE wallets SET balance = new_balances.balance, updated_at = :now"
+                " FROM unnest(CAST(:uuids AS uuid[]), CAST(:balances AS numeric[]))"
+                " AS new_balances (uuid, balance)"
+                " WHERE wallets.uuid = new_balances.uuid"
+                " RETURNING wallets.owner_id"
+            ),
+            {
+                "uuids": list(balances.keys()),
+                "balances": list(balances.values()),
+                "now": datetime.datetime.now(datetime.timezone.utc),
+            },
+        )
+        response_cache.invalidate_on_commit(
+            db, *map(response_cache.wallets_tag, result.scalars().all())
+        )
+
+    async def insert_rows(
+        self, db: AsyncSession, *, table: sa.Table, rows: List[dict]
+    ) -> None:
+        """Inserts rows with a single cached INSERT statement executed for the whole
+        batch. The asyncpg driver prepares it once and pipelines the rows, which is
+        several times faster than compiling a multi-row VALUES statement per batch
+        """
+        await db.execute(insert(table), rows)
+
+    async def get_wallet_entries(
+        self,
+        db: AsyncSession,
+        *,
+        wallet_id: uuid_pkg.UUID,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[models.LedgerEntry]:
+        """Returns the entries posted to a wallet, most recent first"""
+        stmt = (
+            select(models.LedgerEntry)
+            .where(models.LedgerEntry.wallet_id == wallet_id)
+            .order_by(models.LedgerEntry.pk.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def update(self, *args, **kwargs):
+        raise NotImplementedError("Ledger journals are append-only")
+
+    async def remove(self, *args, **kwargs):
+        raise NotImplementedError("Ledger journals are append-only")
+
+
+ledger = CRUDLedger(models.LedgerJournal)
@@ -1,10 +1,12 @@
+import datetime
 import uuid as uuid_pkg
 from typing import Optional
 
 from app import models, schemas
+from app.core import response_cache
+from app.core.celery_app import celery_app
 from app.utils import get_country_currency, quantize_monetary_number
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import or_, select
+from sqlalchemy import or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .crud_base import CRUDBase
@@ -58,7 +60,7 @@ class CRUDOrganization(
             else await crud.user.get_by_uuid(obj_in.owner_id)
         )
         currency = get_country_currency(country=obj_in.country)
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = self.get_obj_in_data(obj_in)
         org_db_obj = models.Organization(
             **obj_in_data,
             owner_first_name=owner.first_name,
@@ -107,6 +109,9 @@ class CRUDOrganization(
             db=db, db_obj=wallet_db_obj, policy_obj=policy_obj, commit=True
         )
         await db.refresh(org_db_obj)
+        await response_cache.invalidate(
+            response_cache.organizations_tag(org_db_obj.owner_id)
+        )
         return org_db_obj
 
     async def get_multi(
@@ -150,7 +155,73 @@ class CRUDOrganization(
         db_obj: models.Organization,
         obj_in: models.OrganizationUpdate,
     ) -> models.Organization:
-        raise NotImplementedError
+        """Updates an organization. Its wallets and policies keep a copy of its name,
+        which the `propagate_organization_name` job brings up to date on renames"""
+        # only the fields set are changed: a field set to None is cleared
+        changes = self.get_changes(
+            db_obj, obj_in.dict(exclude_unset=True, exclude={"updated_at"})
+        )
+        required = [
+            field
+            for field, value in changes.items()
+            if value is None and not self.model.__table__.c[field].nullable
+        ]
+        if required:
+            raise ValueError(
+                f"The {', '.join(required)} of an organization is required"
+            )
+        if "country" in changes:
+            raise ValueError("The country of an organization cannot be changed")
+        if "name" in changes:
+            name_chars = changes["name"].strip().replace(" ", "").lower()
+            results = await db.execute(
+                select(models.Organization.uuid).where(
+                    models.Organization.name_chars == name_chars,
+                    models.Organization.uuid != db_obj.uuid,
+                )
+            )
+            if results.first():
+                raise ValueError("An organization with this name already exists")
+            changes["name_chars"] = name_chars
+        if not changes:
+            return db_obj
+        for field, value in changes.items():
+            setattr(db_obj, field, value)
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        await response_cache.invalidate(
+            response_cache.organizations_tag(db_obj.owner_id)
+        )
+        if "name" in changes:
+            celery_app.send_task(
+                "app.worker.propagate_organization_name", args=[str(db_obj.uuid)]
+            )
+        return db_obj
+
+    async def sync_owner(self, db: AsyncSession, *, owner_id: uuid_pkg.UUID) -> int:
+        """Copies the current name of a user onto the organizations they own"""
+        organization, user = models.Organization, models.User
+        result = await db.execute(
+            update(organization)
+            .where(
+                organization.owner_id == owner_id,
+                user.uuid == organization.owner_id,
+                or_(
+                    organization.owner_first_name.is_distinct_from(user.first_name),
+                    organization.owner_last_name.is_distinct_from(user.last_name),
+                ),
+            )
+            .values(
+                owner_first_name=user.first_name,
+                owner_last_name=user.last_name,
+                updated_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        await response_cache.invalidate(response_cache.organizations_tag(owner_id))
+        return result.rowcount
 
     async def remove(
         self,
@@ -1,16 +1,19 @@
 import datetime
-from typing import List, Optional
+import logging
+from typing import List, Optional, Tuple
 
 from app import models
 from app.core.config import settings
+from app.core.otp_store import get_otp_store
 from app.core.security import generate_otp_code
 from app.utils import ModeOfMessageDelivery
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .crud_base import CRUDBase
 
+logger = logging.getLogger(__name__)
+
 
 class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
     async def create_with_owner(
@@ -28,22 +31,26 @@ class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
             db=db,
             user=user,
             token_type=obj_in.token_type,
-            valid_util=datetime.datetime.now(datetime.timezone.utc)
+            valid_until=datetime.datetime.now(datetime.timezone.utc)
             + datetime.timedelta(minutes=5),
         )
         if db_obj:
             return db_obj
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data, user_id=user.uuid, code=generate_otp_code())
+        obj_in_data = self.get_obj_in_data(obj_in)
+        db_obj = self.model(
+            **obj_in_data,
+            user_id=user.uuid,
+            code=generate_otp_code(),
+            created_at=datetime.datetime.now(datetime.timezone.utc),
+            expires_at=datetime.datetime.now(datetime.timezone.utc)
+            + datetime.timedelta(minutes=settings.OTP_EXPIRE_MINUTES),
+        )
         if obj_in.token_type == models.OTPTypeChoice.PASSWORD_RESET:
             # change the otp code to a unique uuid before persisting to db
             db_obj.code = str(
                 db_obj.uuid
             )  # use the existing uuid which has a unique constraint
-        db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        return await get_otp_store(db).add(db_obj)
 
     async def get_user_otp(
         self,
@@ -52,14 +59,14 @@ class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
         user: models.User,
         token_type: models.OTPTypeChoice,
         code: Optional[str] = None,
-        valid_util: datetime.datetime = datetime.datetime.now(datetime.timezone.utc),
+        valid_until: Optional[datetime.datetime] = None,
     ) -> models.OTP:
         otp = await self.get(
             db=db,
             user_id=user.uuid,
             token_type=token_type,
             code=code,
-            valid_util=valid_util,
+            valid_until=valid_until,
         )
         return otp
 
@@ -67,14 +74,14 @@ class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
         self,
         *,
         db: AsyncSession,
-        uuid: Optional[str] = None,
         code: Optional[str] = None,
         token_type: models.OTPTypeChoice,
         user_id: Optional[str] = None,
-        valid_util: datetime.datetime = datetime.datetime.now(datetime.timezone.utc),
+        valid_until: Optional[datetime.datetime] = None,
     ) -> Optional[models.OTP]:
         """
-        Get an OTP by its uuid and user_id
+        Get an unused OTP of a user by its code (or the user's latest one), which is
+        still valid at `valid_until` (default: now)
         """
         if not (code or user_id):
             raise ValueError(
@@ -82,24 +89,12 @@ class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
             )
         if not isinstance(token_type, models.OTPTypeChoice):
             raise ValueError("Technical error: Invalid token type argument")
-        statement = select(models.OTP).where(
-            models.OTP.token_type == token_type.value,
-            models.OTP.is_used.is_(False),
-            models.OTP.expires_at > valid_util,
+        return await get_otp_store(db).get(
+            token_type=token_type,
+            user_id=user_id,
+            code=code,
+            valid_until=valid_until,
         )
-        if user_id:
-            statement = statement.where(models.OTP.user_id == user_id)
-        if uuid:
-            statement = statement.where(models.OTP.uuid == uuid)
-        if code:
-            statement = statement.where(models.OTP.code == code)
-        statement = statement.order_by(models.OTP.created_at.desc())
-        results = await db.execute(statement=statement)
-        obj: [models.OTP, None] = results.scalars().first()
-        # TODO: check if the otp has expired
-        # if obj and obj.expires_at < datetime.datetime.now(datetime.timezone.utc):
-        #     obj = None
-        return obj
 
     async def get_multi_by_owner(
         self, db: AsyncSession, *, user_id: str, skip: int = 0, limit: int = 100
@@ -155,14 +150,101 @@ class CRUDOtp(CRUDBase[models.OTP, models.OTPCreate, models.OTPRead]):
 
     async def mark_as_used(self, db: AsyncSession, *, otp: models.OTP) -> models.OTP:
         """
-        Mark an OTP as used
+        Mark an OTP as used. Raises a ValueError if it has already been used
         """
-        otp.is_used = True
-        otp.used_at = datetime.datetime.now()
-        db.add(otp)
-        await db.commit()
-        await db.refresh(otp)
+        if not await get_otp_store(db).consume(otp):
+            raise ValueError("Sorry, you have entered an invalid token")
         return otp
 
+    @staticmethod
+    def get_partition_name(day: datetime.date) -> str:
+        """Returns the name of the partition of the otp table for OTPs created on
+        `day` (UTC)"""
+        return f"otp_p{day:%Y%m%d}"
+
+    async def maintain_partitions(
+        self, db: AsyncSession, *, today: Optional[datetime.date] = None
+    ) -> Tuple[int, int]:
+        """
+        Creates the daily partitions of the otp table for the next
+        `OTP_PARTITIONS_AHEAD_DAYS` days and drops the partitions (and purges the
+        rows of the default partition) older than `OTP_RETENTION_DAYS`, one
+        partition per transaction. Returns the number of partitions created and
+        dropped.
+
+        OTPs created on days without a partition (if the job has not run for a while)
+        land in the default partition, and their day's partition is not created.
+        """
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        cutoff = today - datetime.timedelta(days=settings.OTP_RETENTION_DAYS)
+        results = await db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i"
+                " JOIN pg_class c ON c.oid = i.inhrelid"
+                " WHERE i.inhparent = 'otp'::regclass"
+            )
+        )
+        partitions = {}
+        for (name,) in results:
+            try:
+                day = datetime.datetime.strptime(name, "otp_p%Y%m%d").date()
+            except ValueError:
+                continue  # the default partition
+            partitions[day] = name
+        created, dropped = 0, 0
+        for day in sorted(day for day in partitions if day < cutoff):
+            await self.set_lock_timeout(db)
+            await db.execute(text(f'DROP TABLE "{partitions[day]}"'))
+            await db.commit()
+            dropped += 1
+        await db.execute(
+            text("DELETE FROM otp_default WHERE created_at < :cutoff"),
+            {"cutoff": get_utc_midnight(cutoff)},
+        )
+        await db.commit()
+        for i in range(settings.OTP_PARTITIONS_AHEAD_DAYS + 1):
+            day = today + datetime.timedelta(days=i)
+            if day in partitions:
+                continue
+            start = get_utc_midnight(day)
+            end = get_utc_midnight(day + datetime.timedelta(days=1))
+            in_default = await db.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM otp_default"
+                    " WHERE created_at >= :start AND created_at < :end)"
+                ),
+                {"start": start, "end": end},
+            )
+            if in_default.scalar():
+                logger.warning(
+                    "OTPs created on %s are in the default otp partition;"
+                    + " not creating its partition",
+                    day,
+                )
+                continue
+            await self.set_lock_timeout(db)
+            await db.execute(
+                text(
+                    f'CREATE TABLE "{self.get_partition_name(day)}" PARTITION OF otp'
+                    + f" FOR VALUES FROM ('{start.isoformat()}')"
+                    + f" TO ('{end.isoformat()}')"
+                )
+            )
+            await db.commit()
+            created += 1
+        return created, dropped
+
+    async def set_lock_timeout(self, db: AsyncSession) -> None:
+        await db.execute(
+            text(
+                "SET LOCAL lock_timeout ="
+                + f" {int(settings.OTP_PARTITION_LOCK_TIMEOUT_MS)}"
+            )
+        )
+
+
+def get_utc_midnight(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+
 
 otp = CRUDOtp(models.OTP)
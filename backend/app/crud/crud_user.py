@@ -3,13 +3,14 @@ import uuid as uuid_pkg
 from typing import Any, Dict, Optional, Union
 
 from app import models
+from app.core.celery_app import celery_app
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.models.user import User, UserCreate, UserUpdate
 from app.utils import (
     ModeOfMessageDelivery,
     check_password,
-    mailgun_client,
+    get_mailgun_client,
     make_password,
     send_sms,
 )
@@ -95,11 +96,24 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        if update_data["password"]:
+        if update_data.get("password"):
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
+        if "first_name" in update_data or "last_name" in update_data:
+            first_name = update_data.get("first_name") or db_obj.first_name
+            last_name = update_data.get("last_name") or db_obj.last_name
+            update_data["full_name"] = f"{first_name} {last_name}"
+        # wallets and organizations keep a copy of the user's name and mobile number
+        propagate = bool(
+            {"first_name", "last_name", "full_name", "mobile"}
+            & self.get_changes(db_obj, update_data).keys()
+        )
         updated_user = await super().update(db, db_obj=db_obj, obj_in=update_data)
+        if propagate:
+            celery_app.send_task(
+                "app.worker.propagate_user_details", args=[str(updated_user.uuid)]
+            )
         return updated_user
 
     async def change_password(
@@ -122,10 +136,11 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         user: models.User = await self.get(db=db, uuid=otp.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        # the token is used up before the password changes, so it only works once
+        await crud.otp.mark_as_used(db=db, otp=otp)
         user.password = make_password(new_password)
         await db.commit()
         await db.refresh(user)
-        crud.otp.mark_as_used(db=db, otp=otp)
         return user
 
     async def authenticate(
@@ -187,7 +202,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         elif mode == ModeOfMessageDelivery.EMAIL:
             message_delivery_status = False
             response = None
-            client_response = mailgun_client.send(
+            client_response = get_mailgun_client().send(
                 recipients=[user.email],
                 subject=subject,
                 template=template,
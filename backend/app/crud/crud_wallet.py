@@ -1,14 +1,27 @@
+import datetime
+import logging
 import uuid as uuid_pkg
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
+import sqlalchemy as sa
 from app import models, schemas
+from app.core import response_cache
+from app.core.config import settings
 from app.utils import quantize_monetary_number
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .crud_base import CRUDBase
 
+logger = logging.getLogger(__name__)
+# the SQLSTATE of statements which gave up waiting for locks (`lock_timeout`)
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def is_lock_timeout(error: DBAPIError) -> bool:
+    return getattr(error.orig, "sqlstate", None) == LOCK_NOT_AVAILABLE
+
 
 class CRUDWallet(CRUDBase[models.Wallet, models.WalletCreate, models.WalletRead]):
     async def create(
@@ -43,7 +56,7 @@ class CRUDWallet(CRUDBase[models.Wallet, models.WalletCreate, models.WalletRead]
                 + " managing_organization already exists"
             )
 
-        obj_in_data: models.WalletCreate = jsonable_encoder(obj_in)
+        obj_in_data = self.get_obj_in_data(obj_in)
         db_obj = models.Wallet(
             **obj_in_data,
             balance=balance,
@@ -56,6 +69,7 @@ class CRUDWallet(CRUDBase[models.Wallet, models.WalletCreate, models.WalletRead]
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        await response_cache.invalidate(response_cache.wallets_tag(db_obj.owner_id))
         return db_obj
 
     async def get_multi(
@@ -104,13 +118,171 @@ class CRUDWallet(CRUDBase[models.Wallet, models.WalletCreate, models.WalletRead]
             )
         if db_obj.currency != policy_obj.currency:
             raise ValueError("Cannot apply policy to wallet of a different currency")
-        db_obj.contribution_type = policy_obj.contribution_type
+        for field, value in self.get_policy_values(policy_obj).items():
+            setattr(db_obj, field, value)
+        if not commit:
+            return db_obj
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        await response_cache.invalidate(response_cache.wallets_tag(db_obj.owner_id))
+        return db_obj
+
+    async def apply_policy_bulk(
+        self,
+        db: AsyncSession,
+        *,
+        policy_obj: models.WalletPolicy,
+        wallet_filter: models.WalletPolicyApply = None,
+        batch_size: int = None,
+        commit: bool = True,
+    ) -> models.WalletPolicyApplyRead:
+        """
+        Applies a policy to the wallets of its organization selected by
+        `wallet_filter`, in chunks of `batch_size` wallets (see `apply_policy_chunk`).
+        With `commit`, every chunk is committed as it is applied. Otherwise, commit
+        with `response_cache.commit` to invalidate the cached wallets of the owners.
+        Chunks whose wallets stay locked by other writers are skipped and counted
+        as `locked`, so the report tells which wallets were left as they were.
+        """
+        # raises on unrecognized contribution types, as `apply_policy` does
+        self.get_policy_values(policy_obj)
+        report = models.WalletPolicyApplyRead(policy_id=policy_obj.uuid)
+        after_pk = 0
+        while after_pk is not None:
+            chunk, after_pk = await self.apply_policy_chunk(
+                db,
+                policy_obj=policy_obj,
+                wallet_filter=wallet_filter,
+                after_pk=after_pk,
+                batch_size=batch_size,
+            )
+            report.matched += chunk.matched
+            report.updated += chunk.updated
+            report.currency_mismatch += chunk.currency_mismatch
+            report.locked += chunk.locked
+            if commit:
+                await response_cache.commit(db)
+        return report
+
+    async def apply_policy_chunk(
+        self,
+        db: AsyncSession,
+        *,
+        policy_obj: models.WalletPolicy,
+        wallet_filter: models.WalletPolicyApply = None,
+        after_pk: int = 0,
+        batch_size: int = None,
+    ) -> Tuple[models.WalletPolicyApplyRead, Optional[int]]:
+        """
+        Applies a policy to the next `batch_size` wallets selected by `wallet_filter`
+        after the wallet with primary key `after_pk`. Returns the counts of the chunk
+        and the primary key to continue after, or None once every wallet is done.
+
+        The chunk is a single `UPDATE wallets ... FROM healthcare_policies`: the
+        policy terms are copied by the database and the managing organization and
+        currency checks of `apply_policy` are predicates of the statement. Wallets
+        already carrying the policy terms are not rewritten. The statement gives up
+        after `WALLET_POLICY_LOCK_TIMEOUT_MS` waiting for row locks, rather than
+        queueing behind (and blocking) other writers of the wallets; the chunk is
+        then rolled back to a savepoint and its wallets counted as `locked`. The
+        cached wallets of the owners of updated wallets are invalidated by the next
+        `response_cache.commit`.
+        """
+        wallet_filter = wallet_filter or models.WalletPolicyApply()
+        batch_size = batch_size or settings.WALLET_POLICY_BATCH_SIZE
+        wallet, policy = models.Wallet, models.WalletPolicy
+        values = {
+            "contribution_type": policy.contribution_type,
+            "coinsurance": sa.case(
+                (
+                    policy.contribution_type
+                    == schemas.PaymentContributionType.COINSURANCE,
+                    policy.coinsurance,
+                ),
+                else_=None,
+            ),
+            "copay_amount": sa.case(
+                (
+                    policy.contribution_type == schemas.PaymentContributionType.COPAY,
+                    policy.copay_amount,
+                ),
+                else_=None,
+            ),
+            "deductible": policy.deductible,
+            "out_of_pocket_limit": policy.out_of_pocket_limit,
+            "policy_id": policy.uuid,
+            "policy_name": policy.name,
+        }
+        selected = select(wallet.pk, wallet.currency).where(
+            wallet.managing_organization_id == policy_obj.managing_organization_id,
+            wallet.pk > after_pk,
+        )
+        if wallet_filter.wallet_ids is not None:
+            selected = selected.where(wallet.uuid.in_(wallet_filter.wallet_ids))
+        if wallet_filter.current_policy_id:
+            selected = selected.where(
+                wallet.policy_id == wallet_filter.current_policy_id
+            )
+        if wallet_filter.status:
+            selected = selected.where(wallet.status == wallet_filter.status)
+        chunk = (await db.execute(selected.order_by(wallet.pk).limit(batch_size))).all()
+        report = models.WalletPolicyApplyRead(policy_id=policy_obj.uuid)
+        if not chunk:
+            return report, None
+        pks = [pk for pk, _ in chunk]
+        after_pk = pks[-1] if len(chunk) == batch_size else None
+        report.matched = len(chunk)
+        report.currency_mismatch = sum(
+            currency != policy_obj.currency for _, currency in chunk
+        )
+        await self.set_lock_timeout(db)
+        statement = (
+            sa.update(wallet)
+            .where(
+                wallet.pk.in_(pks),
+                policy.uuid == policy_obj.uuid,
+                wallet.managing_organization_id == policy.managing_organization_id,
+                wallet.currency == policy.currency,
+                sa.or_(
+                    *(
+                        getattr(wallet, field).is_distinct_from(value)
+                        for field, value in values.items()
+                    )
+                ),
+            )
+            .values(**values, updated_at=datetime.datetime.now(datetime.timezone.utc))
+            .returning(wallet.owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with db.begin_nested():
+                owner_ids = (await db.execute(statement)).scalars().all()
+        except DBAPIError as e:
+            if not is_lock_timeout(e):
+                raise
+            logger.warning(
+                f"Wallets {pks[0]} to {pks[-1]} locked, policy {policy_obj.uuid}"
+                + " not applied to them"
+            )
+            report.locked = len(chunk) - report.currency_mismatch
+            return report, after_pk
+        response_cache.invalidate_on_commit(
+            db, *map(response_cache.wallets_tag, owner_ids)
+        )
+        report.updated = len(owner_ids)
+        return report, after_pk
+
+    @staticmethod
+    def get_policy_values(policy_obj: models.WalletPolicy) -> Dict[str, Any]:
+        """Returns the wallet fields set by applying a policy"""
+        values = {"contribution_type": policy_obj.contribution_type}
         if policy_obj.contribution_type == schemas.PaymentContributionType.COINSURANCE:
-            db_obj.copay_amount = None
-            db_obj.coinsurance = policy_obj.coinsurance
+            values["copay_amount"] = None
+            values["coinsurance"] = policy_obj.coinsurance
         elif policy_obj.contribution_type == schemas.PaymentContributionType.COPAY:
-            db_obj.coinsurance = None
-            db_obj.copay_amount = policy_obj.copay_amount
+            values["coinsurance"] = None
+            values["copay_amount"] = policy_obj.copay_amount
         else:
             # if this case is true,
             # then there's a new type that hasn't been properly accounted for
@@ -120,16 +292,134 @@ class CRUDWallet(CRUDBase[models.Wallet, models.WalletCreate, models.WalletRead]
                 "Technical error. Unrecognized payment contribution type."
                 + " Please contact developers"
             )
-        db_obj.deductible = policy_obj.deductible
-        db_obj.out_of_pocket_limit = policy_obj.out_of_pocket_limit
-        db_obj.policy_id = policy_obj.uuid
-        db_obj.policy_name = policy_obj.name
-        if not commit:
-            return db_obj
-        db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        values["deductible"] = policy_obj.deductible
+        values["out_of_pocket_limit"] = policy_obj.out_of_pocket_limit
+        values["policy_id"] = policy_obj.uuid
+        values["policy_name"] = policy_obj.name
+        return values
+
+    async def set_lock_timeout(self, db: AsyncSession) -> None:
+        """Makes the statements of the current transaction give up after
+        `WALLET_POLICY_LOCK_TIMEOUT_MS` waiting for row locks, rather than queueing
+        behind (and blocking) other writers of the wallets"""
+        await db.execute(
+            sa.text(
+                f"SET LOCAL lock_timeout = {int(settings.WALLET_POLICY_LOCK_TIMEOUT_MS)}"
+            )
+        )
+
+    async def copy_denormalized_chunk(
+        self,
+        db: AsyncSession,
+        *,
+        where: sa.sql.ColumnElement,
+        source: sa.sql.ColumnElement,
+        values: Dict[str, sa.sql.ColumnElement],
+        after_pk: int = 0,
+        batch_size: int = None,
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Copies `values` from the rows joined by `source` onto the next `batch_size`
+        wallets selected by `where` after the wallet with primary key `after_pk`.
+        Returns the number of wallets updated and the primary key to continue after,
+        or None once every wallet is done. Wallets whose copies are already current
+        are not rewritten; the cached wallets of the owners of the others are
+        invalidated by the next `response_cache.commit`.
+        """
+        batch_size = batch_size or settings.DENORMALIZED_FIELDS_BATCH_SIZE
+        wallet = models.Wallet
+        pks = (
+            (
+                await db.execute(
+                    select(wallet.pk)
+                    .where(where, wallet.pk > after_pk)
+                    .order_by(wallet.pk)
+                    .limit(batch_size)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        if not pks:
+            return 0, None
+        await self.set_lock_timeout(db)
+        result = await db.execute(
+            sa.update(wallet)
+            .where(
+                wallet.pk.in_(pks),
+                source,
+                sa.or_(
+                    *(
+                        getattr(wallet, field).is_distinct_from(value)
+                        for field, value in values.items()
+                    )
+                ),
+            )
+            .values(**values, updated_at=datetime.datetime.now(datetime.timezone.utc))
+            .returning(wallet.owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        owner_ids = result.scalars().all()
+        response_cache.invalidate_on_commit(
+            db, *map(response_cache.wallets_tag, owner_ids)
+        )
+        return len(owner_ids), pks[-1] if len(pks) == batch_size else None
+
+    async def copy_denormalized(
+        self,
+        db: AsyncSession,
+        *,
+        where: sa.sql.ColumnElement,
+        source: sa.sql.ColumnElement,
+        values: Dict[str, sa.sql.ColumnElement],
+        batch_size: int = None,
+    ) -> int:
+        """Copies `values` onto every wallet selected by `where`, committing every
+        chunk of wallets (see `copy_denormalized_chunk`) as it is updated"""
+        updated, after_pk = 0, 0
+        while after_pk is not None:
+            chunk_updated, after_pk = await self.copy_denormalized_chunk(
+                db,
+                where=where,
+                source=source,
+                values=values,
+                after_pk=after_pk,
+                batch_size=batch_size,
+            )
+            await response_cache.commit(db)
+            updated += chunk_updated
+        return updated
+
+    async def sync_owner(
+        self, db: AsyncSession, *, owner_id: uuid_pkg.UUID, batch_size: int = None
+    ) -> int:
+        """Copies the current name and mobile number of a user onto their wallets"""
+        return await self.copy_denormalized(
+            db,
+            where=models.Wallet.owner_id == owner_id,
+            source=models.User.uuid == models.Wallet.owner_id,
+            values={
+                "owner_name": models.User.full_name,
+                "owner_mobile": models.User.mobile,
+            },
+            batch_size=batch_size,
+        )
+
+    async def sync_managing_organization(
+        self,
+        db: AsyncSession,
+        *,
+        organization_id: uuid_pkg.UUID,
+        batch_size: int = None,
+    ) -> int:
+        """Copies the current name of an organization onto the wallets it manages"""
+        return await self.copy_denormalized(
+            db,
+            where=models.Wallet.managing_organization_id == organization_id,
+            source=models.Organization.uuid == models.Wallet.managing_organization_id,
+            values={"managing_organization_name": models.Organization.name},
+            batch_size=batch_size,
+        )
 
     async def remove(
         self,
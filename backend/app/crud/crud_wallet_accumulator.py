@@ -0,0 +1,288 @@
+import datetime
+import logging
+import uuid as uuid_pkg
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app import models
+from app.core.config import settings
+from app.utils import Money, get_plan_period
+from app.utils.adjudication import Accumulators, adjudicate, get_policy_arrays
+from app.utils.money import from_minor_units, to_minor_units
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .crud_base import CRUDBase
+
+logger = logging.getLogger(__name__)
+
+AccumulatorKey = Tuple[uuid_pkg.UUID, datetime.date]
+
+
+class CRUDWalletAccumulator(
+    CRUDBase[
+        models.WalletAccumulator,
+        models.WalletAccumulator,
+        models.WalletAccumulatorRead,
+    ]
+):
+    async def get_for_period(
+        self,
+        db: AsyncSession,
+        *,
+        wallet_id: uuid_pkg.UUID,
+        day: Optional[datetime.date] = None,
+    ) -> models.WalletAccumulatorRead:
+        """Returns the accumulator of a wallet for the plan year `day` falls in"""
+        period_start, period_end = get_plan_period(day or datetime.date.today())
+        stmt = select(models.WalletAccumulator).where(
+            models.WalletAccumulator.wallet_id == wallet_id,
+            models.WalletAccumulator.period_start == period_start,
+        )
+        accumulator = (await db.execute(stmt)).scalar_one_or_none()
+        if accumulator:
+            return models.WalletAccumulatorRead.from_orm(accumulator)
+        return models.WalletAccumulatorRead(
+            wallet_id=wallet_id,
+            period_start=period_start,
+            period_end=period_end,
+            deductible_met=Money(0).to_decimal(),
+            out_of_pocket_met=Money(0).to_decimal(),
+            bills_settled=0,
+        )
+
+    async def get_multi_by_keys(
+        self, db: AsyncSession, *, keys: Sequence[AccumulatorKey]
+    ) -> Dict[AccumulatorKey, models.WalletAccumulator]:
+        stmt = select(models.WalletAccumulator).where(
+            models.WalletAccumulator.wallet_id.in_(
+                {wallet_id for wallet_id, _ in keys}
+            ),
+            models.WalletAccumulator.period_start.in_({start for _, start in keys}),
+        )
+        result = await db.execute(stmt)
+        return {
+            (accumulator.wallet_id, accumulator.period_start): accumulator
+            for accumulator in result.scalars()
+        }
+
+    async def lock_wallets(
+        self, db: AsyncSession, *, wallet_ids: Sequence[uuid_pkg.UUID]
+    ) -> Dict[uuid_pkg.UUID, models.Wallet]:
+        """Locks the wallets, in primary key order, for the rest of the transaction"""
+        stmt = (
+            select(models.Wallet)
+            .where(models.Wallet.uuid.in_(list(wallet_ids)))
+            .order_by(models.Wallet.pk)
+            .with_for_update()
+        )
+        result = await db.execute(stmt)
+        return {wallet.uuid: wallet for wallet in result.scalars()}
+
+    async def settle(
+        self,
+        db: AsyncSession,
+        *,
+        bills: Sequence[models.BillSettlementCreate],
+        commit: bool = True,
+    ) -> List[models.BillSettlementRead]:
+        """
+        Settles a batch of bills: splits every bill between the wallet holder and the
+        payer with the cost-sharing engine, records the settlements and updates the
+        accumulators of the wallets, in a single transaction.
+
+        The wallets billed are locked while their accumulators are read and written,
+        so concurrent settlements of the same wallet are applied one after the other.
+        """
+        if not bills:
+            return []
+        references = [bill.reference for bill in bills]
+        if len(set(references)) != len(references):
+            raise ValueError("Bill references must be unique within a batch")
+        today = datetime.date.today()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            wallets = await self.lock_wallets(
+                db, wallet_ids={bill.wallet_id for bill in bills}
+            )
+            # bills count towards the accumulator of their wallet and plan year
+            keys: Dict[AccumulatorKey, int] = {}
+            key_index, service_dates = [], []
+            for bill in bills:
+                if bill.wallet_id not in wallets:
+                    raise ValueError(f"Wallet {bill.wallet_id} not found")
+                service_dates.append(bill.service_date or today)
+                period_start, _ = get_plan_period(service_dates[-1])
+                key = (bill.wallet_id, period_start)
+                key_index.append(keys.setdefault(key, len(keys)))
+            accumulators = await self.get_multi_by_keys(db, keys=list(keys))
+            met = [accumulators.get(key) for key in keys]
+            result = adjudicate(
+                key_index,
+                to_minor_units(bill.amount for bill in bills),
+                get_policy_arrays([wallets[wallet_id] for wallet_id, _ in keys]),
+                Accumulators(
+                    to_minor_units(a.deductible_met if a else 0 for a in met),
+                    to_minor_units(a.out_of_pocket_met if a else 0 for a in met),
+                ),
+            )
+            patient = from_minor_units(result.patient)
+            payer = from_minor_units(result.payer)
+            deductible = from_minor_units(result.deductible)
+            settlements = [
+                {
+                    "uuid": uuid_pkg.uuid4(),
+                    "created_at": now,
+                    "updated_at": now,
+                    "reference": bill.reference,
+                    "wallet_id": bill.wallet_id,
+                    "description": bill.description,
+                    "currency": wallets[bill.wallet_id].currency,
+                    "amount": bill.amount,
+                    "patient_amount": patient[i],
+                    "payer_amount": payer[i],
+                    "deductible_amount": deductible[i],
+                    "service_date": service_dates[i],
+                    "period_start": get_plan_period(service_dates[i])[0],
+                    "settled_at": now,
+                }
+                for i, bill in enumerate(bills)
+            ]
+            await db.execute(insert(models.BillSettlement.__table__), settlements)
+
+            bills_settled = [0] * len(keys)
+            for i in key_index:
+                bills_settled[i] += 1
+            deductible_met = from_minor_units(result.accumulators.deductible_met)
+            out_of_pocket_met = from_minor_units(result.accumulators.out_of_pocket_met)
+            await self.upsert(
+                db,
+                rows=[
+                    {
+                        "wallet_id": wallet_id,
+                        "period_start": period_start,
+                        "deductible_met": deductible_met[i],
+                        "out_of_pocket_met": out_of_pocket_met[i],
+                        "bills_settled": (met[i].bills_settled if met[i] else 0)
+                        + bills_settled[i],
+                    }
+                    for i, (wallet_id, period_start) in enumerate(keys)
+                ],
+            )
+            if commit:
+                await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise ValueError("One or more bills in the batch have already been settled")
+        except Exception:
+            await db.rollback()
+            raise
+        return [models.BillSettlementRead(**settlement) for settlement in settlements]
+
+    async def upsert(self, db: AsyncSession, *, rows: List[dict]) -> None:
+        """Inserts or overwrites the accumulators of (wallet_id, period_start) pairs"""
+        if not rows:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for row in rows:
+            row.setdefault("uuid", uuid_pkg.uuid4())
+            row.setdefault("period_end", get_plan_period(row["period_start"])[1])
+            row.setdefault("created_at", now)
+            row.setdefault("updated_at", now)
+        stmt = pg_insert(models.WalletAccumulator.__table__)
+        stmt = stmt.on_conflict_do_update(
+            constraint="wallet_accumulator__wallet_period_uc",
+            set_={
+                "deductible_met": stmt.excluded.deductible_met,
+                "out_of_pocket_met": stmt.excluded.out_of_pocket_met,
+                "bills_settled": stmt.excluded.bills_settled,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt, rows)
+
+    async def reconcile(self, db: AsyncSession, *, batch_size: int = None) -> int:
+        """
+        Rebuilds the accumulators of every wallet from its bill settlements and
+        returns the number of accumulators that had drifted and were corrected.
+        Wallets are locked and reconciled in batches, one transaction per batch.
+        """
+        batch_size = batch_size or settings.WALLET_ACCUMULATOR_BATCH_SIZE
+        after_pk, corrected = 0, 0
+        while True:
+            locked = await db.execute(
+                select(models.Wallet.pk, models.Wallet.uuid)
+                .where(models.Wallet.pk > after_pk)
+                .order_by(models.Wallet.pk)
+                .limit(batch_size)
+                .with_for_update()
+            )
+            wallets = locked.all()
+            if not wallets:
+                return corrected
+            wallet_ids = [wallet.uuid for wallet in wallets]
+            history = await db.execute(
+                select(
+                    models.BillSettlement.wallet_id,
+                    models.BillSettlement.period_start,
+                    func.sum(models.BillSettlement.deductible_amount),
+                    func.sum(models.BillSettlement.patient_amount),
+                    func.count(),
+                )
+                .where(models.BillSettlement.wallet_id.in_(wallet_ids))
+                .group_by(
+                    models.BillSettlement.wallet_id,
+                    models.BillSettlement.period_start,
+                )
+            )
+            expected = {
+                (wallet_id, period_start): tuple(totals)
+                for wallet_id, period_start, *totals in history
+            }
+            current = await db.execute(
+                select(models.WalletAccumulator).where(
+                    models.WalletAccumulator.wallet_id.in_(wallet_ids)
+                )
+            )
+            zero = Money(0).to_decimal()
+            actual = {
+                (a.wallet_id, a.period_start): (
+                    a.deductible_met,
+                    a.out_of_pocket_met,
+                    a.bills_settled,
+                )
+                for a in current.scalars()
+            }
+            drifted = [
+                {
+                    "wallet_id": wallet_id,
+                    "period_start": period_start,
+                    "deductible_met": totals[0],
+                    "out_of_pocket_met": totals[1],
+                    "bills_settled": totals[2],
+                }
+                for (wallet_id, period_start), totals in (
+                    {key: (zero, zero, 0) for key in actual} | expected
+                ).items()
+                if actual.get((wallet_id, period_start)) != totals
+            ]
+            for row in drifted:
+                logger.warning(
+                    "Wallet accumulator %s/%s drifted from its bill settlements: %s",
+                    row["wallet_id"],
+                    row["period_start"],
+                    actual.get((row["wallet_id"], row["period_start"])),
+                )
+            await self.upsert(db, rows=drifted)
+            await db.commit()
+            corrected += len(drifted)
+            if len(wallets) < batch_size:
+                return corrected
+            after_pk = wallets[-1].pk
+
+    async def update(self, *args, **kwargs):
+        raise NotImplementedError("Wallet accumulators are updated by settling bills")
+
+
+wallet_accumulator = CRUDWalletAccumulator(models.WalletAccumulator)
@@ -0,0 +1,181 @@
+import datetime
+import uuid as uuid_pkg
+from decimal import Decimal
+from typing import Optional
+
+import sqlalchemy as sa
+from app import models
+from app.core.config import settings
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .crud_base import CRUDBase
+
+# latest snapshot and tail of entries after it, for every wallet in a range of pks.
+# Both lateral subqueries are index range scans, so the cost of a run grows with the
+# number of wallets and of new entries, not with the size of the ledger
+_COMPACTION_CANDIDATES = sa.text(
+    """
+    SELECT w.uuid AS wallet_id,
+        s.balance AS snapshot_balance, tail.entry_count, tail.amount,
+        tail.opening_balance, tail.last_entry_pk, tail.as_of
+    FROM (
+        SELECT pk, uuid FROM wallets WHERE pk BETWEEN :first_pk AND :last_pk
+    ) AS w
+    LEFT JOIN LATERAL (
+        SELECT balance, last_entry_pk FROM wallet_balance_snapshots
+        WHERE wallet_id = w.uuid ORDER BY last_entry_pk DESC LIMIT 1
+    ) AS s ON true
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS entry_count, sum(amount) AS amount,
+            (array_agg(balance_after - amount ORDER BY pk))[1] AS opening_balance,
+            max(pk) AS last_entry_pk, max(created_at) AS as_of
+        FROM ledger_entries
+        WHERE wallet_id = w.uuid AND pk > coalesce(s.last_entry_pk, 0)
+    ) AS tail
+    """
+)
+
+
+class CRUDWalletBalance(
+    CRUDBase[
+        models.WalletBalanceSnapshot,
+        models.WalletBalanceSnapshot,
+        models.WalletBalanceRead,
+    ]
+):
+    async def get_latest_snapshot(
+        self,
+        db: AsyncSession,
+        *,
+        wallet_id: uuid_pkg.UUID,
+        as_of: Optional[datetime.datetime] = None,
+    ) -> Optional[models.WalletBalanceSnapshot]:
+        stmt = select(models.WalletBalanceSnapshot).where(
+            models.WalletBalanceSnapshot.wallet_id == wallet_id
+        )
+        if as_of:
+            stmt = stmt.where(models.WalletBalanceSnapshot.as_of <= as_of).order_by(
+                models.WalletBalanceSnapshot.as_of.desc(),
+                models.WalletBalanceSnapshot.last_entry_pk.desc(),
+            )
+        else:
+            stmt = stmt.order_by(models.WalletBalanceSnapshot.last_entry_pk.desc())
+        result = await db.execute(stmt.limit(1))
+        return result.scalars().first()
+
+    async def get_opening_balance(
+        self, db: AsyncSession, *, wallet: models.Wallet
+    ) -> Decimal:
+        """Returns the balance of a wallet before its first ledger entry"""
+        stmt = (
+            select(models.LedgerEntry.balance_after - models.LedgerEntry.amount)
+            .where(models.LedgerEntry.wallet_id == wallet.uuid)
+            .order_by(models.LedgerEntry.pk)
+            .limit(1)
+        )
+        opening_balance = (await db.execute(stmt)).scalar()
+        return wallet.balance if opening_balance is None else opening_balance
+
+    async def get_balance(
+        self,
+        db: AsyncSession,
+        *,
+        wallet: models.Wallet,
+        as_of: Optional[datetime.datetime] = None,
+    ) -> models.WalletBalanceRead:
+        """
+        Returns the balance of a wallet, currently or as of a point in time,
+        as its latest snapshot plus the ledger entries posted after it.
+        """
+        snapshot = await self.get_latest_snapshot(
+            db, wallet_id=wallet.uuid, as_of=as_of
+        )
+        stmt = select(
+            func.count(models.LedgerEntry.pk), func.sum(models.LedgerEntry.amount)
+        ).where(models.LedgerEntry.wallet_id == wallet.uuid)
+        if snapshot:
+            stmt = stmt.where(models.LedgerEntry.pk > snapshot.last_entry_pk)
+        if as_of:
+            stmt = stmt.where(models.LedgerEntry.created_at <= as_of)
+        tail_entries, tail_amount = (await db.execute(stmt)).one()
+        if snapshot:
+            balance = snapshot.balance
+        else:
+            balance = await self.get_opening_balance(db, wallet=wallet)
+        return models.WalletBalanceRead(
+            wallet_id=wallet.uuid,
+            balance=balance + (tail_amount or Decimal(0)),
+            as_of=as_of,
+            snapshot_as_of=snapshot.as_of if snapshot else None,
+            tail_entries=tail_entries,
+        )
+
+    async def compact(
+        self,
+        db: AsyncSession,
+        *,
+        min_entries: int = None,
+        batch_size: int = None,
+    ) -> int:
+        """
+        Rolls the ledger entries posted since each wallet's last snapshot into a new
+        snapshot, for wallets with at least `min_entries` such entries.
+        Wallets are scanned in batches of `batch_size`, one transaction per batch,
+        so an interrupted run keeps its progress. Returns the number of snapshots taken.
+
+        The wallets of a batch are locked `FOR SHARE` before their entries are read:
+        postings lock wallets `FOR UPDATE`, so no entry can commit behind a snapshot.
+        """
+        min_entries = min_entries or settings.WALLET_SNAPSHOT_MIN_ENTRIES
+        batch_size = batch_size or settings.WALLET_SNAPSHOT_BATCH_SIZE
+        after_pk, taken = 0, 0
+        while True:
+            locked = await db.execute(
+                select(models.Wallet.pk)
+                .where(models.Wallet.pk > after_pk)
+                .order_by(models.Wallet.pk)
+                .limit(batch_size)
+                .with_for_update(read=True)
+            )
+            wallet_pks = locked.scalars().all()
+            if not wallet_pks:
+                return taken
+            result = await db.execute(
+                _COMPACTION_CANDIDATES,
+                {"first_pk": wallet_pks[0], "last_pk": wallet_pks[-1]},
+            )
+            rows = result.all()
+            now = datetime.datetime.now(datetime.timezone.utc)
+            snapshots = [
+                {
+                    "created_at": now,
+                    "wallet_id": row.wallet_id,
+                    "balance": (
+                        row.opening_balance
+                        if row.snapshot_balance is None
+                        else row.snapshot_balance
+                    )
+                    + row.amount,
+                    "last_entry_pk": row.last_entry_pk,
+                    "entry_count": row.entry_count,
+                    "as_of": row.as_of,
+                }
+                for row in rows
+                if row.entry_count >= min_entries
+            ]
+            if snapshots:
+                await db.execute(
+                    insert(models.WalletBalanceSnapshot.__table__), snapshots
+                )
+                taken += len(snapshots)
+            await db.commit()
+            if len(wallet_pks) < batch_size:
+                return taken
+            after_pk = wallet_pks[-1]
+
+    async def update(self, *args, **kwargs):
+        raise NotImplementedError("Wallet balance snapshots are append-only")
+
+
+wallet_balance = CRUDWalletBalance(models.WalletBalanceSnapshot)
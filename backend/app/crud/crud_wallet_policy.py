@@ -1,9 +1,9 @@
+import datetime
 import uuid as uuid_pkg
 from typing import Optional
 
 from app import models
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .crud_base import CRUDBase
@@ -39,7 +39,7 @@ class CRUDWalletPolicy(
                 f"A policy with same/similar name {existing_policy.name} already exists"
             )
 
-        obj_in_data: models.WalletPolicyCreate = jsonable_encoder(obj_in)
+        obj_in_data = self.get_obj_in_data(obj_in)
         db_obj = models.WalletPolicy(
             **obj_in_data,
             is_core=is_core,
@@ -89,7 +89,7 @@ class CRUDWalletPolicy(
         stmt = select(self.model)
 
         if uuid:
-            stmt.where(
+            stmt = stmt.where(
                 self.model.uuid == uuid,
             )
         if managing_organization_id:
@@ -107,8 +107,59 @@ class CRUDWalletPolicy(
         *,
         db_obj: models.WalletPolicy,
         obj_in: models.WalletPolicyUpdate,
+        commit: bool = True,
     ) -> models.WalletPolicy:
-        raise NotImplementedError
+        """Updates a policy. The wallets the policy is applied to keep a copy of its
+        terms, which `crud.wallet_policy_propagation` brings up to date (see
+        `crud.wallet_policy_propagation.update_policy`)"""
+        update_data = obj_in.dict(exclude_unset=True, exclude={"updated_at"})
+        if update_data.get("currency", db_obj.currency) != db_obj.currency:
+            raise ValueError("The currency of a policy cannot be changed")
+        if update_data.get("name"):
+            name_chars = obj_in.name.strip().replace(" ", "").lower()
+            existing_policy = await self.get(
+                db=db,
+                name_chars=name_chars,
+                managing_organization_id=db_obj.managing_organization_id,
+            )
+            if existing_policy and existing_policy.uuid != db_obj.uuid:
+                raise ValueError(
+                    f"A policy with same/similar name {existing_policy.name}"
+                    + " already exists"
+                )
+            update_data["name_chars"] = name_chars
+        elif "name" in update_data:
+            del update_data["name"]
+        for field, value in update_data.items():
+            setattr(db_obj, field, value)
+        db_obj.description = db_obj.describe_policy()
+        db.add(db_obj)
+        if not commit:
+            return db_obj
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def sync_managing_organization(
+        self, db: AsyncSession, *, organization_id: uuid_pkg.UUID
+    ) -> int:
+        """Copies the current name of an organization onto the policies it manages"""
+        policy, organization = models.WalletPolicy, models.Organization
+        result = await db.execute(
+            update(policy)
+            .where(
+                policy.managing_organization_id == organization_id,
+                organization.uuid == policy.managing_organization_id,
+                policy.managing_organization_name.is_distinct_from(organization.name),
+            )
+            .values(
+                managing_organization_name=organization.name,
+                updated_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
 
     async def remove(
         self,
@@ -0,0 +1,169 @@
+import datetime
+import uuid as uuid_pkg
+from typing import List, Optional
+
+from app import models, schemas
+from app.core import response_cache
+from app.core.config import settings
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .crud_base import CRUDBase
+
+
+class CRUDWalletPolicyPropagation(
+    CRUDBase[
+        models.WalletPolicyPropagation,
+        models.WalletPolicyPropagation,
+        models.WalletPolicyPropagationRead,
+    ]
+):
+    async def create(
+        self, db: AsyncSession, *, policy_obj: models.WalletPolicy, commit: bool = True
+    ) -> models.WalletPolicyPropagation:
+        """Records a propagation of the current terms of a policy to its wallets,
+        to be run with `run`"""
+        total_wallets = await db.execute(
+            select(func.count()).where(models.Wallet.policy_id == policy_obj.uuid)
+        )
+        db_obj = models.WalletPolicyPropagation(
+            policy_id=policy_obj.uuid, total_wallets=total_wallets.scalar_one()
+        )
+        db.add(db_obj)
+        if not commit:
+            return db_obj
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update_policy(
+        self,
+        db: AsyncSession,
+        *,
+        policy_obj: models.WalletPolicy,
+        obj_in: models.WalletPolicyUpdate,
+    ) -> models.WalletPolicyPropagation:
+        """Updates a policy and records the propagation of its new terms in the same
+        transaction, so there is never an edited policy without a propagation (or a
+        propagation of an edit which was rolled back). Send the propagation's task
+        once this returns: a propagation whose task was never sent stays pending,
+        and is sent again by `claim_stale`"""
+        from app import crud
+
+        try:
+            policy_obj = await crud.wallet_policy.update(
+                db, db_obj=policy_obj, obj_in=obj_in, commit=False
+            )
+            propagation = await self.create(db, policy_obj=policy_obj, commit=False)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await db.refresh(propagation)
+        return propagation
+
+    async def claim_stale(
+        self, db: AsyncSession, *, stale_before: datetime.datetime
+    ) -> List[uuid_pkg.UUID]:
+        """Returns the propagations still pending since before `stale_before`, whose
+        task was most likely never sent (or lost), to be sent again. Their
+        `updated_at` is bumped, so they are not claimed again until they are stale
+        once more"""
+        result = await db.execute(
+            update(self.model)
+            .where(
+                self.model.status == schemas.JobStatusType.PENDING,
+                self.model.updated_at < stale_before,
+            )
+            .values(updated_at=datetime.datetime.now(datetime.timezone.utc))
+            .returning(self.model.uuid)
+            .execution_options(synchronize_session=False)
+        )
+        uuids = result.scalars().all()
+        await db.commit()
+        return uuids
+
+    async def get(
+        self,
+        db: AsyncSession,
+        uuid: uuid_pkg.UUID,
+        policy_id: uuid_pkg.UUID = None,
+    ) -> Optional[models.WalletPolicyPropagation]:
+        stmt = select(self.model).where(self.model.uuid == uuid)
+        if policy_id:
+            stmt = stmt.where(self.model.policy_id == policy_id)
+        obj = await db.execute(statement=stmt)
+        return obj.scalar_one_or_none()
+
+    async def run(
+        self,
+        db: AsyncSession,
+        *,
+        propagation: models.WalletPolicyPropagation,
+        batch_size: int = None,
+    ) -> models.WalletPolicyPropagation:
+        """
+        Copies the terms of the policy onto its wallets, one chunk of wallets per
+        transaction. The progress of the propagation is committed with every chunk,
+        so row locks are held for one chunk at a time and a failed or interrupted
+        propagation resumes after the last wallet it committed.
+        """
+        from app import crud
+
+        if propagation.status == schemas.JobStatusType.COMPLETED:
+            return propagation
+        pk = propagation.pk
+        propagation.status = schemas.JobStatusType.RUNNING
+        db.add(propagation)
+        await db.commit()
+        try:
+            policy_obj = await crud.wallet_policy.get(db=db, uuid=propagation.policy_id)
+            wallet_filter = models.WalletPolicyApply(current_policy_id=policy_obj.uuid)
+            after_pk = propagation.last_wallet_pk
+            while after_pk is not None:
+                chunk, next_pk = await crud.wallet.apply_policy_chunk(
+                    db,
+                    policy_obj=policy_obj,
+                    wallet_filter=wallet_filter,
+                    after_pk=after_pk,
+                    batch_size=batch_size or settings.WALLET_POLICY_BATCH_SIZE,
+                )
+                await db.execute(
+                    update(self.model)
+                    .where(self.model.pk == pk)
+                    .values(
+                        processed_wallets=self.model.processed_wallets + chunk.matched,
+                        updated_wallets=self.model.updated_wallets + chunk.updated,
+                        last_wallet_pk=next_pk or after_pk,
+                        updated_at=datetime.datetime.now(datetime.timezone.utc),
+                    )
+                )
+                await response_cache.commit(db)
+                after_pk = next_pk
+        except Exception as e:
+            await db.rollback()
+            await db.execute(
+                update(self.model)
+                .where(self.model.pk == pk)
+                .values(status=schemas.JobStatusType.FAILED, error=f"{e}")
+            )
+            await db.commit()
+            raise
+        await db.execute(
+            update(self.model)
+            .where(self.model.pk == pk)
+            .values(
+                status=schemas.JobStatusType.COMPLETED,
+                error=None,
+                completed_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+        )
+        await db.commit()
+        await db.refresh(propagation)
+        return propagation
+
+    async def update(self, *args, **kwargs):
+        raise NotImplementedError("Policy propagations are updated as they run")
+
+
+wallet_policy_propagation = CRUDWalletPolicyPropagation(models.WalletPolicyPropagation)
@@ -1,5 +1,10 @@
 from app.api import api_v1_router
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_metrics import QueryMetricsMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.tracing import TracingMiddleware
 from fastapi import FastAPI
 from fastapi.middleware.wsgi import WSGIMiddleware
 from fastapi_pagination import add_pagination
@@ -7,7 +12,9 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from starlette.middleware.cors import CORSMiddleware
 
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse,
 )
 
 # Set all CORS enabled origins
@@ -20,6 +27,13 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Time the spans of every request, then count and time its SQL statements (the
+# last middleware added runs first, so traces can include the SQL statements)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(QueryMetricsMiddleware)
+# Profile slow requests (when enabled), including the time of the middleware above
+app.add_middleware(ProfilingMiddleware)
+
 app.include_router(api_v1_router, prefix=f"/v1")
 
 
@@ -31,5 +45,8 @@ def read_main():
 # Register pagination middleware
 add_pagination(app)
 
-# Register prometheus instrumentation
-Instrumentator().instrument(app).expose(app)
+# Register prometheus instrumentation. Metrics are served (summed over the workers
+# of a gunicorn server) by app.core.metrics rather than by the instrumentator, which
+# only serves the metrics of the worker answering the scrape
+Instrumentator().instrument(app)
+app.add_api_route("/metrics", metrics, methods=["GET"])
@@ -1,8 +1,13 @@
 """The :mod:`api.middleware.pagination` contains middleware for implementing custom pagination in this API"""
 
-from typing import Generic, TypeVar
+from math import ceil
+from typing import Any, Generic, Sequence, Type, TypeVar
 
+from app.core.responses import FastJSONResponse, project
+from fastapi_pagination import resolve_params
 from fastapi_pagination.links import Page
+from fastapi_pagination.links.bases import create_links
+from pydantic import BaseModel
 
 T = TypeVar("T")
 
@@ -15,3 +20,34 @@ class JsonApiPage(Page[T], Generic[T]):
     class Config:
         allow_population_by_field_name = True
         fields = {"items": {"alias": "data"}}
+
+
+def paginate_trusted(
+    sequence: Sequence[Any], schema: Type[BaseModel]
+) -> FastJSONResponse:
+    """Drop-in replacement for `fastapi_pagination.paginate` on routes returning a
+    `JsonApiPage[schema]` of trusted ORM rows.
+
+    Items are projected straight into `schema` instead of being validated once
+    by the page and again against the route's `response_model`, then encoded.
+    The rendered body is the same as the validated path's
+    """
+    params = resolve_params()
+    raw_params = params.to_raw_params()
+    items = sequence[raw_params.offset : raw_params.offset + raw_params.limit]
+    total, page, size = len(sequence), params.page, params.size
+    links = create_links(
+        first={"page": 1},
+        last={"page": ceil(total / size) if total > 0 else 1},
+        next={"page": page + 1} if page * size < total else None,
+        prev={"page": page - 1} if 1 <= page - 1 else None,
+    )
+    return FastJSONResponse(
+        {
+            "data": [project(item, schema) for item in items],
+            "total": total,
+            "page": page,
+            "size": size,
+            "links": links.dict(),
+        }
+    )
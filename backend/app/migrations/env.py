@@ -3,7 +3,20 @@ import os
 from logging.config import fileConfig
 
 from alembic import context
-from app.models import OTP, Organization, User, Wallet, WalletPolicy
+from app.models import (
+    OTP,
+    BillSettlement,
+    EmployeeEnrollment,
+    LedgerEntry,
+    LedgerJournal,
+    Organization,
+    User,
+    Wallet,
+    WalletAccumulator,
+    WalletBalanceSnapshot,
+    WalletPolicy,
+    WalletPolicyPropagation,
+)
 from sqlalchemy import engine_from_config, pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import AsyncEngine
@@ -24,6 +37,14 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # partitions of the otp table are managed by `crud.otp.maintain_partitions`
+    if type_ == "table" and reflected and compare_to is None:
+        return not (name == "otp_default" or name.startswith("otp_p"))
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -55,6 +76,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -64,7 +86,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
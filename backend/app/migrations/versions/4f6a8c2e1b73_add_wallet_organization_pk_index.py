@@ -0,0 +1,37 @@
+"""add wallet organization pk index
+
+Revision ID: 4f6a8c2e1b73
+Revises: 9d3b7f15c2a8
+Create Date: 2026-10-18 23:54:57.187543
+
+"""
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f6a8c2e1b73"
+down_revision = "9d3b7f15c2a8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently so that writes to wallets are not blocked meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "wallets__managing_organization_id__pk_idx",
+            "wallets",
+            ["managing_organization_id", "pk"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "wallets__managing_organization_id__pk_idx",
+            table_name="wallets",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,37 @@
+"""add otp lookup index
+
+Revision ID: 6b1d9e3f7a25
+Revises: 4f6a8c2e1b73
+Create Date: 2026-10-18 23:58:28.298883
+
+"""
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6b1d9e3f7a25"
+down_revision = "4f6a8c2e1b73"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently so that OTPs can be issued meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "otp__user_id__token_type__code_idx",
+            "otp",
+            ["user_id", "token_type", "code"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "otp__user_id__token_type__code_idx",
+            table_name="otp",
+            postgresql_concurrently=True,
+        )
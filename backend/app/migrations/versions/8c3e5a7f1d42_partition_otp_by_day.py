@@ -0,0 +1,141 @@
+"""partition otp by day
+
+Revision ID: 8c3e5a7f1d42
+Revises: 6b1d9e3f7a25
+Create Date: 2026-10-19 00:01:19.362257
+
+"""
+import datetime
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = "8c3e5a7f1d42"
+down_revision = "6b1d9e3f7a25"
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    "created_at, updated_at, id, used_at, expires_at, uuid, token_type, user_id,"
+    + " is_used, code"
+)
+
+
+def create_partition(day: datetime.date) -> None:
+    start = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    end = start + datetime.timedelta(days=1)
+    op.execute(
+        f"CREATE TABLE otp_p{day:%Y%m%d} PARTITION OF otp"
+        + f" FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    # the table is rebuilt as a table partitioned by day. OTPs older than the
+    # retention period have long expired and are not copied. The indexes of the
+    # old table are dropped to free their names for the new one's
+    op.rename_table("otp", "otp_unpartitioned")
+    op.execute("ALTER SEQUENCE otp_id_seq OWNED BY NONE")
+    op.drop_constraint("otp_pkey", "otp_unpartitioned")
+    op.drop_index("otp__user_id__token_type__code_idx", table_name="otp_unpartitioned")
+    op.drop_index("ix_otp_uuid", table_name="otp_unpartitioned")
+    op.drop_index("ix_otp_user_id", table_name="otp_unpartitioned")
+    op.drop_index("ix_otp_id", table_name="otp_unpartitioned")
+    op.create_table(
+        "otp",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "id",
+            sa.INTEGER(),
+            server_default=sa.text("nextval('otp_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("used_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("uuid", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("token_type", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("user_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("is_used", sa.Boolean(), nullable=False),
+        sa.Column("code", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        # the indexes of the model, including the lookup index built concurrently
+        # on the unpartitioned table by 6b1d9e3f7a25 (indexes of partitioned tables
+        # cannot be built concurrently). Created with the empty table, they are
+        # filled in as the retained OTPs are copied, and every partition inherits
+        # them
+        sa.Index("ix_otp_user_id", "user_id"),
+        sa.Index("ix_otp_uuid", "uuid"),
+        sa.Index(
+            "otp__user_id__token_type__code_idx",
+            "user_id",
+            "token_type",
+            "code",
+            postgresql_where=sa.text("NOT is_used"),
+        ),
+        sa.Index("otp__code_idx", "code", postgresql_where=sa.text("NOT is_used")),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute("ALTER SEQUENCE otp_id_seq OWNED BY otp.id")
+    op.execute("CREATE TABLE otp_default PARTITION OF otp DEFAULT")
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    for i in range(
+        -settings.OTP_RETENTION_DAYS, settings.OTP_PARTITIONS_AHEAD_DAYS + 1
+    ):
+        create_partition(today + datetime.timedelta(days=i))
+    cutoff = today - datetime.timedelta(days=settings.OTP_RETENTION_DAYS)
+    op.execute(
+        f"INSERT INTO otp ({COLUMNS}) SELECT {COLUMNS} FROM otp_unpartitioned"
+        + f" WHERE created_at >= '{cutoff.isoformat()}'::timestamptz"
+    )
+    op.drop_table("otp_unpartitioned")
+
+
+def downgrade() -> None:
+    op.rename_table("otp", "otp_partitioned")
+    op.execute("ALTER SEQUENCE otp_id_seq OWNED BY NONE")
+    op.drop_index("otp__code_idx", table_name="otp_partitioned")
+    op.drop_index("otp__user_id__token_type__code_idx", table_name="otp_partitioned")
+    op.drop_index("ix_otp_uuid", table_name="otp_partitioned")
+    op.drop_index("ix_otp_user_id", table_name="otp_partitioned")
+    op.drop_constraint("otp_pkey", "otp_partitioned")
+    op.create_table(
+        "otp",
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "id",
+            sa.INTEGER(),
+            server_default=sa.text("nextval('otp_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("used_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("uuid", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("token_type", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("user_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("is_used", sa.Boolean(), nullable=False),
+        sa.Column("code", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("ALTER SEQUENCE otp_id_seq OWNED BY otp.id")
+    op.execute(f"INSERT INTO otp ({COLUMNS}) SELECT {COLUMNS} FROM otp_partitioned")
+    op.drop_table("otp_partitioned")
+    op.create_index(op.f("ix_otp_id"), "otp", ["id"], unique=False)
+    op.create_index(op.f("ix_otp_user_id"), "otp", ["user_id"], unique=False)
+    op.create_index(op.f("ix_otp_uuid"), "otp", ["uuid"], unique=True)
+    op.create_index(
+        "otp__user_id__token_type__code_idx",
+        "otp",
+        ["user_id", "token_type", "code"],
+        unique=False,
+    )
@@ -0,0 +1,38 @@
+"""drop global policy name and wallet description uniqueness
+
+Revision ID: e5a1c7b3d9f2
+Revises: 8c3e5a7f1d42
+Create Date: 2026-10-19 10:12:41.508317
+
+"""
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a1c7b3d9f2"
+down_revision = "8c3e5a7f1d42"
+branch_labels = None
+depends_on = None
+
+# every organization is created with a "Default" policy and a wallet without a
+# description, so unique indexes on these columns alone failed the creation of every
+# organization after the first. Policy names stay unique per organization
+# (policy__name__managing_organization_uc, policy__name_chars__managing_organization_uc)
+INDEXES = [
+    ("healthcare_policies", "name"),
+    ("healthcare_policies", "name_chars"),
+    ("wallets", "description"),
+]
+
+
+def upgrade() -> None:
+    for table, column in INDEXES:
+        op.drop_index(f"ix_{table}_{column}", table_name=table)
+        op.create_index(f"ix_{table}_{column}", table, [column], unique=False)
+
+
+def downgrade() -> None:
+    for table, column in INDEXES:
+        op.drop_index(f"ix_{table}_{column}", table_name=table)
+        op.create_index(f"ix_{table}_{column}", table, [column], unique=True)
@@ -1,3 +1,20 @@
+from .enrollment import (
+    EmployeeEnrollment,
+    EmployeeEnrollmentCreate,
+    EmployeeEnrollmentRead,
+    EmployeeEnrollmentResult,
+    EmployeeEnrollmentRow,
+)
+from .ledger import (
+    LedgerEntry,
+    LedgerEntryCreate,
+    LedgerEntryRead,
+    LedgerJournal,
+    LedgerJournalCreate,
+    LedgerJournalRead,
+    WalletBalanceRead,
+    WalletBalanceSnapshot,
+)
 from .organization import (
     Organization,
     OrganizationCreate,
@@ -6,10 +23,26 @@ from .organization import (
 )
 from .otp import OTP, OTPCreate, OTPRead, OTPTypeChoice, PasswordResetOTPPayload
 from .user import NewUserRead, User, UserCreate, UserPublicRead, UserRead, UserUpdate
-from .wallet import Wallet, WalletCreate, WalletRead, WalletUpdate
+from .wallet import (
+    Wallet,
+    WalletCreate,
+    WalletPolicyApply,
+    WalletPolicyApplyRead,
+    WalletRead,
+    WalletUpdate,
+)
+from .wallet_accumulator import (
+    BillSettlement,
+    BillSettlementCreate,
+    BillSettlementRead,
+    WalletAccumulator,
+    WalletAccumulatorRead,
+)
 from .wallet_policy import (
     WalletPolicy,
     WalletPolicyCreate,
+    WalletPolicyPropagation,
+    WalletPolicyPropagationRead,
     WalletPolicyRead,
     WalletPolicyUpdate,
 )
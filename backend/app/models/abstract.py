@@ -8,7 +8,6 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any, Dict, Optional
 
-import pycountry
 import sqlalchemy as sa
 from app.schemas import (
     OperatingCountryType,
@@ -201,6 +200,8 @@ class AbstractOperatingCountryResource(SQLModel):
     # add a validation to field 'region' -> must not be empty
     @validator("region")
     def region_not_empty(cls, v: Optional[str], values: Dict[str, Any]):
+        import pycountry
+
         v = str(v).strip()
         if not v:
             raise ValueError("Region must not be empty")
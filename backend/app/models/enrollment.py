@@ -0,0 +1,165 @@
+"""The :mod:`app.models.enrollment` module contains ORMs used to persist and retrieve
+bulk enrollments of employees into the healthcare wallets of their organization on
+HyperSenta
+
+A bulk enrollment creates a user (unless one exists with the same mobile number) and an
+organization managed wallet for every employee it lists. Employees are processed in
+batches and the outcome of every row is recorded in the report of the enrollment.
+"""
+# Author: Christopher Dare
+
+import uuid as uuid_pkg
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+from app.schemas import AdministrativeGender, EnrollmentResultType, JobStatusType
+from pydantic import EmailStr, validator
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Column, Field, SQLModel
+
+from .abstract import TimeStampedModel
+
+
+class EmployeeEnrollment(TimeStampedModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    organization_id: uuid_pkg.UUID = Field(
+        foreign_key="organizations.uuid",
+        index=True,
+        nullable=False,
+        description="ID of organization the employees are enrolled into",
+    )
+    policy_id: Optional[uuid_pkg.UUID] = Field(
+        foreign_key="healthcare_policies.uuid",
+        nullable=True,
+        description="ID of healthcare policy applied to the new wallets",
+    )
+    created_by_id: uuid_pkg.UUID = Field(
+        foreign_key="users.uuid",
+        nullable=False,
+        description="User who submitted the enrollment",
+    )
+    status: JobStatusType = Field(
+        description="Status of the enrollment",
+        sa_column=Column("status", sa.String(15), nullable=False),
+        default=JobStatusType.PENDING,
+    )
+    total_rows: int = Field(
+        description="Number of employees submitted",
+        sa_column=Column("total_rows", sa.INTEGER(), nullable=False),
+    )
+    processed_rows: int = Field(
+        description="Number of employees processed so far",
+        sa_column=Column("processed_rows", sa.INTEGER(), nullable=False),
+        default=0,
+    )
+    users_created: int = Field(
+        sa_column=Column("users_created", sa.INTEGER(), nullable=False), default=0
+    )
+    wallets_created: int = Field(
+        sa_column=Column("wallets_created", sa.INTEGER(), nullable=False), default=0
+    )
+    invalid_rows: int = Field(
+        sa_column=Column("invalid_rows", sa.INTEGER(), nullable=False), default=0
+    )
+    employees: Optional[List[Dict[str, Any]]] = Field(
+        description="Employees submitted. Cleared once the enrollment completes",
+        sa_column=Column("employees", JSONB(), nullable=True),
+    )
+    report: List[Dict[str, Any]] = Field(
+        description="Outcome of every row processed, in the order submitted",
+        sa_column=Column(
+            "report", JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")
+        ),
+        default=[],
+    )
+    error: Optional[str] = Field(
+        description="Reason the enrollment failed",
+        sa_column=Column("error", sa.Text(), nullable=True),
+    )
+    completed_at: Optional[datetime] = Field(
+        sa_column=Column(sa.DateTime(timezone=True), nullable=True),
+        description="Date and time the enrollment completed or failed",
+    )
+
+    # meta properties
+    __tablename__ = "employee_enrollments"
+
+
+class EmployeeEnrollmentRow(SQLModel):
+    """An employee listed in a bulk enrollment"""
+
+    first_name: str = Field(description="Employee's first name", min_length=1)
+    last_name: str = Field(description="Employee's last name", min_length=1)
+    mobile: str = Field(
+        description="Employee's mobile number, in international format or in the"
+        + " national format of the organization's country"
+    )
+    email: Optional[EmailStr] = Field(description="Employee's email", default=None)
+    birth_date: Optional[date] = Field(
+        description="Employee's date of birth", default=None
+    )
+    gender: Optional[AdministrativeGender] = Field(
+        description="Employee's gender", default=None
+    )
+
+    @validator("first_name", "last_name", "mobile", pre=True)
+    def strip_whitespace(cls, v: Any) -> Any:
+        return v.strip() if isinstance(v, str) else v
+
+    @validator("email")
+    def normalize_email(cls, v: Optional[str]) -> Optional[str]:
+        return v.lower() if v else v
+
+
+class EmployeeEnrollmentCreate(SQLModel):
+    policy_id: Optional[uuid_pkg.UUID] = Field(
+        description="ID of healthcare policy applied to the new wallets."
+        + " Defaults to the organization's default policy",
+        default=None,
+    )
+    # rows are validated one by one when they are enrolled, so that invalid rows
+    # are reported instead of failing the whole enrollment
+    employees: List[Dict[str, Any]] = Field(
+        description="Employees to enroll. See `EmployeeEnrollmentRow`"
+    )
+
+    @validator("employees")
+    def validate_employees(cls, v: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not v:
+            raise ValueError("At least one employee is required")
+        return v
+
+
+class EmployeeEnrollmentResult(SQLModel):
+    row: int = Field(description="Position of the employee in the enrollment, from 1")
+    result: EnrollmentResultType
+    mobile: Optional[str] = None
+    user_id: Optional[uuid_pkg.UUID] = None
+    wallet_id: Optional[uuid_pkg.UUID] = None
+    errors: List[str] = []
+
+
+class EmployeeEnrollmentRead(SQLModel):
+    uuid: uuid_pkg.UUID
+    organization_id: uuid_pkg.UUID
+    policy_id: Optional[uuid_pkg.UUID]
+    status: JobStatusType
+    total_rows: int
+    processed_rows: int
+    users_created: int
+    wallets_created: int
+    invalid_rows: int
+    report: List[EmployeeEnrollmentResult]
+    error: Optional[str]
+    created_at: datetime
+    completed_at: Optional[datetime]
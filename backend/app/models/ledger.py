@@ -0,0 +1,275 @@
+"""The :mod:`app.models.ledger` module contains ORMs used to persist and retrieve
+money movements on healthcare wallets as a double-entry ledger on HyperSenta
+
+A ledger journal records a single money movement (e.g. a wallet top up or a bill payment)
+and groups two or more ledger entries. Entries are append-only: once posted they are never
+updated or deleted; corrections are posted as new journals.
+
+The amounts of the entries of a journal always sum to zero. A positive amount credits
+(increases the balance of) an account and a negative amount debits it.
+
+A wallet balance snapshot records the balance of a wallet after a given entry, so the
+balance of a wallet at any point in time is its latest snapshot plus the (short) tail of
+entries posted after it. Snapshots are written periodically by a compaction job.
+"""
+# Author: Christopher Dare
+
+import uuid as uuid_pkg
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+
+import sqlalchemy as sa
+from app.schemas import (
+    LedgerAccountType,
+    ModeOfPaymentType,
+    PaymentChannelType,
+    TransactionStatusType,
+    WalletCurrencyType,
+)
+from app.utils import quantize_monetary_number
+from pydantic import validator
+from sqlmodel import Column, DateTime, Field, SQLModel
+
+from .abstract import TimeStampedModel
+
+
+class LedgerJournalBase(SQLModel):
+    reference: str = Field(
+        description="Unique reference of the money movement."
+        + " Posting a journal with an existing reference fails,"
+        + " so retried postings are not applied twice",
+        max_length=100,
+    )
+    description: Optional[str] = Field(
+        description="Description of the money movement", default=None
+    )
+    currency: WalletCurrencyType = Field(description="Currency of all entries")
+    mode_of_payment: Optional[ModeOfPaymentType] = Field(
+        description="Mode of payment for money received or paid out", default=None
+    )
+    payment_channel: Optional[PaymentChannelType] = Field(
+        description="Payment channel for money received or paid out", default=None
+    )
+
+
+class LedgerJournal(LedgerJournalBase, TimeStampedModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            index=True,
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    reference: str = Field(
+        description="Unique reference of the money movement",
+        sa_column=Column(
+            "reference", sa.String(100), unique=True, index=True, nullable=False
+        ),
+    )
+    currency: WalletCurrencyType = Field(
+        description="Currency of all entries",
+        sa_column=Column("currency", sa.String(15), nullable=False),
+    )
+    status: TransactionStatusType = Field(
+        description="Status of the journal",
+        sa_column=Column("status", sa.String(15), nullable=False, index=True),
+        default=TransactionStatusType.SUCCESS,
+    )
+    posted_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+        description="Date and time the journal was posted to the ledger",
+    )
+
+    # meta properties
+    __tablename__ = "ledger_journals"
+
+
+class LedgerEntryBase(SQLModel):
+    account_type: LedgerAccountType = Field(
+        description="Type of ledger account the entry is posted to",
+        default=LedgerAccountType.WALLET,
+    )
+    wallet_id: Optional[uuid_pkg.UUID] = Field(
+        description="ID of the wallet credited or debited."
+        + " Required for wallet accounts",
+        default=None,
+    )
+    amount: Decimal = Field(
+        description="Amount posted. Positive amounts credit the account"
+        + " and negative amounts debit it"
+    )
+
+    @validator("amount")
+    def validate_amount(cls, v):
+        v = quantize_monetary_number(amount=v)
+        if v == Decimal(0):
+            raise ValueError("Ledger entry amounts must not be zero")
+        return v
+
+    @validator("wallet_id", always=True)
+    def validate_wallet_id(cls, v, values):
+        account_type = values.get("account_type")
+        if account_type == LedgerAccountType.WALLET and not v:
+            raise ValueError("Wallet entries must have a wallet_id")
+        if account_type != LedgerAccountType.WALLET and v:
+            raise ValueError(f"{account_type} entries must not have a wallet_id")
+        return v
+
+
+class LedgerEntry(TimeStampedModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    journal_id: uuid_pkg.UUID = Field(
+        foreign_key="ledger_journals.uuid",
+        index=True,
+        nullable=False,
+        description="ID of the journal the entry belongs to",
+    )
+    account_type: LedgerAccountType = Field(
+        description="Type of ledger account the entry is posted to",
+        sa_column=Column("account_type", sa.String(15), nullable=False),
+    )
+    wallet_id: Optional[uuid_pkg.UUID] = Field(
+        foreign_key="wallets.uuid",
+        nullable=True,
+        description="ID of the wallet credited or debited",
+    )
+    currency: WalletCurrencyType = Field(
+        description="Currency of the amount",
+        sa_column=Column("currency", sa.String(15), nullable=False),
+    )
+    amount: Decimal = Field(
+        description="Amount posted",
+        sa_column=Column("amount", sa.DECIMAL(precision=18, scale=2), nullable=False),
+    )
+    balance_after: Optional[Decimal] = Field(
+        description="Balance of the wallet after the entry was posted",
+        sa_column=Column(
+            "balance_after", sa.DECIMAL(precision=18, scale=2), nullable=True
+        ),
+    )
+
+    # meta properties
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        # serves wallet statements and balance reads in posting order
+        sa.Index("ledger_entries__wallet_id__pk_idx", "wallet_id", "pk"),
+    )
+
+
+class LedgerEntryCreate(LedgerEntryBase):
+    pass
+
+
+class LedgerJournalCreate(LedgerJournalBase):
+    entries: List[LedgerEntryCreate] = Field(
+        description="Entries of the journal. Their amounts must sum to zero"
+    )
+
+    @validator("entries")
+    def validate_entries(cls, v: List[LedgerEntryCreate]):
+        if len(v) < 2:
+            raise ValueError("A journal must have at least two entries")
+        total = sum((entry.amount for entry in v), Decimal(0))
+        if total != Decimal(0):
+            raise ValueError(f"Journal entries must sum to zero. Received {total}")
+        return v
+
+
+class LedgerEntryRead(LedgerEntryBase):
+    uuid: uuid_pkg.UUID
+    journal_id: uuid_pkg.UUID
+    currency: WalletCurrencyType
+    balance_after: Optional[Decimal] = None
+    created_at: datetime
+
+
+class LedgerJournalRead(LedgerJournalBase):
+    uuid: uuid_pkg.UUID
+    status: TransactionStatusType
+    posted_at: datetime
+
+
+class WalletBalanceSnapshot(SQLModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), default=datetime.utcnow),
+        description="Date and time the snapshot was taken",
+    )
+    wallet_id: uuid_pkg.UUID = Field(
+        foreign_key="wallets.uuid",
+        nullable=False,
+        description="ID of the wallet",
+    )
+    balance: Decimal = Field(
+        description="Balance of the wallet after the last entry of the snapshot",
+        sa_column=Column("balance", sa.DECIMAL(precision=18, scale=2), nullable=False),
+    )
+    last_entry_pk: int = Field(
+        description="Primary key of the last ledger entry rolled into the snapshot",
+        sa_column=Column("last_entry_pk", sa.BIGINT(), nullable=False),
+    )
+    entry_count: int = Field(
+        description="Number of ledger entries rolled into the snapshot"
+        + " since the previous one",
+        sa_column=Column("entry_count", sa.INTEGER(), nullable=False),
+    )
+    as_of: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+        description="Date and time the last entry of the snapshot was posted",
+    )
+
+    # meta properties
+    __tablename__ = "wallet_balance_snapshots"
+    __table_args__ = (
+        # serves latest-snapshot lookups, current and as of a point in time
+        sa.Index(
+            "wallet_balance_snapshots__wallet_id__last_entry_pk_uc",
+            "wallet_id",
+            "last_entry_pk",
+            unique=True,
+        ),
+        sa.Index(
+            "wallet_balance_snapshots__wallet_id__as_of_idx", "wallet_id", "as_of"
+        ),
+    )
+
+
+class WalletBalanceRead(SQLModel):
+    wallet_id: uuid_pkg.UUID
+    balance: Decimal = Field(description="Balance of the wallet as of `as_of`")
+    as_of: Optional[datetime] = Field(
+        description="Point in time the balance was requested for."
+        + " Null for the current balance",
+        default=None,
+    )
+    snapshot_as_of: Optional[datetime] = Field(
+        description="Date and time of the snapshot the balance was computed from",
+        default=None,
+    )
+    tail_entries: int = Field(
+        description="Number of ledger entries added to the snapshot balance",
+        default=0,
+    )
@@ -8,7 +8,6 @@ import uuid as uuid_pkg
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
 
-import phonenumbers
 import sqlalchemy as sa
 from app.core.config import settings
 from app.utils import ModeOfMessageDelivery
@@ -31,17 +30,37 @@ class OTPBase(SQLModel):
 
 
 class OTP(OTPBase, TimeStampedModel, table=True):
+    """One-time password. The table is partitioned by the day OTPs are created on,
+    so that the partitions of expired OTPs can be dropped (see
+    `crud.otp.maintain_partitions`) instead of the table growing forever"""
+
     id: Optional[int] = Field(
         sa_column=Column(
             "id",
             sa.INTEGER(),
-            index=True,
             autoincrement=True,
             nullable=False,
             primary_key=True,
         ),
         description="Internal database id for OTP table. Not to be exposed to client apps or used as foreign key references",
     )
+    # primary and unique keys of a partitioned table must include the partition key
+    created_at: datetime = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            nullable=False,
+            primary_key=True,
+            default=lambda: datetime.now(timezone.utc),
+            server_default=sa.func.now(),
+        ),
+        description="Date and time the object was created",
+    )
+    uuid: uuid_pkg.UUID = Field(
+        default_factory=uuid_pkg.uuid4,
+        index=True,
+        nullable=False,
+        description="External UUID",
+    )
     user_id: uuid_pkg.UUID = Field(
         description="User's public UUID", nullable=False, index=True
     )
@@ -60,12 +79,25 @@ class OTP(OTPBase, TimeStampedModel, table=True):
             DateTime(timezone=True),
         ),
         description="OTP expiry datetime",
-        default=datetime.now(timezone.utc)
+        default_factory=lambda: datetime.now(timezone.utc)
         + timedelta(minutes=settings.OTP_EXPIRE_MINUTES),
     )
 
     # meta properties
     __tablename__ = "otp"
+    __table_args__ = (
+        # serve looking up unused OTPs by their user, type and code, and password
+        # reset tokens by their code. Used OTPs are left out of the indexes
+        sa.Index(
+            "otp__user_id__token_type__code_idx",
+            "user_id",
+            "token_type",
+            "code",
+            postgresql_where=sa.text("NOT is_used"),
+        ),
+        sa.Index("otp__code_idx", "code", postgresql_where=sa.text("NOT is_used")),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
 
 # Properties to receive via API on creation
@@ -8,7 +8,6 @@ import uuid as uuid_pkg
 from datetime import date, datetime
 from typing import Any, Dict, Optional
 
-import phonenumbers
 import sqlalchemy as sa
 from app.core.config import OAuthScopeType
 from app.schemas import AdministrativeGender, NationalIdType, Token
@@ -93,6 +92,7 @@ class User(UserBase, TimeStampedModel, table=True):
     def validate_national_phone_number(
         cls, v: Optional[str], values: Dict[str, Any]
     ) -> Any:
+        import phonenumbers
         from app.utils import parse_mobile_number
 
         mobile_number = values.get("mobile")
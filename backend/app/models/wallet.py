@@ -6,7 +6,7 @@ data concerning wallets on HyperSenta
 import uuid as uuid_pkg
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 import sqlalchemy as sa
 from app.schemas import WalletCurrencyType, WalletStatusType
@@ -61,7 +61,7 @@ class Wallet(WalletBase, TimeStampedModel, AbstractHealthcareWalletPolicy, table
         ),
     )
     description: Optional[str] = Field(
-        description="", unique=True, default="", index=True, nullable=False
+        description="", default="", index=True, nullable=False
     )
     managing_organization_id: uuid_pkg.UUID = Field(
         foreign_key="organizations.uuid",
@@ -109,6 +109,14 @@ class Wallet(WalletBase, TimeStampedModel, AbstractHealthcareWalletPolicy, table
             "managing_organization_id",
             name="wallet__owner_managing_organization_uc",
         ),
+        # serves walking the wallets of a policy in primary key order
+        sa.Index("wallets__policy_id__pk_idx", "policy_id", "pk"),
+        # serves walking the wallets of an organization in primary key order
+        sa.Index(
+            "wallets__managing_organization_id__pk_idx",
+            "managing_organization_id",
+            "pk",
+        ),
     )
 
 
@@ -156,3 +164,35 @@ class WalletRead(WalletBase, AbstractHealthcareWalletPolicy):
 class WalletUpdate(WalletBase):
     name: Optional[str] = None
     updated_at: datetime = datetime.now()
+
+
+class WalletPolicyApply(SQLModel):
+    """Selects the wallets of an organization a policy is applied to. Every wallet of
+    the organization is selected when no filter is given"""
+
+    wallet_ids: Optional[List[uuid_pkg.UUID]] = Field(
+        description="Only apply the policy to these wallets", default=None
+    )
+    current_policy_id: Optional[uuid_pkg.UUID] = Field(
+        description="Only apply the policy to wallets currently on this policy",
+        default=None,
+    )
+    status: Optional[WalletStatusType] = Field(
+        description="Only apply the policy to wallets with this status", default=None
+    )
+
+
+class WalletPolicyApplyRead(SQLModel):
+    policy_id: uuid_pkg.UUID = Field(description="ID of policy applied")
+    matched: int = Field(description="Number of wallets selected", default=0)
+    updated: int = Field(description="Number of wallets updated", default=0)
+    currency_mismatch: int = Field(
+        description="Number of wallets skipped for having a different currency"
+        + " than the policy",
+        default=0,
+    )
+    locked: int = Field(
+        description="Number of wallets skipped as other writers held them locked."
+        + " Applying the policy again updates them",
+        default=0,
+    )
@@ -0,0 +1,195 @@
+"""The :mod:`app.models.wallet_accumulator` module contains ORMs used to persist and retrieve
+the amounts wallet holders have paid towards their deductible and out-of-pocket limit
+on HyperSenta
+
+A wallet has one accumulator row per plan year (see `PLAN_YEAR_START_MONTH`). The row is
+updated as bills are settled, so cost-sharing decisions read a single row. Every settled
+bill is recorded as a bill settlement, from which accumulators can be rebuilt.
+"""
+# Author: Christopher Dare
+
+import uuid as uuid_pkg
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+import sqlalchemy as sa
+from app.schemas import WalletCurrencyType
+from app.utils import quantize_monetary_number
+from pydantic import validator
+from sqlmodel import Column, Field, SQLModel
+
+from .abstract import TimeStampedModel
+
+
+class WalletAccumulator(TimeStampedModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    wallet_id: uuid_pkg.UUID = Field(
+        foreign_key="wallets.uuid",
+        nullable=False,
+        description="ID of the wallet",
+    )
+    period_start: date = Field(
+        sa_column=Column("period_start", sa.Date(), nullable=False),
+        description="First day of the plan year",
+    )
+    period_end: date = Field(
+        sa_column=Column("period_end", sa.Date(), nullable=False),
+        description="Last day of the plan year",
+    )
+    deductible_met: Decimal = Field(
+        description="Amount paid towards the deductible in the plan year",
+        sa_column=Column(
+            "deductible_met", sa.DECIMAL(precision=18, scale=2), nullable=False
+        ),
+        default=quantize_monetary_number(0),
+    )
+    out_of_pocket_met: Decimal = Field(
+        description="Amount paid out of pocket in the plan year",
+        sa_column=Column(
+            "out_of_pocket_met", sa.DECIMAL(precision=18, scale=2), nullable=False
+        ),
+        default=quantize_monetary_number(0),
+    )
+    bills_settled: int = Field(
+        description="Number of bills settled in the plan year",
+        sa_column=Column("bills_settled", sa.INTEGER(), nullable=False),
+        default=0,
+    )
+
+    # meta properties
+    __tablename__ = "wallet_accumulators"
+    __table_args__ = (
+        sa.UniqueConstraint(
+            "wallet_id", "period_start", name="wallet_accumulator__wallet_period_uc"
+        ),
+    )
+
+
+class WalletAccumulatorRead(SQLModel):
+    wallet_id: uuid_pkg.UUID
+    period_start: date
+    period_end: date
+    deductible_met: Decimal
+    out_of_pocket_met: Decimal
+    bills_settled: int
+
+
+class BillSettlementBase(SQLModel):
+    reference: str = Field(
+        description="Unique reference of the bill. Settling a bill with an existing"
+        + " reference fails, so retried settlements are not applied twice",
+        max_length=100,
+    )
+    wallet_id: uuid_pkg.UUID = Field(description="ID of the wallet billed")
+    amount: Decimal = Field(description="Amount billed")
+    service_date: Optional[date] = Field(
+        description="Date the service was rendered. Determines the plan year the bill"
+        + " counts towards. Defaults to the settlement date",
+        default=None,
+    )
+    description: Optional[str] = Field(
+        description="Description of the bill", default=None
+    )
+
+
+class BillSettlement(BillSettlementBase, TimeStampedModel, table=True):
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    reference: str = Field(
+        description="Unique reference of the bill",
+        sa_column=Column(
+            "reference", sa.String(100), unique=True, index=True, nullable=False
+        ),
+    )
+    wallet_id: uuid_pkg.UUID = Field(
+        foreign_key="wallets.uuid",
+        nullable=False,
+        description="ID of the wallet billed",
+    )
+    currency: WalletCurrencyType = Field(
+        description="Currency of the amounts",
+        sa_column=Column("currency", sa.String(15), nullable=False),
+    )
+    amount: Decimal = Field(
+        description="Amount billed",
+        sa_column=Column("amount", sa.DECIMAL(precision=18, scale=2), nullable=False),
+    )
+    patient_amount: Decimal = Field(
+        description="Part of the bill paid by the wallet holder",
+        sa_column=Column(
+            "patient_amount", sa.DECIMAL(precision=18, scale=2), nullable=False
+        ),
+    )
+    payer_amount: Decimal = Field(
+        description="Part of the bill paid by the payer",
+        sa_column=Column(
+            "payer_amount", sa.DECIMAL(precision=18, scale=2), nullable=False
+        ),
+    )
+    deductible_amount: Decimal = Field(
+        description="Part of the patient amount applied to the deductible",
+        sa_column=Column(
+            "deductible_amount", sa.DECIMAL(precision=18, scale=2), nullable=False
+        ),
+    )
+    service_date: date = Field(
+        sa_column=Column("service_date", sa.Date(), nullable=False),
+        description="Date the service was rendered",
+    )
+    period_start: date = Field(
+        sa_column=Column("period_start", sa.Date(), nullable=False),
+        description="First day of the plan year the bill counts towards",
+    )
+    settled_at: datetime = Field(
+        sa_column=Column(sa.DateTime(timezone=True), nullable=False),
+        description="Date and time the bill was settled",
+    )
+
+    # meta properties
+    __tablename__ = "bill_settlements"
+    __table_args__ = (
+        # serves accumulator reconciliation
+        sa.Index(
+            "bill_settlements__wallet_id__period_start_idx",
+            "wallet_id",
+            "period_start",
+        ),
+    )
+
+
+class BillSettlementCreate(BillSettlementBase):
+    @validator("amount")
+    def validate_amount(cls, v):
+        v = quantize_monetary_number(amount=v)
+        if v < Decimal(0):
+            raise ValueError("Bill amounts must not be negative")
+        return v
+
+
+class BillSettlementRead(BillSettlementBase):
+    uuid: uuid_pkg.UUID
+    currency: WalletCurrencyType
+    patient_amount: Decimal
+    payer_amount: Decimal
+    deductible_amount: Decimal
+    service_date: date
+    period_start: date
+    settled_at: datetime
@@ -9,7 +9,7 @@ from decimal import Decimal
 from typing import Any, Dict, Optional
 
 import sqlalchemy as sa
-from app.schemas import WalletCurrencyType
+from app.schemas import JobStatusType, WalletCurrencyType
 from pydantic import EmailStr, validator
 from sqlmodel import ARRAY, AutoString, Column, Field, SQLModel, String
 
@@ -23,7 +23,6 @@ from .abstract import (
 class WalletPolicyBase(AbstractHealthcareWalletPolicy):
     name: str = Field(
         description="Name of healthcare wallet policy. Unique for per organization",
-        unique=True,
         index=True,
         nullable=False,
     )
@@ -63,9 +62,7 @@ class WalletPolicy(
     name_chars: str = Field(
         description="Stripped characters of the \
              name without spaces in them",
-        sa_column=Column(
-            "name_chars", AutoString(70), index=True, nullable=False, unique=True
-        ),
+        sa_column=Column("name_chars", AutoString(70), index=True, nullable=False),
     )
     description: str = Field(
         description="Description of healthcare wallet policy."
@@ -121,3 +118,73 @@ class WalletPolicyRead(WalletPolicyBase):
 class WalletPolicyUpdate(WalletPolicyBase):
     name: Optional[str] = None
     updated_at: datetime = datetime.now()
+
+
+class WalletPolicyPropagation(TimeStampedModel, table=True):
+    """Copies the terms of an edited policy onto the wallets the policy is applied
+    to. Wallets are updated in chunks, in primary key order, and the propagation
+    records the last wallet done so it can resume from there"""
+
+    pk: Optional[int] = Field(
+        sa_column=Column(
+            "pk",
+            sa.BIGINT(),
+            autoincrement=True,
+            nullable=False,
+            primary_key=True,
+        ),
+        default=None,
+    )
+    policy_id: uuid_pkg.UUID = Field(
+        foreign_key="healthcare_policies.uuid",
+        index=True,
+        nullable=False,
+        description="ID of policy propagated",
+    )
+    status: JobStatusType = Field(
+        description="Status of the propagation",
+        sa_column=Column("status", sa.String(15), nullable=False),
+        default=JobStatusType.PENDING,
+    )
+    total_wallets: int = Field(
+        description="Number of wallets on the policy when it was edited",
+        sa_column=Column("total_wallets", sa.INTEGER(), nullable=False),
+    )
+    processed_wallets: int = Field(
+        description="Number of wallets processed so far",
+        sa_column=Column("processed_wallets", sa.INTEGER(), nullable=False),
+        default=0,
+    )
+    updated_wallets: int = Field(
+        description="Number of wallets updated so far",
+        sa_column=Column("updated_wallets", sa.INTEGER(), nullable=False),
+        default=0,
+    )
+    last_wallet_pk: int = Field(
+        description="Primary key of the last wallet processed",
+        sa_column=Column("last_wallet_pk", sa.BIGINT(), nullable=False),
+        default=0,
+    )
+    error: Optional[str] = Field(
+        description="Reason the last attempt failed",
+        sa_column=Column("error", sa.Text(), nullable=True),
+    )
+    completed_at: Optional[datetime] = Field(
+        sa_column=Column(sa.DateTime(timezone=True), nullable=True),
+        description="Date and time every wallet was updated",
+    )
+
+    # meta properties
+    __tablename__ = "wallet_policy_propagations"
+
+
+class WalletPolicyPropagationRead(SQLModel):
+    uuid: uuid_pkg.UUID
+    policy_id: uuid_pkg.UUID
+    status: JobStatusType
+    total_wallets: int
+    processed_wallets: int
+    updated_wallets: int
+    error: Optional[str]
+    created_at: datetime
+    completed_at: Optional[datetime]
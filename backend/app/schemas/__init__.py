@@ -3,6 +3,8 @@ from .bank import PaystackBank, ResolvedBankAccount
 from .choices import (
     COUNTRY_CURRENCY_MAP,
     AdministrativeGender,
+    EnrollmentResultType,
+    JobStatusType,
     MedicalDegreeType,
     NamePrefixType,
     NationalIdType,
@@ -15,6 +17,13 @@ from .choices import (
     WalletStatusType,
 )
 from .msg import Msg
+from .profile import RequestProfileFile
 from .token import Token, TokenPayload
-from .transaction import PaymentServiceProviderType
+from .transaction import (
+    LedgerAccountType,
+    ModeOfPaymentType,
+    PaymentChannelType,
+    PaymentServiceProviderType,
+    TransactionStatusType,
+)
 from .valueset import GenericValueset
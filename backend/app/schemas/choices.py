@@ -2,8 +2,6 @@
 
 import enum
 
-import pycountry
-
 
 class AdministrativeGender(str, enum.Enum):
     MALE = "Male"
@@ -76,6 +74,7 @@ class OperatingCountryType(str, enum.Enum):
     GH = "Ghana"
 
     def as_valueset(country: str = None):
+        import pycountry
         import schemas
 
         valueset = []
@@ -123,6 +122,20 @@ class WalletStatusType(str, enum.Enum):
     SUSPENDED = "suspended"
 
 
+class JobStatusType(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class EnrollmentResultType(str, enum.Enum):
+    CREATED = "created"  # new user and wallet
+    ENROLLED = "enrolled"  # existing user, new wallet
+    ALREADY_ENROLLED = "already-enrolled"  # existing user and wallet
+    INVALID = "invalid"
+
+
 COUNTRY_CURRENCY_MAP = {
     OperatingCountryType.GH.value: WalletCurrencyType.GHS.value,
 }
@@ -0,0 +1,13 @@
+"""The :mod:`app.schemas.profile` module contains the schemas of the request profiles
+captured by :mod:`app.core.profiling`
+"""
+# Author: Christopher Dare
+import datetime
+
+from pydantic import BaseModel
+
+
+class RequestProfileFile(BaseModel):
+    name: str
+    size: int
+    created_at: datetime.datetime
@@ -58,3 +58,15 @@ class ModeOfPaymentType(str, Enum):
     MOBILE_MONEY = "MOBILE_MONEY"
     BANK_TRANSFER = "BANK_TRANSFER"
     CARD = "CARD"
+
+
+class LedgerAccountType(str, Enum):
+    """Accounts that ledger entries are posted to.
+    Only wallet accounts carry a balance on HyperSenta"""
+
+    WALLET = "WALLET"
+    # money received from, or paid out to, payment service providers
+    CLEARING = "CLEARING"
+    # money paid to healthcare providers for bills
+    SETTLEMENT = "SETTLEMENT"
+    FEES = "FEES"
@@ -1,4 +1,5 @@
 from app.core.config import settings
+from app.core.query_metrics import instrument_engine
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
@@ -7,6 +8,7 @@ engine = create_engine(
     settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI, pool_pre_ping=True
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
 
 async_db_url = settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI
 AsyncSessionLocal: AsyncSession = sessionmaker(
@@ -16,3 +18,6 @@ AsyncSessionLocal: AsyncSession = sessionmaker(
     class_=AsyncSession,
     expire_on_commit=False,
 )
+
+# count and time the statements of every request
+instrument_engine(AsyncSessionLocal.kw["bind"].sync_engine)
@@ -0,0 +1,197 @@
+"""The :mod:`app.startup_profile` module reports how long it takes to import the API
+and how much resident memory the import costs, so worker boot time can be held to a budget.
+
+Usage:
+    python -m app.startup_profile
+    python -m app.startup_profile --budget-ms 1500 --budget-mb 150 --json
+
+The import of ``app.main`` runs alone in a fresh interpreter with ``-X importtime``,
+and its import time is reported per top level package. The modules which are meant
+to be loaded lazily (provider SDKs and data tables) are then probed in a second
+interpreter, which imports ``app.main`` and then each of them: a lazy module that
+has already been imported by ``app.main`` is flagged as eager. Lazy modules are kept
+out of the first interpreter, so their cost is never charged to startup.
+"""
+# Author: Christopher Dare
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_TARGET = "app.main"
+
+# modules which should only be loaded on first use
+LAZY_MODULES = [
+    "pycountry",
+    "phonenumbers",
+    "twilio.rest",
+    "sendgrid",
+    "jose.jwt",
+    "passlib.context",
+    "bcrypt",
+    "numpy",
+]
+
+# runs in the child interpreter: imports the target, then each lazy module,
+# recording the wall time and resident memory cost of every step
+_CHILD_PROGRAM = """
+import importlib, json, os, sys, time
+
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+target, lazy_modules = sys.argv[1], json.loads(sys.argv[2])
+baseline_kb = rss_kb()
+steps, loaded_by_target = [], set()
+for name in [target] + lazy_modules:
+    was_loaded = name in loaded_by_target
+    rss_before, started = rss_kb(), time.perf_counter()
+    error = None
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        error = repr(e)
+    if name == target:
+        loaded_by_target = set(sys.modules)
+    steps.append({
+        "module": name,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+        "rss_mb": round((rss_kb() - rss_before) / 1024, 2),
+        "already_loaded": was_loaded,
+        "error": error,
+    })
+print(json.dumps({"baseline_rss_mb": round(baseline_kb / 1024, 2), "steps": steps}))
+"""
+
+
+def parse_importtime(output: str) -> Dict[str, int]:
+    """Sums the self import time (in microseconds) of every module by top level package"""
+    totals: Dict[str, int] = defaultdict(int)
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _cumulative_us, module = line[len("import time:") :].split("|")
+            totals[module.strip().split(".")[0]] += int(self_us)
+        except ValueError:
+            continue
+    return dict(totals)
+
+
+def run_child(
+    target: str, lazy_modules: List[str], importtime: bool
+) -> Tuple[Dict[str, Any], str]:
+    """Imports `target`, then `lazy_modules`, in a fresh interpreter. Returns its
+    report and its standard error (the `-X importtime` output, if enabled)"""
+    process = subprocess.run(
+        [
+            sys.executable,
+            *(["-X", "importtime"] if importtime else []),
+            "-c",
+            _CHILD_PROGRAM,
+            target,
+            json.dumps(lazy_modules),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0 or not process.stdout.strip():
+        raise RuntimeError(f"Could not profile import of {target}: {process.stderr}")
+    report = json.loads(process.stdout.strip().splitlines()[-1])
+    if report["steps"][0]["error"]:
+        raise RuntimeError(f"Could not import {target}: {report['steps'][0]['error']}")
+    return report, process.stderr
+
+
+def profile_startup(
+    target: str = DEFAULT_TARGET, lazy_modules: List[str] = LAZY_MODULES
+) -> Dict[str, Any]:
+    """Imports `target` in a fresh interpreter and returns the startup report"""
+    report, importtime_output = run_child(target, [], importtime=True)
+    target_step = report["steps"][0]
+    packages = parse_importtime(importtime_output)
+    lazy_steps = run_child(target, lazy_modules, importtime=False)[0]["steps"][1:]
+    return {
+        "target": target,
+        "import_ms": target_step["ms"],
+        "import_rss_mb": target_step["rss_mb"],
+        "baseline_rss_mb": report["baseline_rss_mb"],
+        "packages": [
+            {"package": name, "ms": round(us / 1000, 2)}
+            for name, us in sorted(packages.items(), key=lambda i: -i[1])
+        ],
+        "lazy_modules": [
+            {**step, "eager": step["already_loaded"]} for step in lazy_steps
+        ],
+    }
+
+
+def print_report(report: Dict[str, Any], top: int = 20) -> None:
+    print(
+        f"import {report['target']}: {report['import_ms']} ms, "
+        f"+{report['import_rss_mb']} MB RSS "
+        f"(interpreter baseline {report['baseline_rss_mb']} MB)"
+    )
+    print(f"\n{'package':<40}{'self ms':>10}")
+    for row in report["packages"][:top]:
+        print(f"{row['package']:<40}{row['ms']:>10}")
+    print(f"\n{'lazy module':<40}{'ms':>10}{'MB':>10}  status")
+    for row in report["lazy_modules"]:
+        status = "EAGER" if row["eager"] else row["error"] or "lazy"
+        print(f"{row['module']:<40}{row['ms']:>10}{row['rss_mb']:>10}  {status}")
+
+
+def check_budget(
+    report: Dict[str, Any],
+    budget_ms: Optional[float] = None,
+    budget_mb: Optional[float] = None,
+) -> List[str]:
+    """Returns how the startup report exceeds its budget, if it does"""
+    violations = []
+    if budget_ms is not None and report["import_ms"] > budget_ms:
+        violations.append(
+            f"import time {report['import_ms']} ms exceeds {budget_ms} ms"
+        )
+    if budget_mb is not None and report["import_rss_mb"] > budget_mb:
+        violations.append(
+            f"import memory {report['import_rss_mb']} MB exceeds {budget_mb} MB"
+        )
+    violations += [
+        f"{row['module']} is imported eagerly"
+        for row in report["lazy_modules"]
+        if row["eager"]
+    ]
+    return violations
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default=DEFAULT_TARGET)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--budget-mb", type=float, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile_startup(target=args.target)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, top=args.top)
+
+    violations = check_budget(report, args.budget_ms, args.budget_mb)
+    for violation in violations:
+        print(f"Startup budget exceeded: {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,13 @@
 # Author: Christopher Dare
 
 from .bank import get_bank_list, resolve_account_number
-from .messaging import ModeOfMessageDelivery, mailgun_client, send_sms
-from .parser import parse_mobile_number, quantize_monetary_number
+from .messaging import ModeOfMessageDelivery, get_mailgun_client, send_sms
+from .money import Money
+from .parser import (
+    normalize_mobile_number,
+    parse_mobile_number,
+    quantize_monetary_number,
+)
 from .security import (
     check_password,
     generate_password_reset_token,
@@ -12,4 +17,4 @@ from .security import (
     verify_password_reset_token,
 )
 from .valueset_generator import get_enum_as_dict, get_enum_as_list
-from .wallet import get_country_currency
+from .wallet import get_country_currency, get_plan_period
@@ -0,0 +1,201 @@
+"""The :mod:`app.utils.adjudication` module contains the cost-sharing engine which splits
+healthcare bills between the wallet holder (patient) and the payer.
+
+Each bill is adjudicated against the policy of its wallet in order:
+
+1. the deductible: the patient pays the bill until the deductible is met
+2. coinsurance or copay: of the rest of the bill, the patient pays their coinsurance
+   share, or a fixed copay (at most the rest of the bill)
+3. the out-of-pocket limit: the patient never pays more than what is left of it
+
+Bills of the same wallet are adjudicated in the order they are given, each one updating
+the wallet's year-to-date deductible and out-of-pocket accumulators. A deductible or
+out-of-pocket limit of zero means the policy has none.
+
+:func:`adjudicate` runs over NumPy arrays of minor units (see :mod:`app.utils.money`)
+and processes tens of thousands of bills in a few milliseconds.
+:func:`adjudicate_bill` is the scalar equivalent for a single bill.
+"""
+# Author: Christopher Dare
+
+from typing import NamedTuple, Sequence, Tuple
+
+from app.schemas import PaymentContributionType
+
+from .money import (
+    DEFAULT_ROUNDING,
+    Money,
+    multiply_array,
+    to_minor_units,
+    to_rate_units,
+)
+
+# coinsurance rates are expressed in units of 1/RATE_SCALE
+RATE_SCALE = 10_000
+
+
+class PolicyArrays(NamedTuple):
+    """Cost-sharing terms of many wallets, one array element per wallet"""
+
+    deductible: "np.ndarray"  # minor units
+    out_of_pocket_limit: "np.ndarray"  # minor units, 0 for no limit
+    coinsurance: "np.ndarray"  # rate units, RATE_SCALE being 100%
+    copay_amount: "np.ndarray"  # minor units
+    is_copay: "np.ndarray"  # bool
+
+
+class Accumulators(NamedTuple):
+    """Year-to-date amounts of many wallets, one array element per wallet"""
+
+    deductible_met: "np.ndarray"  # minor units
+    out_of_pocket_met: "np.ndarray"  # minor units
+
+
+class Adjudication(NamedTuple):
+    """Per bill splits, in the order of the bills, and the updated accumulators"""
+
+    patient: "np.ndarray"
+    payer: "np.ndarray"
+    deductible: "np.ndarray"  # part of `patient` applied to the deductible
+    accumulators: Accumulators
+
+
+def get_policy_arrays(policies: Sequence) -> PolicyArrays:
+    """Builds the policy arrays of wallets or wallet policies
+    (anything with the fields of `AbstractHealthcareWalletPolicy`)"""
+    import numpy as np
+
+    return PolicyArrays(
+        deductible=to_minor_units(p.deductible or 0 for p in policies),
+        out_of_pocket_limit=to_minor_units(
+            p.out_of_pocket_limit or 0 for p in policies
+        ),
+        coinsurance=to_rate_units((p.coinsurance or 0 for p in policies), RATE_SCALE),
+        copay_amount=to_minor_units(p.copay_amount or 0 for p in policies),
+        is_copay=np.fromiter(
+            (p.contribution_type == PaymentContributionType.COPAY for p in policies),
+            dtype=bool,
+        ),
+    )
+
+
+def _group_cumsum(values, starts):
+    """Cumulative sums of `values` restarting at every index in `starts`"""
+    import numpy as np
+
+    totals = np.cumsum(values)
+    before_group = np.r_[0, totals[starts[1:] - 1]]
+    return totals - np.repeat(before_group, np.diff(np.r_[starts, values.size]))
+
+
+def _apply_limit(amounts, starts, remaining):
+    """Caps the cumulative `amounts` of every group at its `remaining` allowance and
+    returns the capped amount of every element"""
+    import numpy as np
+
+    after = _group_cumsum(amounts, starts)
+    before = after - amounts
+    return np.minimum(after, remaining) - np.minimum(before, remaining)
+
+
+def adjudicate(
+    wallet_index,
+    amounts,
+    policies: PolicyArrays,
+    accumulators: Accumulators,
+    rounding: str = DEFAULT_ROUNDING,
+) -> Adjudication:
+    """
+    Adjudicates a batch of bills.
+
+    `wallet_index[i]` is the position, in the policy and accumulator arrays, of the
+    wallet billed `amounts[i]` minor units. Bills of a wallet are adjudicated in
+    the order they appear.
+    """
+    import numpy as np
+
+    wallet_index = np.asarray(wallet_index, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=np.int64)
+    if wallet_index.shape != amounts.shape:
+        raise ValueError("Every bill must have a wallet")
+    if amounts.size and amounts.min() < 0:
+        raise ValueError("Bill amounts must not be negative")
+    deductible_met, out_of_pocket_met = accumulators
+    if amounts.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return Adjudication(empty, empty, empty, accumulators)
+
+    # group the bills of every wallet, keeping their order within the wallet
+    order = np.argsort(wallet_index, kind="stable")
+    wallets, bills = wallet_index[order], amounts[order]
+    starts = np.flatnonzero(np.r_[True, wallets[1:] != wallets[:-1]])
+
+    # 1. deductible
+    remaining_deductible = np.maximum(
+        policies.deductible[wallets] - deductible_met[wallets], 0
+    )
+    deductible = _apply_limit(bills, starts, remaining_deductible)
+    rest = bills - deductible
+
+    # 2. coinsurance or copay on the rest of the bill
+    share = np.where(
+        policies.is_copay[wallets],
+        np.minimum(policies.copay_amount[wallets], rest),
+        multiply_array(rest, policies.coinsurance[wallets], RATE_SCALE, rounding),
+    )
+
+    # 3. out-of-pocket limit
+    limit = policies.out_of_pocket_limit[wallets]
+    remaining_out_of_pocket = np.where(
+        limit > 0,
+        np.maximum(limit - out_of_pocket_met[wallets], 0),
+        np.iinfo(np.int64).max,
+    )
+    patient = _apply_limit(deductible + share, starts, remaining_out_of_pocket)
+    # a limit reached within the deductible leaves the rest of it unpaid (and unmet)
+    deductible = np.minimum(deductible, patient)
+
+    billed = wallets[starts]
+    deductible_met, out_of_pocket_met = deductible_met.copy(), out_of_pocket_met.copy()
+    deductible_met[billed] += np.add.reduceat(deductible, starts)
+    out_of_pocket_met[billed] += np.add.reduceat(patient, starts)
+    accumulators = Accumulators(deductible_met, out_of_pocket_met)
+    # restore the order of the bills
+    unsorted = np.empty_like(order)
+    unsorted[order] = np.arange(order.size)
+    patient, deductible = patient[unsorted], deductible[unsorted]
+    return Adjudication(
+        patient=patient,
+        payer=amounts - patient,
+        deductible=deductible,
+        accumulators=accumulators,
+    )
+
+
+def adjudicate_bill(
+    amount: Money,
+    policy,
+    deductible_met: Money,
+    out_of_pocket_met: Money,
+    rounding: str = DEFAULT_ROUNDING,
+) -> Tuple[Money, Money, Money]:
+    """Adjudicates a single bill against a policy (anything with the fields of
+    `AbstractHealthcareWalletPolicy`). Returns the patient share, the payer share
+    and the part of the patient share applied to the deductible"""
+    if amount < 0:
+        raise ValueError("Bill amounts must not be negative")
+    currency = amount.currency
+    deductible_limit = Money.from_decimal(policy.deductible or 0, currency)
+    deductible = min(amount, max(deductible_limit - deductible_met, Money(0, currency)))
+    rest = amount - deductible
+    if policy.contribution_type == PaymentContributionType.COPAY:
+        share = min(Money.from_decimal(policy.copay_amount or 0, currency), rest)
+    else:
+        share = rest.multiply(policy.coinsurance or 0, rounding)
+    patient = deductible + share
+    limit = Money.from_decimal(policy.out_of_pocket_limit or 0, currency)
+    if limit > 0:
+        patient = min(patient, max(limit - out_of_pocket_met, Money(0, currency)))
+    # a limit reached within the deductible leaves the rest of it unpaid (and unmet)
+    deductible = min(deductible, patient)
+    return patient, amount - patient, deductible
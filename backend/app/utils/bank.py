@@ -4,14 +4,30 @@
 
 import httpx
 from app.core.config import settings
+from app.core.provider_metrics import call_provider_async
 from app.schemas import PaymentServiceProviderType, PaystackBank, ResolvedBankAccount
 
 
-async def resolve_account_number(account_number: str, bank_code: str):
-    response = await httpx.AsyncClient().get(
-        f"https://api.paystack.co/bank/resolve?account_number={account_number}&bank_code={bank_code}",
+def get_paystack_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
         headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        timeout=httpx.Timeout(
+            settings.PROVIDER_TIMEOUT_SECONDS,
+            connect=settings.PROVIDER_CONNECT_TIMEOUT_SECONDS,
+        ),
     )
+
+
+async def resolve_account_number(account_number: str, bank_code: str):
+    async with get_paystack_client() as client:
+        response = await call_provider_async(
+            "paystack",
+            "resolve_account_number",
+            lambda: client.get(
+                f"https://api.paystack.co/bank/resolve?account_number={account_number}&bank_code={bank_code}",
+            ),
+            idempotent=True,
+        )
     if response.status_code == 200 and response.json().get("status"):
         resolved_bank_account = ResolvedBankAccount(**response.json().get("data"))
     else:
@@ -30,10 +46,15 @@ async def get_bank_list(
 ):
     if items_per_page > 100:
         raise ValueError("items_per_page must be less than 100")
-    response = await httpx.AsyncClient().get(
-        f"https://api.paystack.co/bank?country={country}&perPage={items_per_page}",
-        headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-    )
+    async with get_paystack_client() as client:
+        response = await call_provider_async(
+            "paystack",
+            "get_bank_list",
+            lambda: client.get(
+                f"https://api.paystack.co/bank?country={country}&perPage={items_per_page}",
+            ),
+            idempotent=True,
+        )
     banks = []
     if response.status_code == 200 and response.json().get("status"):
         for bank in response.json().get("data"):
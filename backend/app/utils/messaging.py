@@ -2,10 +2,12 @@
 """
 import json
 from enum import Enum
+from functools import lru_cache
 from typing import Any, List, Optional, Union
 
 import requests
 from app.core.config import settings
+from app.core.provider_metrics import call_provider, get_timeout
 from pydantic import BaseModel, EmailStr
 
 # Author: Christopher Dare
@@ -79,15 +81,24 @@ class SMSMessageClient(MessageClient):
     def send(self, recipient: str, message: str, template: Any = None):
         client_response = MessageClientResponse()
         if self.provider == MessagingProviders.TWILIO:
-            client_response = self.client.messages.create(
-                messaging_service_sid=self.messaging_service_sid,
-                body=message,
-                to=recipient,
+            client_response = call_provider(
+                "twilio",
+                "send_sms",
+                lambda: self.client.messages.create(
+                    messaging_service_sid=self.messaging_service_sid,
+                    body=message,
+                    to=recipient,
+                ),
             )
         elif self.provider == MessagingProviders.HUBTEL:
-            response = requests.get(
-                f"{self.api_base_url}?clientsecret={self.api_key}&clientid={self.client_id}from={self.from_address}&to={recipient}&content={message}",
-                auth=(self.client_id, self.api_key),
+            response = call_provider(
+                "hubtel",
+                "send_sms",
+                lambda: requests.get(
+                    f"{self.api_base_url}?clientsecret={self.api_key}&clientid={self.client_id}from={self.from_address}&to={recipient}&content={message}",
+                    auth=(self.client_id, self.api_key),
+                    timeout=get_timeout(),
+                ),
             )
             if response.status_code == 201 or response.status_code == 200:
                 client_response.is_sent = response.json().get("status") != "0"
@@ -130,7 +141,9 @@ class EmailMessageClient(MessageClient):
                 html_content=html_content,
             )
             try:
-                client_response.response = self.client.send(message)
+                client_response.response = call_provider(
+                    "sendgrid", "send_email", lambda: self.client.send(message)
+                )
             except Exception as e:
                 raise e
         elif self.provider == MessagingProviders.MAILGUN:
@@ -146,10 +159,15 @@ class EmailMessageClient(MessageClient):
             elif message:
                 mailgun_data["text"] = message
             try:
-                client_response.response = requests.post(
-                    f"{self.api_base_url}",
-                    auth=("api", self.api_key),
-                    data=mailgun_data,
+                client_response.response = call_provider(
+                    "mailgun",
+                    "send_email",
+                    lambda: requests.post(
+                        f"{self.api_base_url}",
+                        auth=("api", self.api_key),
+                        data=mailgun_data,
+                        timeout=get_timeout(),
+                    ),
                 )
                 client_response.is_sent = (
                     200 <= client_response.response.status_code < 300
@@ -178,4 +196,7 @@ def send_sms(
     return client.send(message=message, recipient=mobile)
 
 
-mailgun_client = EmailMessageClient(provider=MessagingProviders.MAILGUN)
+@lru_cache(maxsize=None)
+def get_mailgun_client() -> EmailMessageClient:
+    """Returns a shared Mailgun client, built on first use rather than at import"""
+    return EmailMessageClient(provider=MessagingProviders.MAILGUN)
@@ -0,0 +1,354 @@
+"""The :mod:`app.utils.money` module contains a monetary value type stored as integer
+minor units (e.g. pesewas for GHS), and vectorized operations over arrays of amounts.
+
+Arithmetic on :class:`Money` is exact integer arithmetic. Rounding only happens when an
+amount is multiplied by a fraction (e.g. a coinsurance rate) or parsed from a value with
+more decimal places than the currency has, and always with an explicit rounding mode
+(one of the rounding constants of the :mod:`decimal` module).
+
+The batch functions take and return NumPy ``int64`` arrays of minor units and are the
+fast path for bulk calculations: they run one to two orders of magnitude faster than
+the equivalent loops over Decimals (see ``benchmarks/bench_money.py``). NumPy is
+imported on first use. Scalar :class:`Money` is about exactness rather than speed:
+CPython's Decimal is implemented in C, so single amounts are not faster as Money.
+"""
+# Author: Christopher Dare
+
+from decimal import (
+    MAX_EMAX,
+    MAX_PREC,
+    MIN_EMIN,
+    ROUND_CEILING,
+    ROUND_DOWN,
+    ROUND_FLOOR,
+    ROUND_HALF_DOWN,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    ROUND_UP,
+    Context,
+    Decimal,
+    Inexact,
+)
+from fractions import Fraction
+from typing import Iterable, List, Sequence, Tuple, Union
+
+from app.schemas import WalletCurrencyType
+
+# number of decimal places of the minor unit of each currency (ISO 4217), by code.
+# Every WalletCurrencyType must be listed: enabling a currency without its exponent
+# fails on import rather than on the first payment in it
+CURRENCY_EXPONENTS = {
+    "GHS": 2,
+    "NGN": 2,
+    "USD": 2,
+}
+_MISSING_EXPONENTS = [
+    c.value for c in WalletCurrencyType if c not in CURRENCY_EXPONENTS
+]
+if _MISSING_EXPONENTS:
+    raise RuntimeError(f"No minor unit exponent for currencies {_MISSING_EXPONENTS}")
+DEFAULT_ROUNDING = ROUND_HALF_UP
+# products of finite decimals are exact with enough precision
+_EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN, traps=[Inexact])
+
+Amount = Union["Money", Decimal, int, str]
+Factor = Union[Decimal, Fraction, int, str]
+
+
+def get_currency_exponent(currency: WalletCurrencyType) -> int:
+    try:
+        return CURRENCY_EXPONENTS[currency]
+    except KeyError:
+        raise ValueError(f"Unsupported currency {currency}")
+
+
+def divide(numerator: int, denominator: int, rounding: str = DEFAULT_ROUNDING) -> int:
+    """Divides two integers, rounding the quotient with a :mod:`decimal` rounding mode"""
+    if denominator == 0:
+        raise ZeroDivisionError("Cannot divide an amount by zero")
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)  # floor division
+    if remainder == 0 or rounding == ROUND_FLOOR:
+        return quotient
+    if rounding == ROUND_CEILING:
+        return quotient + 1
+    # from here on rounding depends on the sign of the (inexact) quotient
+    away = quotient + 1 if numerator > 0 else quotient
+    toward = quotient if numerator > 0 else quotient + 1
+    if rounding == ROUND_UP:
+        return away
+    if rounding == ROUND_DOWN:
+        return toward
+    twice = 2 * remainder
+    if twice != denominator:  # not a tie: round to the nearest
+        return quotient + 1 if twice > denominator else quotient
+    if rounding == ROUND_HALF_UP:
+        return away
+    if rounding == ROUND_HALF_DOWN:
+        return toward
+    if rounding == ROUND_HALF_EVEN:
+        return quotient if quotient % 2 == 0 else quotient + 1
+    raise ValueError(f"Unsupported rounding mode {rounding}")
+
+
+def as_fraction(factor: Factor) -> Tuple[int, int]:
+    """Returns the exact (numerator, denominator) of a multiplication factor.
+    Floats are rejected since they cannot represent most decimal rates exactly"""
+    if isinstance(factor, float):
+        raise TypeError("Use a Decimal, Fraction, int or str factor, not a float")
+    if isinstance(factor, int):
+        return factor, 1
+    if isinstance(factor, str):
+        factor = Decimal(factor)
+    if isinstance(factor, Decimal) and not factor.is_finite():
+        raise ValueError(f"Cannot multiply an amount by {factor}")
+    return factor.as_integer_ratio()
+
+
+class Money:
+    """An exact amount of money in integer minor units of a currency"""
+
+    __slots__ = ("minor", "currency")
+
+    def __init__(
+        self, minor: int = 0, currency: WalletCurrencyType = WalletCurrencyType.GHS
+    ):
+        if not isinstance(minor, int) or isinstance(minor, bool):
+            raise TypeError(
+                "Money must be created from an integer number of minor units"
+            )
+        self.minor = minor
+        self.currency = WalletCurrencyType(currency)
+
+    @classmethod
+    def from_decimal(
+        cls,
+        amount: Union[Decimal, int, str],
+        currency: WalletCurrencyType = WalletCurrencyType.GHS,
+        rounding: str = DEFAULT_ROUNDING,
+    ) -> "Money":
+        """Converts a major unit amount (e.g. `Decimal("12.50")`) to Money, rounding
+        any digits beyond the minor unit"""
+        if isinstance(amount, float):
+            raise TypeError("Use a Decimal, int or str amount, not a float")
+        if currency.__class__ is not WalletCurrencyType:
+            currency = WalletCurrencyType(currency)
+        exponent = get_currency_exponent(currency)
+        if isinstance(amount, str):
+            amount = Decimal(amount)
+        if isinstance(amount, Decimal) and amount.is_finite():
+            # exact: scaling by a power of ten only changes the exponent
+            minor = amount.scaleb(exponent).to_integral_value(rounding=rounding)
+            return _make(int(minor), currency)
+        numerator, denominator = as_fraction(amount)
+        return _make(
+            divide(numerator * 10**exponent, denominator, rounding), currency
+        )
+
+    @classmethod
+    def parse(
+        cls,
+        amount: Amount,
+        currency: WalletCurrencyType = WalletCurrencyType.GHS,
+        rounding: str = DEFAULT_ROUNDING,
+    ) -> "Money":
+        if isinstance(amount, Money):
+            amount.check_currency(currency)
+            return amount
+        return cls.from_decimal(amount, currency, rounding)
+
+    @property
+    def exponent(self) -> int:
+        return get_currency_exponent(self.currency)
+
+    def to_decimal(self) -> Decimal:
+        """Returns the amount in major units, with exactly as many decimal places as
+        the minor unit of the currency"""
+        return Decimal(self.minor).scaleb(-self.exponent)
+
+    def check_currency(self, currency: WalletCurrencyType) -> None:
+        if currency != self.currency:
+            raise ValueError(
+                f"Cannot combine {self.currency.value} and {currency} amounts"
+            )
+
+    def _minor_of(self, other: "Money") -> int:
+        if not isinstance(other, Money):
+            raise TypeError(f"Cannot combine Money with {type(other).__name__}")
+        other.check_currency(self.currency)
+        return other.minor
+
+    def __add__(self, other: "Money") -> "Money":
+        if other.__class__ is Money and other.currency is self.currency:
+            return _make(self.minor + other.minor, self.currency)
+        if isinstance(other, int) and other == 0:  # supports sum()
+            return self
+        return _make(self.minor + self._minor_of(other), self.currency)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: "Money") -> "Money":
+        return _make(self.minor - self._minor_of(other), self.currency)
+
+    def __neg__(self) -> "Money":
+        return _make(-self.minor, self.currency)
+
+    def __abs__(self) -> "Money":
+        return _make(abs(self.minor), self.currency)
+
+    def multiply(self, factor: Factor, rounding: str = DEFAULT_ROUNDING) -> "Money":
+        """Multiplies the amount by an exact factor, rounding to the minor unit"""
+        if factor.__class__ is Decimal and factor.is_finite():
+            product = _EXACT.multiply(Decimal(self.minor), factor)
+            return _make(int(product.to_integral_value(rounding)), self.currency)
+        numerator, denominator = as_fraction(factor)
+        return _make(
+            divide(self.minor * numerator, denominator, rounding), self.currency
+        )
+
+    def __mul__(self, factor: Factor) -> "Money":
+        return self.multiply(factor)
+
+    __rmul__ = __mul__
+
+    def allocate(self, ratios: Sequence[int]) -> List["Money"]:
+        """Splits the amount in proportion to `ratios` without losing a minor unit.
+        Leftover minor units go to the parts with the largest remainders"""
+        total = sum(ratios)
+        if total <= 0 or any(ratio < 0 for ratio in ratios):
+            raise ValueError("Allocation ratios must be positive")
+        sign = -1 if self.minor < 0 else 1
+        minor = abs(self.minor)
+        parts = [divmod(minor * ratio, total) for ratio in ratios]
+        leftover = minor - sum(part for part, _ in parts)
+        by_remainder = sorted(range(len(parts)), key=lambda i: -parts[i][1])
+        shares = [part for part, _ in parts]
+        for i in by_remainder[:leftover]:
+            shares[i] += 1
+        return [_make(sign * share, self.currency) for share in shares]
+
+    def _compare(self, other: "Money") -> int:
+        if isinstance(other, int) and other == 0:
+            return self.minor
+        return self.minor - self._minor_of(other)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Money):
+            return self.minor == other.minor and self.currency == other.currency
+        if isinstance(other, int) and not isinstance(other, bool):
+            return other == 0 and self.minor == 0
+        return NotImplemented
+
+    def __lt__(self, other: "Money") -> bool:
+        return self._compare(other) < 0
+
+    def __le__(self, other: "Money") -> bool:
+        return self._compare(other) <= 0
+
+    def __gt__(self, other: "Money") -> bool:
+        return self._compare(other) > 0
+
+    def __ge__(self, other: "Money") -> bool:
+        return self._compare(other) >= 0
+
+    def __hash__(self) -> int:
+        # equal amounts have equal minor units, and a zero amount equals 0
+        return hash(self.minor)
+
+    def __bool__(self) -> bool:
+        return self.minor != 0
+
+    def __repr__(self) -> str:
+        return f"Money({self.minor}, {self.currency.value})"
+
+    def __str__(self) -> str:
+        return f"{self.currency.value} {self.to_decimal()}"
+
+
+def _make(minor: int, currency: WalletCurrencyType) -> Money:
+    """Creates Money from already validated minor units and currency"""
+    money = object.__new__(Money)
+    money.minor = minor
+    money.currency = currency
+    return money
+
+
+def to_minor_units(
+    amounts: Iterable[Union[Decimal, int, str]],
+    currency: WalletCurrencyType = WalletCurrencyType.GHS,
+    rounding: str = DEFAULT_ROUNDING,
+):
+    """Converts major unit amounts to a NumPy int64 array of minor units"""
+    import numpy as np
+
+    return np.fromiter(
+        (Money.from_decimal(amount, currency, rounding).minor for amount in amounts),
+        dtype=np.int64,
+    )
+
+
+def from_minor_units(
+    minor_units, currency: WalletCurrencyType = WalletCurrencyType.GHS
+) -> List[Decimal]:
+    """Converts an array of minor units back to major unit Decimals"""
+    exponent = get_currency_exponent(currency)
+    return [Decimal(int(minor)).scaleb(-exponent) for minor in minor_units]
+
+
+def to_rate_units(rates: Iterable[Factor], scale: int = 10_000):
+    """Converts rates (e.g. coinsurance from 0 to 1) to a NumPy int64 array of integer
+    rate units, `scale` units being a rate of 1. Rates must be exact at that scale"""
+    import numpy as np
+
+    units = []
+    for rate in rates:
+        numerator, denominator = as_fraction(rate)
+        unit, remainder = divmod(numerator * scale, denominator)
+        if remainder:
+            raise ValueError(f"Rate {rate} is not exact at a scale of {scale}")
+        units.append(unit)
+    return np.asarray(units, dtype=np.int64)
+
+
+def divide_array(numerators, denominator: int, rounding: str = DEFAULT_ROUNDING):
+    """Vectorized :func:`divide` of an int64 array by a positive integer"""
+    import numpy as np
+
+    if denominator <= 0:
+        raise ValueError("The denominator must be a positive integer")
+    numerators = np.asarray(numerators, dtype=np.int64)
+    quotient, remainder = np.divmod(numerators, denominator)  # floor division
+    if rounding == ROUND_FLOOR:
+        return quotient
+    inexact = remainder != 0
+    if rounding == ROUND_CEILING:
+        return quotient + inexact
+    positive = numerators > 0
+    if rounding == ROUND_UP:
+        return quotient + (inexact & positive)
+    if rounding == ROUND_DOWN:
+        return quotient + (inexact & ~positive)
+    twice = 2 * remainder
+    above, tie = twice > denominator, twice == denominator
+    if rounding == ROUND_HALF_UP:
+        return quotient + (above | (tie & positive))
+    if rounding == ROUND_HALF_DOWN:
+        return quotient + (above | (tie & ~positive))
+    if rounding == ROUND_HALF_EVEN:
+        return quotient + (above | (tie & (quotient % 2 == 1)))
+    raise ValueError(f"Unsupported rounding mode {rounding}")
+
+
+def multiply_array(
+    minor_units, rate_units, scale: int = 10_000, rounding: str = DEFAULT_ROUNDING
+):
+    """Multiplies arrays of minor units by rates expressed in rate units (see
+    :func:`to_rate_units`), rounding each product to the minor unit.
+    Exact as long as `minor_units * rate_units` fits in an int64"""
+    import numpy as np
+
+    products = np.asarray(minor_units, dtype=np.int64) * np.asarray(
+        rate_units, dtype=np.int64
+    )
+    return divide_array(products, scale, rounding)
@@ -5,13 +5,13 @@
 from decimal import ROUND_UP, Decimal
 from typing import Union
 
-import phonenumbers
-
 
 def parse_mobile_number(
     phone_number: str, country_code: str = None, international_format: bool = True
 ) -> str:
     """Transforms a phone number into national or international format"""
+    import phonenumbers
+
     mobile = None
     try:
         if country_code:
@@ -30,6 +30,20 @@ def parse_mobile_number(
     return mobile
 
 
+def normalize_mobile_number(phone_number: str, region: str = None) -> str:
+    """Transforms a phone number in international or, given the ISO 3166-1 alpha-2
+    `region` it is local to, national format into the E164 format"""
+    import phonenumbers
+
+    try:
+        mobile = phonenumbers.parse(str(phone_number).strip(), region)
+    except phonenumbers.NumberParseException:
+        raise ValueError("mobile or telephone number is invalid")
+    if not phonenumbers.is_valid_number(mobile):
+        raise ValueError("mobile or telephone number is invalid")
+    return phonenumbers.format_number(mobile, phonenumbers.PhoneNumberFormat.E164)
+
+
 def quantize_monetary_number(
     amount: Union[str, Decimal, int], rounding=ROUND_UP
 ) -> Decimal:
@@ -6,7 +6,6 @@ import hashlib
 from typing import Optional
 
 from app.core.config import settings
-from jose import jwt
 
 
 def make_password(raw_password: str) -> str:
@@ -22,6 +21,8 @@ def check_password(hash: str, raw_password: str) -> bool:
 
 
 def generate_password_reset_token(email: str) -> str:
+    from jose import jwt
+
     delta = timedelta(hours=settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS)
     now = datetime.utcnow()
     expires = now + delta
@@ -35,6 +36,8 @@ def generate_password_reset_token(email: str) -> str:
 
 
 def verify_password_reset_token(token: str) -> Optional[str]:
+    from jose import jwt
+
     try:
         decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         return decoded_token["email"]
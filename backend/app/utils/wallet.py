@@ -2,7 +2,11 @@
 """
 # Author: Christopher Dare
 
+import datetime
+from typing import Tuple
+
 from app import schemas
+from app.core.config import settings
 
 
 def get_country_currency(country: schemas.OperatingCountryType, raise_exception=True):
@@ -22,3 +26,14 @@ def get_country_currency(country: schemas.OperatingCountryType, raise_exception=
             + " Is this country supported by Serenity?"
         )
     return currency
+
+
+def get_plan_period(
+    day: datetime.date, start_month: int = None
+) -> Tuple[datetime.date, datetime.date]:
+    """Returns the first and last day of the plan year `day` falls in"""
+    start_month = start_month or settings.PLAN_YEAR_START_MONTH
+    year = day.year if day.month >= start_month else day.year - 1
+    start = datetime.date(year, start_month, 1)
+    end = datetime.date(year + 1, start_month, 1) - datetime.timedelta(days=1)
+    return start, end
@@ -0,0 +1,155 @@
+"""The :mod:`app.worker` module contains the background jobs run by the celery worker
+"""
+# Author: Christopher Dare
+
+import asyncio
+import datetime
+import uuid as uuid_pkg
+from typing import List, Tuple
+
+from app import crud
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.session import AsyncSessionLocal
+from sqlalchemy.exc import DBAPIError
+
+
+async def _compact_wallet_balances() -> int:
+    async with AsyncSessionLocal() as db:
+        return await crud.wallet_balance.compact(db)
+
+
+@celery_app.task(acks_late=True)
+def compact_wallet_balances() -> str:
+    """Rolls recent ledger entries into new wallet balance snapshots"""
+    taken = asyncio.run(_compact_wallet_balances())
+    return f"Took {taken} wallet balance snapshots"
+
+
+async def _reconcile_wallet_accumulators() -> int:
+    async with AsyncSessionLocal() as db:
+        return await crud.wallet_accumulator.reconcile(db)
+
+
+@celery_app.task(acks_late=True)
+def reconcile_wallet_accumulators() -> str:
+    """Rebuilds deductible and out-of-pocket accumulators from bill settlements"""
+    corrected = asyncio.run(_reconcile_wallet_accumulators())
+    return f"Corrected {corrected} wallet accumulators"
+
+
+async def _maintain_otp_partitions() -> Tuple[int, int]:
+    async with AsyncSessionLocal() as db:
+        return await crud.otp.maintain_partitions(db)
+
+
+@celery_app.task(acks_late=True)
+def maintain_otp_partitions() -> str:
+    """Creates upcoming partitions of the otp table and drops expired ones"""
+    created, dropped = asyncio.run(_maintain_otp_partitions())
+    return f"Created {created} and dropped {dropped} OTP partitions"
+
+
+async def _enroll_employees(enrollment_id: uuid_pkg.UUID) -> int:
+    async with AsyncSessionLocal() as db:
+        enrollment = await crud.employee_enrollment.get(db, uuid=enrollment_id)
+        if not enrollment:
+            raise ValueError(f"Employee enrollment {enrollment_id} not found")
+        enrollment = await crud.employee_enrollment.run(db, enrollment=enrollment)
+        return enrollment.processed_rows
+
+
+@celery_app.task(acks_late=True)
+def enroll_employees(enrollment_id: str) -> str:
+    """Runs a bulk employee enrollment too large to run within its request"""
+    processed = asyncio.run(_enroll_employees(uuid_pkg.UUID(enrollment_id)))
+    return f"Enrolled {processed} employees"
+
+
+async def _propagate_wallet_policy(propagation_id: uuid_pkg.UUID) -> int:
+    async with AsyncSessionLocal() as db:
+        propagation = await crud.wallet_policy_propagation.get(db, uuid=propagation_id)
+        if not propagation:
+            raise ValueError(f"Wallet policy propagation {propagation_id} not found")
+        propagation = await crud.wallet_policy_propagation.run(
+            db, propagation=propagation
+        )
+        return propagation.updated_wallets
+
+
+# database errors (e.g. lock timeouts) are retried; the propagation resumes after
+# the last chunk of wallets it committed
+@celery_app.task(
+    acks_late=True,
+    autoretry_for=(DBAPIError,),
+    retry_backoff=True,
+    max_retries=settings.WALLET_POLICY_PROPAGATION_MAX_RETRIES,
+)
+def propagate_wallet_policy(propagation_id: str) -> str:
+    """Copies the terms of an edited policy onto the wallets it is applied to"""
+    updated = asyncio.run(_propagate_wallet_policy(uuid_pkg.UUID(propagation_id)))
+    return f"Updated {updated} wallets"
+
+
+async def _resume_wallet_policy_propagations() -> List[uuid_pkg.UUID]:
+    stale_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        seconds=settings.WALLET_POLICY_PROPAGATION_STALE_SECONDS
+    )
+    async with AsyncSessionLocal() as db:
+        return await crud.wallet_policy_propagation.claim_stale(
+            db, stale_before=stale_before
+        )
+
+
+@celery_app.task(acks_late=True)
+def resume_wallet_policy_propagations() -> str:
+    """Sends again the propagations of policy edits whose task was never sent"""
+    propagation_ids = asyncio.run(_resume_wallet_policy_propagations())
+    for propagation_id in propagation_ids:
+        propagate_wallet_policy.delay(str(propagation_id))
+    return f"Resumed {len(propagation_ids)} wallet policy propagations"
+
+
+async def _propagate_user_details(user_id: uuid_pkg.UUID) -> int:
+    async with AsyncSessionLocal() as db:
+        updated = await crud.organization.sync_owner(db, owner_id=user_id)
+        updated += await crud.wallet.sync_owner(db, owner_id=user_id)
+        return updated
+
+
+# the copies are read from the source rows as they are made, so a retried (or
+# superseded) propagation only rewrites the rows still out of date
+@celery_app.task(
+    acks_late=True,
+    autoretry_for=(DBAPIError,),
+    retry_backoff=True,
+    max_retries=settings.DENORMALIZED_FIELDS_MAX_RETRIES,
+)
+def propagate_user_details(user_id: str) -> str:
+    """Copies a user's new name or mobile number onto their wallets and
+    organizations"""
+    updated = asyncio.run(_propagate_user_details(uuid_pkg.UUID(user_id)))
+    return f"Updated {updated} wallets and organizations"
+
+
+async def _propagate_organization_name(organization_id: uuid_pkg.UUID) -> int:
+    async with AsyncSessionLocal() as db:
+        updated = await crud.wallet_policy.sync_managing_organization(
+            db, organization_id=organization_id
+        )
+        updated += await crud.wallet.sync_managing_organization(
+            db, organization_id=organization_id
+        )
+        return updated
+
+
+@celery_app.task(
+    acks_late=True,
+    autoretry_for=(DBAPIError,),
+    retry_backoff=True,
+    max_retries=settings.DENORMALIZED_FIELDS_MAX_RETRIES,
+)
+def propagate_organization_name(organization_id: str) -> str:
+    """Copies an organization's new name onto its wallets and policies"""
+    updated = asyncio.run(_propagate_organization_name(uuid_pkg.UUID(organization_id)))
+    return f"Updated {updated} wallets and policies"
@@ -0,0 +1,6 @@
+#! /usr/bin/env bash
+set -e
+
+# the periodic tasks of app.worker are scheduled here, by a single beat for every
+# worker, so that each fires once whatever the number of workers
+celery beat -A app.worker -l info -s /tmp/celerybeat-schedule
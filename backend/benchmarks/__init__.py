@@ -0,0 +1,5 @@
+"""The :mod:`benchmarks` package contains performance benchmarks for the API.
+Benchmarks are run as modules from the backend folder e.g.
+
+    python -m benchmarks.bench_trusted_responses
+"""
@@ -0,0 +1,76 @@
+"""Measures the cost-sharing engine on a batch of bills, vectorized and bill by bill.
+
+    python -m benchmarks.bench_adjudication [--bills 50000] [--wallets 10000]
+"""
+# Author: Christopher Dare
+
+import argparse
+import random
+import time
+
+import numpy as np
+from app.utils.adjudication import (
+    Accumulators,
+    adjudicate,
+    adjudicate_bill,
+    get_policy_arrays,
+)
+from app.utils.money import Money
+
+from benchmarks.fixtures import make_wallets, report, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bills", type=int, default=50_000)
+    parser.add_argument("--wallets", type=int, default=10_000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    wallets = make_wallets(args.wallets)
+    for i, wallet in enumerate(wallets):
+        if i % 3 == 0:
+            wallet.contribution_type = "copay"
+            wallet.copay_amount = wallet.copay_amount + 20
+    wallet_index = np.array(
+        [random.randrange(args.wallets) for _ in range(args.bills)], dtype=np.int64
+    )
+    amounts = np.array(
+        [random.randint(100, 200_000) for _ in range(args.bills)], dtype=np.int64
+    )
+    zeros = np.zeros(args.wallets, dtype=np.int64)
+
+    started = time.perf_counter()
+    policies = get_policy_arrays(wallets)
+    setup = time.perf_counter() - started
+
+    def vectorized():
+        return adjudicate(wallet_index, amounts, policies, Accumulators(zeros, zeros))
+
+    def bill_by_bill():
+        deductible_met = [Money(0)] * args.wallets
+        out_of_pocket_met = [Money(0)] * args.wallets
+        patient = []
+        for i, amount in zip(wallet_index.tolist(), amounts.tolist()):
+            share, _payer, deductible = adjudicate_bill(
+                Money(amount), wallets[i], deductible_met[i], out_of_pocket_met[i]
+            )
+            deductible_met[i] += deductible
+            out_of_pocket_met[i] += share
+            patient.append(share.minor)
+        return patient
+
+    assert vectorized().patient.tolist() == bill_by_bill(), "engines disagree"
+    print(f"policy arrays for {args.wallets} wallets built in {setup * 1e3:.1f} ms")
+    report(
+        f"adjudicate {args.bills} bills over {args.wallets} wallets",
+        {
+            "vectorized": timeit(vectorized, repeat=5, number=10),
+            "bill by bill": timeit(bill_by_bill, repeat=3, number=1),
+        },
+        items=args.bills,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Measures the latency, throughput and queries per request of the main API flows,
+driving `app.main.app` in process against the configured Postgres database.
+
+    python -m benchmarks.bench_api [--requests 200] [--concurrency 10]
+        [--output results.json] [--compare previous.json]
+
+Scenarios run one after the other, each sending `--requests` requests through
+`--concurrency` concurrent clients: users sign up, are activated, log in, have their
+status checked, create their organization and list their wallets. Rate limits are
+disabled for the run. Results (p50/p95/p99 latency, requests per second, SQL
+statements per request) are printed and written as JSON, by default to
+`benchmarks/results/`, and compared with an earlier run with `--compare`. The run
+exits with an error if any request failed, as the latency of failed requests is not
+the latency of the flow. Run against a disposable database: it leaves the users and
+organizations behind.
+"""
+# Author: Christopher Dare
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import random
+import subprocess
+import time
+import uuid as uuid_pkg
+from pathlib import Path
+from statistics import mean, quantiles
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from app import models
+from app.core.config import settings
+from app.main import app
+from app.session import AsyncSessionLocal
+from sqlalchemy import event, update
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PASSWORD = "qG1IN0kHLKYQGGT"
+
+
+class QueryCounter:
+    """Counts the SQL statements executed by an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+async def run_scenario(
+    name: str,
+    requests: List[Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]],
+    client: httpx.AsyncClient,
+    queries: QueryCounter,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Sends `requests` through `concurrency` concurrent clients and returns the
+    latency percentiles, throughput and queries per request of the scenario"""
+    pending = list(reversed(requests))
+    latencies: List[float] = []
+    errors: Dict[int, int] = {}
+    samples: Dict[int, str] = {}
+
+    async def worker() -> None:
+        while pending:
+            send = pending.pop()
+            started = time.perf_counter()
+            response = await send(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+                samples.setdefault(response.status_code, response.text[:200])
+
+    queries.count = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    percentiles = quantiles(latencies, n=100, method="inclusive")
+    result = {
+        "requests": len(latencies),
+        "errors": {str(status): count for status, count in errors.items()},
+        "error_samples": {str(status): text for status, text in samples.items()},
+        "mean_ms": mean(latencies) * 1e3,
+        "p50_ms": percentiles[49] * 1e3,
+        "p95_ms": percentiles[94] * 1e3,
+        "p99_ms": percentiles[98] * 1e3,
+        "requests_per_second": len(latencies) / elapsed,
+        "queries_per_request": queries.count / len(latencies),
+    }
+    print(
+        f"  {name:<22}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+        f"{result['p99_ms']:>9.1f}{result['requests_per_second']:>10.1f}"
+        f"{result['queries_per_request']:>9.1f}"
+        + (f"  errors: {result['errors']}" if errors else "")
+    )
+    return result
+
+
+async def activate_users(mobiles: List[str]) -> None:
+    """Activates signed up users, as verifying their OTPs would"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.User)
+            .where(models.User.mobile.in_(mobiles))
+            .values(is_active=True)
+        )
+        await db.commit()
+
+
+async def run(n: int, concurrency: int) -> Dict[str, Any]:
+    engine = AsyncSessionLocal.kw["bind"]
+    engine.echo = False
+    queries = QueryCounter(engine.sync_engine)
+    settings.RATE_LIMIT_ENABLED = False
+    run_id = uuid_pkg.uuid4().hex[:8]
+    mobiles = [f"+23324{i:07d}" for i in random.sample(range(10**7), n)]
+    tokens: Dict[str, str] = {}
+
+    def sign_up(mobile: str):
+        return lambda client: client.post(
+            "/v1/users/sign-up",
+            json={
+                "mobile": mobile,
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "password": PASSWORD,
+            },
+        )
+
+    def login(mobile: str):
+        async def send(client: httpx.AsyncClient) -> httpx.Response:
+            response = await client.post(
+                "/v1/auth/login/access-token",
+                data={
+                    "username": mobile,
+                    "password": PASSWORD,
+                    "scope": "current_user:read",
+                },
+            )
+            if response.status_code == 200:
+                tokens[mobile] = response.json()["access_token"]
+            return response
+
+        return send
+
+    def check_user_status(mobile: str):
+        return lambda client: client.get(
+            "/v1/auth/check-user-status", params={"mobile": mobile}
+        )
+
+    def create_organization(i: int, mobile: str):
+        return lambda client: client.post(
+            "/v1/organizations/",
+            json={
+                "name": f"Bench {run_id} {i}",
+                "email": f"bench-{run_id}-{i}@example.com",
+                "country": "Ghana",
+                "organization_type": "prov",
+                "region": "Greater Accra",
+                "line_address": "1 Benchmark Street",
+            },
+            headers={"Authorization": f"Bearer {tokens.get(mobile)}"},
+        )
+
+    def list_wallets(mobile: str):
+        return lambda client: client.get(
+            "/v1/wallets/", headers={"Authorization": f"Bearer {tokens.get(mobile)}"}
+        )
+
+    results: Dict[str, Any] = {}
+    print(f"api ({n} requests per scenario, {concurrency} concurrent clients)")
+    print(
+        f"  {'scenario':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}"
+        f"{'queries':>9}"
+    )
+    # unhandled errors are answered with a 500 and counted, rather than raised
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver"
+    ) as client:
+        results["sign_up"] = await run_scenario(
+            "sign-up", [sign_up(m) for m in mobiles], client, queries, concurrency
+        )
+        await activate_users(mobiles)
+        results["login"] = await run_scenario(
+            "login", [login(m) for m in mobiles], client, queries, concurrency
+        )
+        results["check_user_status"] = await run_scenario(
+            "check-user-status",
+            [check_user_status(m) for m in mobiles],
+            client,
+            queries,
+            concurrency,
+        )
+        results["create_organization"] = await run_scenario(
+            "organization create",
+            [create_organization(i, m) for i, m in enumerate(mobiles)],
+            client,
+            queries,
+            concurrency,
+        )
+        results["list_wallets"] = await run_scenario(
+            "wallet list",
+            [list_wallets(m) for m in mobiles],
+            client,
+            queries,
+            concurrency,
+        )
+    await engine.dispose()
+    return results
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """Prints the change of every scenario's latency and throughput since `previous`"""
+    print(f"compared with {previous.get('git_commit')} ({previous.get('started_at')})")
+    for name, result in results["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = [
+            f"{metric} {(result[metric] / before[metric] - 1) * 100:+.1f}%"
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "requests_per_second")
+            if before.get(metric)
+        ]
+        queries = result["queries_per_request"] - before["queries_per_request"]
+        print(f"  {name:<22}{', '.join(changes)}, queries {queries:+.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        "benchmark": "api",
+        "started_at": started_at.isoformat(),
+        "git_commit": get_git_commit(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "json_response_backend": settings.JSON_RESPONSE_BACKEND,
+        "response_cache": settings.RESPONSE_CACHE_ENABLED
+        and settings.RESPONSE_CACHE_BACKEND,
+        "scenarios": asyncio.run(run(args.requests, args.concurrency)),
+    }
+    output = args.output or RESULTS_DIR / f"api-{started_at:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results written to {output}")
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+    failed = [name for name, result in results["scenarios"].items() if result["errors"]]
+    if failed:
+        raise SystemExit(f"requests failed in scenarios {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measures ledger postings per second against the configured Postgres database.
+
+    python -m benchmarks.bench_ledger_posting [--wallets 1000] [--batches 20]
+        [--batch-size 500]
+
+Every journal moves money between two random wallets, so each batch locks up to
+`2 * batch-size` wallets. Run against a disposable database: it seeds wallets and
+leaves the postings behind.
+"""
+# Author: Christopher Dare
+
+import argparse
+import asyncio
+import random
+import time
+import uuid as uuid_pkg
+from decimal import Decimal
+
+from app import crud, models, schemas
+from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import seed_wallets
+
+
+def make_journals(wallets, n: int):
+    journals = []
+    for _ in range(n):
+        payer, payee = random.sample(wallets, 2)
+        amount = Decimal(random.randint(1, 5000)) / 100
+        journals.append(
+            models.LedgerJournalCreate(
+                reference=f"bench-{uuid_pkg.uuid4().hex}",
+                currency=schemas.WalletCurrencyType.GHS,
+                entries=[
+                    models.LedgerEntryCreate(wallet_id=payer.uuid, amount=-amount),
+                    models.LedgerEntryCreate(wallet_id=payee.uuid, amount=amount),
+                ],
+            )
+        )
+    return journals
+
+
+async def run(n_wallets: int, batches: int, batch_size: int) -> None:
+    engine = create_async_engine(settings.PATIENT_PORTAL_SQLALCHEMY_DATABASE_URI)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as db:
+        wallets = await seed_wallets(db, n_wallets, balance=Decimal("1000000.00"))
+    payloads = [make_journals(wallets, batch_size) for _ in range(batches)]
+
+    started = time.perf_counter()
+    async with Session() as db:
+        for journals in payloads:
+            await crud.ledger.post(db, journals=journals)
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    postings = batches * batch_size
+    print(f"ledger posting ({n_wallets} wallets, {batches} x {batch_size} journals)")
+    print(f"  {postings} journals in {elapsed:.2f} s: {postings / elapsed:,.0f} /s")
+    print(f"  {elapsed * 1e3 / batches:.1f} ms per batch")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=1000)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.wallets, args.batches, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Measures model construction, validation and serialization in isolation, with warm
+and cold caches, and fails when a case regresses past the stored baseline.
+
+    python -m benchmarks.bench_models [--check] [--update-baseline]
+        [--tolerance 0.3] [--cold-tolerance 1.0]
+
+Timings are relative to a fixed pure Python workload, timed alongside every
+case, so that a baseline recorded on one machine can gate runs on another. Warm
+timings are the median of repeated calls in this process. Cold timings are the
+first call in a fresh interpreter with the models imported (the fastest of three),
+so they include the lazy imports and caches validators fill on first use
+(phonenumbers, pycountry). With `--check`, the command exits with status 1 when any
+case is slower than its baseline by more than the tolerance (30% warm, 100% cold by
+default). Record a new baseline with `--update-baseline` when a change is intended.
+"""
+# Author: Christopher Dare
+
+import argparse
+import datetime
+import json
+import subprocess
+import sys
+import time
+import uuid as uuid_pkg
+from decimal import Decimal
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict
+
+from app import models
+from app.core.responses import dumps, project
+
+from benchmarks.fixtures import make_wallets, timeit
+
+BASELINE = Path(__file__).parent / "baselines" / "bench_models.json"
+
+
+def calibrate() -> None:
+    """A fixed pure Python workload that timings are expressed relative to"""
+    total = 0
+    for i in range(2000):
+        total += len(str(i)) * i % 7
+
+
+def make_cases() -> Dict[str, Callable[[], object]]:
+    organization_in = {
+        "name": "Serenity Health",
+        "email": "admin@serenity.health",
+        "country": "Ghana",
+        "organization_type": "prov",
+        "region": "Greater Accra",
+        "line_address": "1 Benchmark Street",
+    }
+    user_in = {
+        "uuid": uuid_pkg.uuid4(),
+        "created_at": datetime.datetime.now(),
+        "first_name": "Kwame",
+        "last_name": "Nkrumah",
+        "mobile": "+233244123456",
+        "national_mobile_number": None,
+        "full_name": None,
+        "nationality": "Ghana",
+    }
+    policy_in = {
+        "name": "Gold",
+        "managing_organization_id": uuid_pkg.uuid4(),
+        "currency": "GHS",
+        "contribution_type": "coinsurance",
+        "coinsurance": Decimal("0.1"),
+        "copay_amount": Decimal("10"),
+        "deductible": Decimal("250.5"),
+        "out_of_pocket_limit": Decimal("5000"),
+    }
+    wallet = make_wallets(1)[0]
+    return {
+        "organization_create": lambda: models.OrganizationCreate(**organization_in),
+        "user_validate": lambda: models.User.validate(user_in),
+        "wallet_policy_create": lambda: models.WalletPolicyCreate(**policy_in),
+        "wallet_read_json": lambda: models.WalletRead.from_orm(wallet).json(),
+        "wallet_read_trusted": lambda: dumps(project(wallet, models.WalletRead)),
+    }
+
+
+def time_relative(
+    fn: Callable[[], object], repeat: int = 15, number: int = 50
+) -> float:
+    """Returns the median time of `fn` relative to `calibrate`, each run of `fn`
+    paired with a run of `calibrate` so that both share the load of the machine"""
+    fn()  # warm up caches
+    ratios = []
+    for _ in range(repeat):
+        case = timeit(fn, repeat=1, number=number)
+        ratios.append(case / timeit(calibrate, repeat=1, number=number))
+    return median(ratios)
+
+
+def time_cold(name: str, runs: int = 3) -> float:
+    """Returns the time of the first call of a case in a fresh interpreter relative
+    to `calibrate`, the fastest of `runs` interpreters"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_models", "--cold-case", name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Returns the warm and cold times of every case, relative to `calibrate`"""
+    return {
+        name: {"warm": time_relative(case), "cold": time_cold(name)}
+        for name, case in make_cases().items()
+    }
+
+
+def check(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerances: Dict[str, float],
+) -> bool:
+    """Prints every case against its baseline. Returns False on any regression"""
+    passed = True
+    print("compared with baseline")
+    for name, case in results.items():
+        if name not in baseline:
+            print(f"  {name:<24}no baseline")
+            continue
+        changes = []
+        for kind, value in case.items():
+            change = value / baseline[name][kind] - 1
+            regressed = change > tolerances[kind]
+            passed = passed and not regressed
+            changes.append(
+                f"{kind} {change * 100:+7.1f}%{' REGRESSED' if regressed else ''}"
+            )
+        print(f"  {name:<24}{'  '.join(changes)}")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--cold-tolerance", type=float, default=1.0)
+    parser.add_argument("--cold-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_case:
+        case = make_cases()[args.cold_case]
+        started = time.perf_counter()
+        case()
+        elapsed = time.perf_counter() - started
+        print(elapsed / timeit(calibrate))
+        return
+
+    calibration = timeit(calibrate)
+    results = run()
+    print(f"models (relative to calibration, {calibration * 1e6:.2f} us here)")
+    for name, case in results.items():
+        print(
+            f"  {name:<24}{case['warm']:>8.3f} warm"
+            f" ({case['warm'] * calibration * 1e6:.2f} us)"
+            f"{case['cold']:>8.1f} cold ({case['cold'] * calibration * 1e6:.2f} us)"
+        )
+    if args.update_baseline:
+        BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {BASELINE}")
+        return
+    if not BASELINE.exists():
+        print("no baseline yet, record one with --update-baseline")
+        return
+    passed = check(
+        results,
+        json.loads(BASELINE.read_text()),
+        {"warm": args.tolerance, "cold": args.cold_tolerance},
+    )
+    if args.check and not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compares Decimal arithmetic with integer minor-unit Money, scalar and vectorized.
+
+    python -m benchmarks.bench_money
+"""
+# Author: Christopher Dare
+
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+from app.utils import quantize_monetary_number
+from app.utils.money import Money, multiply_array, to_minor_units, to_rate_units
+
+from benchmarks.fixtures import report, timeit
+
+N = 100_000
+CENT = Decimal("0.01")
+
+
+def main() -> None:
+    random.seed(7)
+    amounts = [Decimal(random.randint(1, 5_000_000)) / 100 for _ in range(N)]
+    rates = [Decimal(random.randint(0, 100)) / 100 for _ in range(N)]
+    monies = [Money.from_decimal(amount) for amount in amounts]
+    minor_units, rate_units = to_minor_units(amounts), to_rate_units(rates)
+
+    def decimal_sum():
+        return sum(amounts, Decimal(0))
+
+    def money_sum():
+        return sum(monies, Money(0))
+
+    def array_sum():
+        return int(minor_units.sum())
+
+    def decimal_shares():
+        return [
+            (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+            for amount, rate in zip(amounts, rates)
+        ]
+
+    def money_shares():
+        return [money.multiply(rate) for money, rate in zip(monies, rates)]
+
+    def array_shares():
+        return multiply_array(minor_units, rate_units)
+
+    def decimal_quantize():
+        return [quantize_monetary_number(amount) for amount in amounts]
+
+    def money_quantize():
+        return [Money.from_decimal(amount) for amount in amounts]
+
+    assert Money.from_decimal(decimal_sum()) == money_sum()
+    assert Money.from_decimal(decimal_sum()).minor == array_sum()
+    expected = [Money.from_decimal(share).minor for share in decimal_shares()]
+    assert [money.minor for money in money_shares()] == expected
+    assert array_shares().tolist() == expected
+
+    report(
+        f"sum of {N} amounts",
+        {
+            "Decimal": timeit(decimal_sum, repeat=5, number=5),
+            "Money": timeit(money_sum, repeat=5, number=5),
+            "int64 array": timeit(array_sum, repeat=5, number=5),
+        },
+        items=N,
+    )
+    report(
+        f"coinsurance share of {N} amounts (ROUND_HALF_UP)",
+        {
+            "Decimal": timeit(decimal_shares, repeat=5, number=1),
+            "Money": timeit(money_shares, repeat=5, number=1),
+            "int64 array": timeit(array_shares, repeat=5, number=5),
+        },
+        items=N,
+    )
+    report(
+        f"quantize {N} amounts",
+        {
+            "quantize_monetary_number": timeit(decimal_quantize, repeat=5, number=1),
+            "Money.from_decimal": timeit(money_quantize, repeat=5, number=1),
+        },
+        items=N,
+    )
+
+
+if __name__ == "__main__":
+    main()
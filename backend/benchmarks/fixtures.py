@@ -0,0 +1,171 @@
+"""The :mod:`benchmarks.fixtures` module contains data and request contexts shared by benchmarks
+"""
+# Author: Christopher Dare
+
+import datetime
+import time
+import uuid as uuid_pkg
+from contextlib import contextmanager
+from decimal import Decimal
+from statistics import median
+from typing import Callable, Dict, List
+
+from app import models, schemas
+from fastapi_pagination.api import params_value, request_value
+from fastapi_pagination.default import Params
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+
+def make_wallets(n: int = 100) -> List[models.Wallet]:
+    """Builds `n` wallet rows as they would be loaded from the database"""
+    organization_id, policy_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        models.Wallet(
+            pk=i,
+            uuid=uuid_pkg.uuid4(),
+            created_at=now,
+            updated_at=now,
+            status=schemas.WalletStatusType.ACTIVE.value,
+            balance=Decimal(f"{i * 13}.{i % 100:02d}"),
+            currency=schemas.WalletCurrencyType.GHS.value,
+            description=f"wallet-{i}",
+            managing_organization_id=organization_id,
+            managing_organization_name="Serenity Health",
+            policy_id=policy_id,
+            policy_name="Default",
+            owner_id=uuid_pkg.uuid4(),
+            owner_name=f"Employee {i}",
+            owner_mobile=f"+23350{i:07d}",
+            contribution_type=schemas.PaymentContributionType.COINSURANCE.value,
+            coinsurance=Decimal("0.10"),
+            copay_amount=Decimal("0.00"),
+            deductible=Decimal("250.00"),
+            out_of_pocket_limit=Decimal("5000.00"),
+        )
+        for i in range(n)
+    ]
+
+
+async def seed_wallets(
+    db: AsyncSession, n: int = 100, balance: Decimal = Decimal("0.00")
+) -> List[models.Wallet]:
+    """Inserts `n` wallets, with the users, organization and policy they reference,
+    and returns them. Benchmarks run against a disposable database"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    wallets = make_wallets(n)
+    owner_id = wallets[0].owner_id
+    organization_id = wallets[0].managing_organization_id
+    await db.execute(
+        insert(models.User.__table__),
+        [
+            {
+                "uuid": wallet.owner_id,
+                "created_at": now.replace(tzinfo=None),
+                "updated_at": now.replace(tzinfo=None),
+                "first_name": "Employee",
+                "last_name": str(i),
+                "full_name": wallet.owner_name,
+                "mobile": f"+2332{wallet.owner_id.int % 10**10:010d}",
+                "is_active": True,
+                "is_superuser": False,
+                "is_identity_verified": False,
+            }
+            for i, wallet in enumerate(wallets)
+        ],
+    )
+    await db.execute(
+        insert(models.Organization.__table__).values(
+            uuid=organization_id,
+            created_at=now,
+            updated_at=now,
+            name=f"Serenity Health {organization_id.hex[:8]}",
+            name_chars=f"serenityhealth{organization_id.hex[:8]}",
+            organization_type="prov",
+            owner_id=owner_id,
+            owner_first_name="Bench",
+            owner_last_name="Mark",
+            created_by_id=owner_id,
+            created_by_name="Bench Mark",
+            line_address="1 Benchmark Street",
+            region="Greater Accra",
+            country=schemas.OperatingCountryType.GH.value,
+            default_wallet_currency=schemas.WalletCurrencyType.GHS.value,
+            is_deleted=False,
+            is_verified=True,
+        )
+    )
+    await db.execute(
+        insert(models.WalletPolicy.__table__).values(
+            uuid=wallets[0].policy_id,
+            created_at=now,
+            updated_at=now,
+            name=f"Default {organization_id.hex[:8]}",
+            name_chars=f"default{organization_id.hex[:8]}",
+            managing_organization_id=organization_id,
+            managing_organization_name="Serenity Health",
+            description="",
+            currency=schemas.WalletCurrencyType.GHS.value,
+            is_deleted=False,
+            is_core=True,
+            contribution_type=wallets[0].contribution_type,
+            coinsurance=wallets[0].coinsurance,
+            deductible=wallets[0].deductible,
+            out_of_pocket_limit=wallets[0].out_of_pocket_limit,
+        )
+    )
+    rows = []
+    for wallet in wallets:
+        wallet.pk, wallet.balance = None, balance
+        wallet.description = f"wallet-{wallet.uuid.hex}"
+        rows.append(wallet.dict(exclude={"pk"}))
+    await db.execute(insert(models.Wallet.__table__), rows)
+    await db.commit()
+    return wallets
+
+
+@contextmanager
+def page_request(path: str = "/v1/wallets/", page: int = 1, size: int = 100):
+    """Sets the request and pagination params fastapi_pagination reads from context"""
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": path,
+            "root_path": "",
+            "query_string": f"page={page}&size={size}".encode(),
+            "headers": [],
+        }
+    )
+    request_token = request_value.set(request)
+    params_token = params_value.set(Params(page=page, size=size))
+    try:
+        yield request
+    finally:
+        params_value.reset(params_token)
+        request_value.reset(request_token)
+
+
+def timeit(fn: Callable[[], object], repeat: int = 7, number: int = 50) -> float:
+    """Returns the median seconds per call of `fn` over `repeat` runs of `number` calls"""
+    fn()  # warm up caches
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    return median(runs)
+
+
+def report(title: str, results: Dict[str, float], items: int = 1) -> None:
+    print(title)
+    for name, seconds in results.items():
+        print(
+            f"  {name:<30}{seconds * 1e3:>10.3f} ms/call"
+            f"{seconds * 1e6 / items:>10.2f} us/item"
+        )
@@ -0,0 +1,46 @@
+"""Gunicorn configuration of the API image, picked up by the `start.sh` of the
+tiangolo/uvicorn-gunicorn-fastapi image from `/app/gunicorn_conf.py`
+
+The settings are the image's defaults (configured with the same environment
+variables), with Prometheus metrics collected across workers: see
+:mod:`app.core.metrics`.
+"""
+# Author: Christopher Dare
+
+import multiprocessing
+import os
+
+# set before the workers import prometheus_client, which reads it on import
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+
+workers_per_core = float(os.getenv("WORKERS_PER_CORE", "1"))
+max_workers = os.getenv("MAX_WORKERS")
+web_concurrency = os.getenv("WEB_CONCURRENCY")
+if web_concurrency:
+    workers = int(web_concurrency)
+    assert workers > 0
+else:
+    workers = max(int(workers_per_core * multiprocessing.cpu_count()), 2)
+    if max_workers:
+        workers = min(workers, int(max_workers))
+
+bind = os.getenv("BIND") or f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '80')}"
+loglevel = os.getenv("LOG_LEVEL", "info")
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+errorlog = os.getenv("ERROR_LOG", "-") or None
+worker_tmp_dir = "/dev/shm"
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "120"))
+timeout = int(os.getenv("TIMEOUT", "120"))
+keepalive = int(os.getenv("KEEP_ALIVE", "5"))
+
+
+def on_starting(server):
+    from app.core.metrics import prepare_multiprocess_dir
+
+    prepare_multiprocess_dir(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def child_exit(server, worker):
+    from app.core.metrics import mark_worker_dead
+
+    mark_worker_dead(worker.pid)
@@ -1,17 +1,23 @@
 """The :mod:`tests.fixtures` module fixtures used for testing
 """
-import pytest
 from typing import Generator, List
 
+import pytest
 from app.api import deps
 from app.api.deps import get_db as get_session
-from app.main import app
+from app.core.config import settings
 from app.core.session import async_db_url
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.main import app
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 
+# fail tests whose requests run too many SQL statements, or the same one repeatedly
+settings.SQL_QUERY_BUDGET_MODE = "raise"
+# tests run in a single process, without Redis
+settings.RATE_LIMIT_BACKEND = "memory"
+settings.RESPONSE_CACHE_BACKEND = "memory"
 
 
 @pytest.fixture(scope='session')
@@ -0,0 +1,126 @@
+"""The :mod:`app.tests.test_adjudication.` module contains tests for the cost-sharing engine
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Bills are applied to the deductible, then coinsurance or copay, then the OOP limit
+# Bills of the same wallet update the accumulators in order
+# An out-of-pocket limit reached within the deductible only meets what was paid
+# The vectorized engine agrees with the scalar engine bill for bill
+
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+from app.schemas import PaymentContributionType
+from app.utils.adjudication import (
+    Accumulators,
+    adjudicate,
+    adjudicate_bill,
+    get_policy_arrays,
+)
+from app.utils.money import Money
+
+
+def make_policy(
+    deductible="100.00",
+    out_of_pocket_limit="300.00",
+    coinsurance="0.20",
+    copay_amount="0.00",
+    contribution_type=PaymentContributionType.COINSURANCE,
+):
+    return SimpleNamespace(
+        deductible=Decimal(deductible),
+        out_of_pocket_limit=Decimal(out_of_pocket_limit),
+        coinsurance=Decimal(coinsurance),
+        copay_amount=Decimal(copay_amount),
+        contribution_type=contribution_type,
+    )
+
+
+def test_bills_of_a_wallet_are_adjudicated_in_order():
+    policies = get_policy_arrays(
+        [
+            make_policy(),
+            make_policy(
+                deductible="0",
+                out_of_pocket_limit="0",
+                copay_amount="15.00",
+                contribution_type=PaymentContributionType.COPAY,
+            ),
+        ]
+    )
+    zeros = np.zeros(2, dtype=np.int64)
+    # wallet 0: 60 to the deductible; 40 more then 20% of 460; then capped at 300
+    result = adjudicate(
+        [0, 1, 0, 0, 1],
+        [6000, 1000, 50000, 100000, 2500],
+        policies,
+        Accumulators(zeros, zeros),
+    )
+    assert result.patient.tolist() == [6000, 1000, 13200, 10800, 1500]
+    assert result.deductible.tolist() == [6000, 0, 4000, 0, 0]
+    assert (result.patient + result.payer).tolist() == [6000, 1000, 50000, 100000, 2500]
+    assert result.accumulators.deductible_met.tolist() == [10000, 0]
+    assert result.accumulators.out_of_pocket_met.tolist() == [30000, 2500]
+
+
+def test_out_of_pocket_limit_within_deductible():
+    policy = make_policy(deductible="500.00", out_of_pocket_limit="300.00")
+    # 200 of the 500 deductible met, and 250 of the 300 out-of-pocket limit
+    result = adjudicate(
+        [0, 0],
+        [40000, 10000],
+        get_policy_arrays([policy]),
+        Accumulators(np.array([20000]), np.array([25000])),
+    )
+    # the patient pays 50, all of it toward the deductible, then nothing
+    assert result.patient.tolist() == [5000, 0]
+    assert result.deductible.tolist() == [5000, 0]
+    assert result.accumulators.deductible_met.tolist() == [25000]
+    assert result.accumulators.out_of_pocket_met.tolist() == [30000]
+
+    patient, payer, deductible = adjudicate_bill(
+        Money(40000), policy, Money(20000), Money(25000)
+    )
+    assert (patient, payer, deductible) == (Money(5000), Money(35000), Money(5000))
+
+
+def test_vectorized_engine_matches_scalar_engine():
+    rng = random.Random(3)
+    policies = [
+        make_policy(
+            deductible=rng.choice(["0", "50.00", "500.00"]),
+            out_of_pocket_limit=rng.choice(["0", "200.00", "1000.00"]),
+            coinsurance=f"0.{rng.randint(0, 99):02d}",
+            copay_amount=rng.choice(["0", "5.00", "25.00"]),
+            contribution_type=rng.choice(list(PaymentContributionType)),
+        )
+        for _ in range(25)
+    ]
+    deductible_met = np.array([rng.randint(0, 20000) for _ in policies])
+    out_of_pocket_met = np.array([rng.randint(0, 50000) for _ in policies])
+    wallet_index = [rng.randrange(len(policies)) for _ in range(500)]
+    amounts = [rng.randint(0, 30000) for _ in wallet_index]
+
+    result = adjudicate(
+        wallet_index,
+        amounts,
+        get_policy_arrays(policies),
+        Accumulators(deductible_met, out_of_pocket_met),
+    )
+    met = [
+        [Money(int(d)), Money(int(o))]
+        for d, o in zip(deductible_met, out_of_pocket_met)
+    ]
+    for k, (i, amount) in enumerate(zip(wallet_index, amounts)):
+        patient, payer, deductible = adjudicate_bill(
+            Money(amount), policies[i], *met[i]
+        )
+        assert patient.minor == result.patient[k]
+        assert payer.minor == result.payer[k]
+        met[i][0] += deductible
+        met[i][1] += patient
+    assert [d.minor for d, _ in met] == result.accumulators.deductible_met.tolist()
+    assert [o.minor for _, o in met] == result.accumulators.out_of_pocket_met.tolist()
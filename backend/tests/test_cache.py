@@ -0,0 +1,67 @@
+"""The :mod:`app.tests.test_cache.` module contains tests for the in-process key-value
+cache
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Keys expire when they are next read
+# Beyond max_keys, expired keys are evicted first, then the oldest keys
+# Setting a key again makes it the newest, and its earlier expiry is ignored
+# The expiry heap does not grow beyond a bound when keys are set again
+
+import asyncio
+
+from app.core.cache import TTLCache
+
+
+def test_keys_expire():
+    now = [0.0]
+    cache = TTLCache(clock=lambda: now[0])
+    asyncio.run(cache.set("a", 1, ex=10))
+    assert asyncio.run(cache.mget(["a", "b"])) == [1, None]
+    now[0] = 10
+    assert asyncio.run(cache.get("a")) is None
+    assert asyncio.run(cache.delete("a")) == 0
+
+
+def test_eviction_order():
+    now = [0.0]
+    cache = TTLCache(clock=lambda: now[0], max_keys=3)
+
+    async def fill():
+        await cache.set("short", 1, ex=5)
+        await cache.set("old", 2, ex=100)
+        await cache.set("new", 3, ex=100)
+        now[0] = 6
+        # "short" has expired: evicted before the older "old"
+        await cache.set("newest", 4, ex=100)
+        assert list(cache.data) == ["old", "new", "newest"]
+        # set again, "old" is the newest key
+        await cache.set("old", 5, ex=1)
+        await cache.set("latest", 6, ex=100)
+        assert list(cache.data) == ["newest", "old", "latest"]
+        now[0] = 8
+        # the first expiry of "old" (106) is stale, its second one (7) has passed
+        await cache.set("last", 7, ex=100)
+        assert list(cache.data) == ["newest", "latest", "last"]
+
+    asyncio.run(fill())
+
+
+def test_expiries_stay_bounded():
+    cache = TTLCache(clock=lambda: 0.0, max_keys=10)
+
+    async def churn():
+        for i in range(1000):
+            await cache.set(f"key-{i % 20}", i, ex=60)
+
+    asyncio.run(churn())
+    assert len(cache.data) == 10
+    assert len(cache.expiries) <= 2 * cache.max_keys
+
+    # fewer keys than max_keys, set again and again
+    cache = TTLCache(clock=lambda: 0.0, max_keys=10)
+    for i in range(1000):
+        asyncio.run(cache.set(f"key-{i % 3}", i, ex=60))
+    assert len(cache.data) == 3
+    assert len(cache.expiries) <= 2 * cache.max_keys
@@ -0,0 +1,70 @@
+"""The :mod:`app.tests.test_crud_base.` module contains tests for the helpers shared by
+CRUD classes
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Model fields are the mapped columns of the model, and cached per model
+# Values of fields which are not columns are dropped, python types are kept
+# Unset fields of update schemas are not changes, fields set to None are
+# Values equal to those of the object are not changes
+
+import uuid
+from decimal import Decimal
+
+from app import crud, models
+from app.crud.crud_base import get_model_fields
+from app.schemas import PaymentContributionType
+
+
+def make_policy() -> models.WalletPolicy:
+    return models.WalletPolicy(
+        uuid=uuid.uuid4(),
+        name="Gold",
+        description="Gold cover",
+        contribution_type=PaymentContributionType.COPAY,
+        copay_amount=Decimal("15.00"),
+        deductible=Decimal("100.00"),
+    )
+
+
+def test_model_fields():
+    fields = get_model_fields(models.WalletPolicy)
+    assert {"pk", "uuid", "name", "deductible", "managing_organization_id"} <= fields
+    assert get_model_fields(models.WalletPolicy) is fields
+    assert crud.wallet_policy.fields is fields
+
+
+def test_obj_in_data():
+    policy_id = uuid.uuid4()
+    data = crud.wallet_policy.get_obj_in_data(
+        {"uuid": policy_id, "deductible": Decimal("50.00"), "not_a_column": 1}
+    )
+    assert data == {"uuid": policy_id, "deductible": Decimal("50.00")}
+    assert isinstance(data["uuid"], uuid.UUID)
+
+    obj_in = models.WalletPolicyUpdate(deductible=Decimal("50.00"))
+    assert crud.wallet_policy.get_obj_in_data(obj_in, exclude_unset=True) == {
+        "deductible": Decimal("50.00")
+    }
+    # without exclude_unset, defaults of the schema are included
+    assert "name" in crud.wallet_policy.get_obj_in_data(obj_in)
+
+
+def test_changes():
+    policy = make_policy()
+    # unset fields (including the defaulted updated_at) are not changes
+    assert crud.wallet_policy.get_changes(policy, models.WalletPolicyUpdate()) == {}
+    # equal values are not changes
+    unchanged = models.WalletPolicyUpdate(name="Gold", deductible=Decimal("100"))
+    assert crud.wallet_policy.get_changes(policy, unchanged) == {}
+    assert crud.wallet_policy.get_changes(policy, {"copay_amount": Decimal("15")}) == {}
+    # fields explicitly set to None are changes
+    cleared = models.WalletPolicyUpdate(name=None, deductible=Decimal("80"))
+    assert crud.wallet_policy.get_changes(policy, cleared) == {
+        "name": None,
+        "deductible": Decimal("80"),
+    }
+    assert crud.wallet_policy.get_changes(policy, {"description": None}) == {
+        "description": None
+    }
@@ -0,0 +1,217 @@
+"""The :mod:`app.tests.test_denormalized_fields.` module contains tests for the copies of
+user and organization details kept by wallets, policies and organizations
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Changing a user's name or mobile number queues the refresh of their copies
+# Organization updates only change the fields set, and refuse to clear required ones
+# Renaming an organization queues the refresh of its copies
+# The refreshes copy the current values from the source rows, skipping current copies
+
+import asyncio
+import uuid
+from typing import Any, List
+
+import pytest
+import sqlalchemy as sa
+from app import crud, models
+from app.crud import crud_organization, crud_user
+from sqlalchemy.dialects import postgresql
+
+
+class Result:
+    def __init__(self, rows: List[Any]):
+        self.rows = rows
+        self.rowcount = len(rows)
+
+    def all(self) -> List[Any]:
+        return self.rows
+
+    def first(self) -> Any:
+        return self.rows[0] if self.rows else None
+
+    def scalars(self) -> "Result":
+        return self
+
+
+class RecordingSession:
+    """Records the statements executed, answering the selects with `results` and
+    the updates with one row per wallet of the last select"""
+
+    def __init__(self, results: List[List[Any]] = None):
+        self.results = results or []
+        self.statements: List[Any] = []
+        self.info = {}
+        self.selected: List[Any] = []
+
+    def add(self, obj: Any) -> None:
+        pass
+
+    async def commit(self) -> None:
+        pass
+
+    async def refresh(self, obj: Any) -> None:
+        pass
+
+    async def execute(self, statement, *args, **kwargs) -> Result:
+        self.statements.append(statement)
+        if isinstance(statement, sa.sql.Select):
+            self.selected = self.results.pop(0)
+            return Result(self.selected)
+        if isinstance(statement, sa.sql.Update):
+            return Result([uuid.uuid4() for _ in self.selected])
+        return Result([])
+
+
+def compile_statement(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture
+def sent_tasks(monkeypatch) -> List[tuple]:
+    sent = []
+
+    def send_task(name: str, args: list) -> None:
+        sent.append((name, *args))
+
+    monkeypatch.setattr(crud_user.celery_app, "send_task", send_task)
+    monkeypatch.setattr(crud_organization.celery_app, "send_task", send_task)
+    return sent
+
+
+def make_organization() -> models.Organization:
+    return models.Organization(
+        uuid=uuid.uuid4(),
+        owner_id=uuid.uuid4(),
+        name="Acme Clinic",
+        name_chars="acmeclinic",
+        country="Ghana",
+        region="Greater Accra",
+        line_address="1 Ring Road",
+        email="desk@acme.test",
+    )
+
+
+def test_user_update_propagates_copied_fields(sent_tasks):
+    user = models.User(
+        uuid=uuid.uuid4(),
+        first_name="Ama",
+        last_name="Mensah",
+        full_name="Ama Mensah",
+        mobile="+233506409457",
+        email="ama@acme.test",
+    )
+    db = RecordingSession()
+    asyncio.run(crud.user.update(db, db_obj=user, obj_in={"email": "a@acme.test"}))
+    assert sent_tasks == []
+    asyncio.run(crud.user.update(db, db_obj=user, obj_in={"first_name": "Ama"}))
+    assert sent_tasks == []
+
+    asyncio.run(crud.user.update(db, db_obj=user, obj_in={"last_name": "Owusu"}))
+    assert user.full_name == "Ama Owusu"
+    assert sent_tasks == [("app.worker.propagate_user_details", str(user.uuid))]
+
+
+def test_organization_update_changes_fields_set(sent_tasks):
+    organization = make_organization()
+    db = RecordingSession()
+    asyncio.run(
+        crud.organization.update(
+            db,
+            db_obj=organization,
+            obj_in=models.OrganizationUpdate(email=None),
+        )
+    )
+    # unset fields are left as they are, fields set to None are cleared
+    assert organization.email is None
+    assert (organization.name, organization.region) == ("Acme Clinic", "Greater Accra")
+    assert sent_tasks == []
+
+    for obj_in in [
+        models.OrganizationUpdate(name=None),
+        models.OrganizationUpdate(country=None),
+        models.OrganizationUpdate(country="Nigeria"),
+    ]:
+        with pytest.raises(ValueError):
+            asyncio.run(
+                crud.organization.update(db, db_obj=organization, obj_in=obj_in)
+            )
+    assert organization.name == "Acme Clinic"
+
+
+def test_organization_rename_propagates(sent_tasks):
+    organization = make_organization()
+    # no other organization has the name
+    db = RecordingSession([[]])
+    asyncio.run(
+        crud.organization.update(
+            db,
+            db_obj=organization,
+            obj_in=models.OrganizationUpdate(name="Acme Health"),
+        )
+    )
+    assert (organization.name, organization.name_chars) == ("Acme Health", "acmehealth")
+    assert sent_tasks == [
+        ("app.worker.propagate_organization_name", str(organization.uuid))
+    ]
+
+    db = RecordingSession([[uuid.uuid4()]])
+    with pytest.raises(ValueError):
+        asyncio.run(
+            crud.organization.update(
+                db,
+                db_obj=organization,
+                obj_in=models.OrganizationUpdate(name="Taken Name"),
+            )
+        )
+
+
+def test_copies_are_refreshed_from_source_rows():
+    owner_id, organization_id = uuid.uuid4(), uuid.uuid4()
+
+    db = RecordingSession()
+    asyncio.run(crud.organization.sync_owner(db, owner_id=owner_id))
+    statement = compile_statement(db.statements[0])
+    assert statement.startswith("UPDATE organizations SET")
+    assert "owner_first_name=users.first_name" in statement
+    assert "owner_last_name=users.last_name" in statement
+    assert "FROM users" in statement
+    assert (
+        "organizations.owner_first_name IS DISTINCT FROM users.first_name" in statement
+    )
+    assert "organizations.owner_last_name IS DISTINCT FROM users.last_name" in statement
+
+    db = RecordingSession()
+    asyncio.run(
+        crud.wallet_policy.sync_managing_organization(
+            db, organization_id=organization_id
+        )
+    )
+    statement = compile_statement(db.statements[0])
+    assert statement.startswith("UPDATE healthcare_policies SET")
+    assert "managing_organization_name=organizations.name" in statement
+    assert "FROM organizations" in statement
+    assert (
+        "healthcare_policies.managing_organization_name IS DISTINCT FROM"
+        " organizations.name" in statement
+    )
+
+    # two chunks of wallets, the second one short
+    db = RecordingSession([[1, 2], [3]])
+    updated = asyncio.run(
+        crud.wallet.sync_managing_organization(
+            db, organization_id=organization_id, batch_size=2
+        )
+    )
+    assert updated == 3
+    updates = [s for s in db.statements if isinstance(s, sa.sql.Update)]
+    assert len(updates) == 2
+    statement = compile_statement(updates[0])
+    assert statement.startswith("UPDATE wallets SET")
+    assert "managing_organization_name=organizations.name" in statement
+    assert "FROM organizations" in statement
+    assert (
+        "wallets.managing_organization_name IS DISTINCT FROM organizations.name"
+        in statement
+    )
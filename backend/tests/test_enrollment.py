@@ -0,0 +1,46 @@
+"""The :mod:`app.tests.test_enrollment.` module contains tests for bulk employee
+enrollments
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Mobile numbers are normalized to E164 from national or international formats
+# Employee rows are stripped and emails lowercased
+# Enrollments must list at least one employee
+
+import pytest
+from app.models import EmployeeEnrollmentCreate, EmployeeEnrollmentRow
+from app.utils import normalize_mobile_number
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize(
+    "mobile", ["0244123456", "+233244123456", "233 24 412 3456", " +233-24-412-3456 "]
+)
+def test_mobile_numbers_are_normalized(mobile):
+    assert normalize_mobile_number(mobile, "GH") == "+233244123456"
+
+
+@pytest.mark.parametrize("mobile", ["", "abc", "024412", "0144123456"])
+def test_invalid_mobile_numbers_are_rejected(mobile):
+    with pytest.raises(ValueError):
+        normalize_mobile_number(mobile, "GH")
+
+
+def test_employee_rows_are_normalized():
+    row = EmployeeEnrollmentRow(
+        first_name=" Ama ", last_name="Mensah ", mobile="0244123456 ", email="A@B.Com"
+    )
+    assert (row.first_name, row.last_name, row.mobile, row.email) == (
+        "Ama",
+        "Mensah",
+        "0244123456",
+        "a@b.com",
+    )
+    with pytest.raises(ValidationError):
+        EmployeeEnrollmentRow(first_name=" ", last_name="Mensah", mobile="0244123456")
+
+
+def test_enrollments_require_employees():
+    with pytest.raises(ValidationError):
+        EmployeeEnrollmentCreate(employees=[])
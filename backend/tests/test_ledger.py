@@ -0,0 +1,83 @@
+"""The :mod:`app.tests.test_ledger.` module contains tests for the wallet ledger
+"""
+# Author: Christopher Dare
+
+### Test cases
+# A journal must have at least two entries whose amounts sum to zero
+# Wallet entries must reference a wallet and other accounts must not
+# Journal references must be unique within a posted batch
+# Ledger journals cannot be updated or removed
+
+import asyncio
+import uuid as uuid_pkg
+from decimal import Decimal
+
+import pytest
+from app import crud, models
+from app.schemas import LedgerAccountType, WalletCurrencyType
+from pydantic import ValidationError
+
+
+def make_journal(reference: str = "top-up-1", amount: str = "150.00"):
+    return models.LedgerJournalCreate(
+        reference=reference,
+        currency=WalletCurrencyType.GHS,
+        entries=[
+            {"account_type": LedgerAccountType.CLEARING, "amount": f"-{amount}"},
+            {"wallet_id": uuid_pkg.uuid4(), "amount": amount},
+        ],
+    )
+
+
+def test_balanced_journal_is_valid():
+    journal = make_journal(amount="99.999")
+    assert [entry.amount for entry in journal.entries] == [
+        Decimal("-100.00"),
+        Decimal("100.00"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "entries",
+    [
+        [{"wallet_id": uuid_pkg.uuid4(), "amount": "10"}],
+        [
+            {"account_type": LedgerAccountType.CLEARING, "amount": "-10"},
+            {"wallet_id": uuid_pkg.uuid4(), "amount": "9.99"},
+        ],
+        [
+            {"account_type": LedgerAccountType.CLEARING, "amount": "0"},
+            {"wallet_id": uuid_pkg.uuid4(), "amount": "0"},
+        ],
+        [
+            {"account_type": LedgerAccountType.FEES, "amount": "-10"},
+            {"amount": "10"},
+        ],
+        [
+            {
+                "account_type": LedgerAccountType.FEES,
+                "wallet_id": uuid_pkg.uuid4(),
+                "amount": "-10",
+            },
+            {"wallet_id": uuid_pkg.uuid4(), "amount": "10"},
+        ],
+    ],
+)
+def test_invalid_journal_is_rejected(entries):
+    with pytest.raises(ValidationError):
+        models.LedgerJournalCreate(
+            reference="bad", currency=WalletCurrencyType.GHS, entries=entries
+        )
+
+
+def test_duplicate_references_in_batch_are_rejected():
+    journals = [make_journal("dup"), make_journal("dup")]
+    with pytest.raises(ValueError, match="unique"):
+        asyncio.run(crud.ledger.post(None, journals=journals))
+
+
+def test_ledger_is_append_only():
+    with pytest.raises(NotImplementedError):
+        asyncio.run(crud.ledger.update(None, db_obj=None, obj_in={}))
+    with pytest.raises(NotImplementedError):
+        asyncio.run(crud.ledger.remove(None, id=1))
@@ -0,0 +1,66 @@
+"""The :mod:`app.tests.test_metrics.` module contains tests for the Prometheus metrics
+collected across the worker processes of a server
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Metrics are served per process without a multiprocess directory
+# Counters of every worker are summed, gauges only over live workers
+
+import subprocess
+import sys
+
+from app.core.metrics import (
+    MULTIPROC_DIR_VARIABLE,
+    get_registry,
+    mark_worker_dead,
+    prepare_multiprocess_dir,
+)
+from prometheus_client import REGISTRY
+
+# a worker recording a provider retry and holding a database connection
+WORKER = """
+import os
+from app.core.provider_metrics import PROVIDER_RETRIES
+from app.core.query_metrics import DB_POOL_CHECKED_OUT
+
+PROVIDER_RETRIES.labels("hubtel", "send_sms").inc()
+DB_POOL_CHECKED_OUT.inc()
+print(os.getpid())
+"""
+
+
+def test_metrics_are_per_process_by_default(test_client, monkeypatch):
+    monkeypatch.delenv(MULTIPROC_DIR_VARIABLE, raising=False)
+    assert get_registry() is REGISTRY
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert "http_request_db_queries" in response.text
+
+
+def test_metrics_are_summed_over_workers(tmp_path, monkeypatch):
+    directory = str(tmp_path / "metrics")
+    prepare_multiprocess_dir(directory)
+    monkeypatch.setenv(MULTIPROC_DIR_VARIABLE, directory)
+    pids = [
+        int(
+            subprocess.run(
+                [sys.executable, "-c", WORKER],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()[-1]
+        )
+        for _ in range(2)
+    ]
+
+    def get_sample(name, **labels):
+        return get_registry().get_sample_value(name, labels)
+
+    retries = {"provider": "hubtel", "operation": "send_sms"}
+    assert get_sample("provider_request_retries_total", **retries) == 2
+    assert get_sample("db_pool_connections_checked_out") == 2
+    # the gauges of exited workers are dropped, their counters kept
+    mark_worker_dead(pids[0])
+    assert get_sample("db_pool_connections_checked_out") == 1
+    assert get_sample("provider_request_retries_total", **retries) == 2
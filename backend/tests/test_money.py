@@ -0,0 +1,114 @@
+"""The :mod:`app.tests.test_money.` module contains tests for the minor-unit Money type
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Amounts are parsed to minor units with an explicit rounding mode
+# Arithmetic is exact and refuses to mix currencies or floats
+# Allocations never lose or create a minor unit
+# Vectorized operations match the scalar ones for every rounding mode
+# Every wallet currency has a minor unit exponent, unknown currencies are refused
+
+from decimal import (
+    ROUND_CEILING,
+    ROUND_DOWN,
+    ROUND_FLOOR,
+    ROUND_HALF_DOWN,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    ROUND_UP,
+    Decimal,
+)
+
+import pytest
+from app.schemas import WalletCurrencyType
+from app.utils.money import (
+    Money,
+    divide,
+    divide_array,
+    from_minor_units,
+    get_currency_exponent,
+    multiply_array,
+    to_minor_units,
+    to_rate_units,
+)
+
+ROUNDING_MODES = [
+    ROUND_CEILING,
+    ROUND_DOWN,
+    ROUND_FLOOR,
+    ROUND_HALF_DOWN,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    ROUND_UP,
+]
+
+
+@pytest.mark.parametrize(
+    "amount,rounding,minor",
+    [
+        ("12.345", ROUND_HALF_UP, 1235),
+        ("12.345", ROUND_HALF_EVEN, 1234),
+        ("-12.345", ROUND_HALF_UP, -1235),
+        ("12.341", ROUND_UP, 1235),
+        ("-12.349", ROUND_DOWN, -1234),
+        (Decimal("7"), ROUND_HALF_UP, 700),
+        (3, ROUND_HALF_UP, 300),
+    ],
+)
+def test_parse_amounts(amount, rounding, minor):
+    money = Money.from_decimal(amount, rounding=rounding)
+    assert money.minor == minor
+    assert money.to_decimal() == Decimal(minor) / 100
+
+
+def test_arithmetic_is_exact():
+    total = sum([Money.from_decimal("0.10")] * 10)
+    assert total == Money.from_decimal("1.00")
+    assert str(total - Money(1)) == "GHS 0.99"
+    assert Money(1000).multiply(Decimal("0.155"), rounding=ROUND_HALF_EVEN) == Money(
+        155
+    )
+    assert Money(-1) < 0 <= Money(0)
+    with pytest.raises(TypeError):
+        Money(100) * 0.1
+    with pytest.raises(TypeError):
+        Money.from_decimal(0.1)
+
+
+def test_allocate_preserves_total():
+    parts = Money(1000).allocate([1, 1, 1])
+    assert [part.minor for part in parts] == [334, 333, 333]
+    assert sum(Money(-1001).allocate([3, 7])) == Money(-1001)
+
+
+@pytest.mark.parametrize("rounding", ROUNDING_MODES)
+def test_vectorized_division_matches_scalar(rounding):
+    numerators = list(range(-2000, 2000, 7))
+    expected = [divide(n, 40, rounding) for n in numerators]
+    assert divide_array(numerators, 40, rounding).tolist() == expected
+    for n in numerators:
+        assert divide(n, 40, rounding) == int(
+            (Decimal(n) / 40).quantize(Decimal(1), rounding=rounding)
+        )
+
+
+def test_vectorized_multiplication():
+    amounts = ["100.05", "33.33", "0.01"]
+    minor_units = to_minor_units(amounts)
+    shares = multiply_array(minor_units, to_rate_units(["0.15", "0.1", "0.5"]))
+    assert shares.tolist() == [1501, 333, 1]
+    assert from_minor_units(shares) == [
+        Decimal("15.01"),
+        Decimal("3.33"),
+        Decimal("0.01"),
+    ]
+    with pytest.raises(ValueError):
+        to_rate_units(["0.123456"])
+
+
+def test_currency_exponents():
+    for currency in WalletCurrencyType:
+        assert get_currency_exponent(currency) == 2
+    with pytest.raises(ValueError):
+        get_currency_exponent("XYZ")
@@ -0,0 +1,96 @@
+"""The :mod:`app.tests.test_otp_partitions.` module contains tests for the maintenance
+of the daily partitions of the otp table
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Partitions older than the retention period are dropped, one per transaction
+# Rows of the default partition older than the retention period are purged
+# Missing partitions of the coming days are created, one per transaction
+# Days with OTPs in the default partition do not get a partition
+# Every partition created or dropped waits at most the lock timeout
+
+import asyncio
+import datetime
+from typing import Any, List, Set
+
+from app import crud
+from app.core.config import settings
+
+UTC = datetime.timezone.utc
+
+
+class Result:
+    def __init__(self, rows: List[Any]):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar(self) -> Any:
+        return self.rows[0][0]
+
+
+class PartitionedSession:
+    """Answers the partition maintenance queries for an otp table with the
+    `partitions` given, whose default partition has OTPs created on `in_default`"""
+
+    def __init__(self, partitions: List[str], in_default: Set[datetime.date]):
+        self.partitions = partitions
+        self.in_default = in_default
+        self.statements: List[tuple] = []
+
+    async def execute(self, statement, params: dict = None) -> Result:
+        sql = str(statement)
+        self.statements.append((sql, params))
+        if sql.startswith("SELECT c.relname"):
+            return Result([(name,) for name in self.partitions])
+        if sql.startswith("SELECT EXISTS"):
+            return Result([(params["start"].date() in self.in_default,)])
+        return Result([])
+
+    async def commit(self) -> None:
+        self.statements.append(("COMMIT", None))
+
+
+def test_maintain_partitions():
+    today = datetime.date(2026, 10, 19)
+    db = PartitionedSession(
+        [
+            "otp_default",
+            "otp_p20261010",
+            "otp_p20261011",
+            "otp_p20261012",
+            "otp_p20261019",
+            "otp_p20261020",
+        ],
+        in_default={datetime.date(2026, 10, 23)},
+    )
+    created, dropped = asyncio.run(crud.otp.maintain_partitions(db, today=today))
+    assert (created, dropped) == (5, 2)
+
+    lock_timeout = f"SET LOCAL lock_timeout = {settings.OTP_PARTITION_LOCK_TIMEOUT_MS}"
+    writes = [
+        sql
+        for sql, _ in db.statements
+        if not sql.startswith(("SELECT", "SET LOCAL", "COMMIT"))
+    ]
+    assert writes == [
+        'DROP TABLE "otp_p20261010"',
+        'DROP TABLE "otp_p20261011"',
+        "DELETE FROM otp_default WHERE created_at < :cutoff",
+        *(
+            f'CREATE TABLE "otp_p202610{day}" PARTITION OF otp'
+            + f" FOR VALUES FROM ('2026-10-{day}T00:00:00+00:00')"
+            + f" TO ('2026-10-{day + 1}T00:00:00+00:00')"
+            for day in (21, 22, 24, 25, 26)
+        ),
+    ]
+    # every DDL statement runs in its own transaction, after the lock timeout
+    for i, (sql, params) in enumerate(db.statements):
+        if sql.startswith(("DROP", "CREATE")):
+            assert db.statements[i - 1][0] == lock_timeout
+            assert db.statements[i + 1][0] == "COMMIT"
+        if sql.startswith("DELETE"):
+            assert params == {"cutoff": datetime.datetime(2026, 10, 12, tzinfo=UTC)}
+    assert [sql for sql, _ in db.statements].count("COMMIT") == 8
@@ -0,0 +1,91 @@
+"""The :mod:`app.tests.test_otp_store.` module contains tests for the key-value OTP
+store
+"""
+# Author: Christopher Dare
+
+### Test cases
+# OTPs are found by user, type and code, and a user's latest OTP without a code
+# Password reset tokens are found by their code alone
+# OTPs can only be used once
+# OTPs are not returned once they expire, and their keys expire with them
+
+import asyncio
+import datetime
+import uuid
+
+from app import models
+from app.core.cache import TTLCache
+from app.core.otp_store import KeyValueOTPStore
+
+
+def make_otp(token_type=models.OTPTypeChoice.USER_VERIFICATION, code="123456"):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return models.OTP(
+        user_id=uuid.uuid4(),
+        token_type=token_type,
+        code=code,
+        created_at=now,
+        expires_at=now + datetime.timedelta(minutes=15),
+    )
+
+
+def test_otps_are_found_by_user_type_and_code():
+    store = KeyValueOTPStore(TTLCache())
+    otp = make_otp()
+    asyncio.run(store.add(otp))
+    found = asyncio.run(
+        store.get(token_type=otp.token_type, user_id=otp.user_id, code="123456")
+    )
+    assert (found.uuid, found.user_id, found.expires_at) == (
+        otp.uuid,
+        otp.user_id,
+        otp.expires_at,
+    )
+    latest = asyncio.run(store.get(token_type=otp.token_type, user_id=otp.user_id))
+    assert latest.uuid == otp.uuid
+    assert not asyncio.run(
+        store.get(token_type=otp.token_type, user_id=otp.user_id, code="654321")
+    )
+    assert not asyncio.run(
+        store.get(token_type=models.OTPTypeChoice.PASSWORD_RESET, user_id=otp.user_id)
+    )
+    # verification codes are not unique, so they need a user
+    assert not asyncio.run(store.get(token_type=otp.token_type, code="123456"))
+
+
+def test_password_reset_tokens_are_found_by_code():
+    store = KeyValueOTPStore(TTLCache())
+    token = str(uuid.uuid4())
+    otp = make_otp(models.OTPTypeChoice.PASSWORD_RESET, code=token)
+    asyncio.run(store.add(otp))
+    found = asyncio.run(store.get(token_type=otp.token_type, code=token))
+    assert found.user_id == otp.user_id
+
+
+def test_otps_can_only_be_used_once():
+    store = KeyValueOTPStore(TTLCache())
+    otp = make_otp()
+    asyncio.run(store.add(otp))
+    assert asyncio.run(store.consume(otp))
+    assert otp.is_used
+    assert not asyncio.run(store.consume(otp))
+    assert not asyncio.run(store.get(token_type=otp.token_type, user_id=otp.user_id))
+
+
+def test_otps_expire():
+    now = [0.0]
+    store = KeyValueOTPStore(TTLCache(clock=lambda: now[0]))
+    otp = make_otp()
+    asyncio.run(store.add(otp))
+    valid_until = otp.expires_at + datetime.timedelta(seconds=1)
+    assert not asyncio.run(
+        store.get(
+            token_type=otp.token_type, user_id=otp.user_id, valid_until=valid_until
+        )
+    )
+    now[0] += 15 * 60 + 1
+    assert not asyncio.run(store.get(token_type=otp.token_type, user_id=otp.user_id))
+    assert not asyncio.run(
+        store.get(token_type=otp.token_type, user_id=otp.user_id, code="123456")
+    )
+    assert not store.client.data
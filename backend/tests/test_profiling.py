@@ -0,0 +1,60 @@
+"""The :mod:`app.tests.test_profiling.` module contains tests for the sampling profiles
+of slow requests
+"""
+# Author: Christopher Dare
+
+### Test cases
+# The profiler samples the stacks of the threads it is started on, on and off CPU
+# Profiles are kept in a bounded directory, and only looked up by name
+# Slow requests are profiled, and profiles are only listed to superusers
+
+import json
+import threading
+import time
+
+from app.core.config import settings
+from app.core.profiling import ProfileStore, SamplingProfiler
+
+
+def busy(seconds: float) -> None:
+    ends = time.monotonic() + seconds
+    while time.monotonic() < ends:
+        sum(range(1000))
+
+
+def test_profiler_samples_wall_and_cpu_time():
+    profiler = SamplingProfiler(interval=0.001)
+    ident = threading.get_ident()
+    started = time.monotonic()
+    profiler.start(ident)
+    busy(0.1)
+    time.sleep(0.1)
+    profiler.stop(ident)
+    profile = profiler.collect(started, time.monotonic())
+    assert any("test_profiling:busy" in stack for stack in profile["cpu"])
+    # sleeping is wall clock time, not CPU time
+    assert sum(profile["wall"].values()) > sum(profile["cpu"].values())
+    assert not profiler.active.is_set()
+
+
+def test_profile_store_is_bounded(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    for i in range(3):
+        store.save(f"2024010{i}T000000-1-GET-v1-wallets-10ms.json", {"i": i})
+    assert [json.loads(path.read_text())["i"] for path in store.list()] == [2, 1]
+    assert store.get("20240102T000000-1-GET-v1-wallets-10ms.json")
+    assert store.get("20240100T000000-1-GET-v1-wallets-10ms.json") is None
+    assert store.get("../secrets.json") is None
+
+
+def test_slow_requests_are_profiled(test_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILE_SLOW_REQUEST_SECONDS", 0)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    assert test_client.get("/").status_code == 200
+    (path,) = ProfileStore(str(tmp_path), max_files=1).list()
+    profile = json.loads(path.read_text())
+    assert profile["route"] == "GET /"
+    assert set(profile) >= {"wall", "cpu", "duration_ms", "started_at"}
+    # profiles are only listed to authenticated superusers
+    assert test_client.get("/v1/profiles/").status_code == 401
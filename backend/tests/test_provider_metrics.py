@@ -0,0 +1,107 @@
+"""The :mod:`app.tests.test_provider_metrics.` module contains tests for the metrics and
+retries of calls to outside providers
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Responses and errors are classified by status class
+# Calls which never connected to the provider are retried; timeouts and lost
+# connections of sends, which may have reached the provider, are not
+# Idempotent calls (Paystack lookups) are retried on 5xx responses
+
+import asyncio
+
+import httpx
+import pytest
+import requests
+from app.core.config import settings
+from app.core.provider_metrics import call_provider, get_status_class
+from app.utils import bank
+from prometheus_client import REGISTRY
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TwilioError(Exception):
+    status = 429
+
+
+def test_status_classes():
+    assert get_status_class(httpx.Response(201)) == "2xx"
+    assert get_status_class(httpx.Response(503)) == "5xx"
+    assert get_status_class(object()) == "2xx"
+    assert get_status_class(error=requests.ReadTimeout()) == "timeout"
+    assert get_status_class(error=TwilioError()) == "4xx"
+    assert get_status_class(error=ValueError()) == "error"
+
+
+def test_only_unsent_calls_are_retried(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BACKOFF_SECONDS", 0)
+    attempts = []
+
+    def send():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise requests.ConnectTimeout()
+        return httpx.Response(200)
+
+    retries = get_sample("provider_request_retries_total", provider="t", operation="a")
+    assert call_provider("t", "a", send).status_code == 200
+    assert len(attempts) == 2
+    assert get_sample(
+        "provider_request_retries_total", provider="t", operation="a"
+    ) == (retries + 1)
+
+    def time_out():
+        attempts.append(1)
+        raise requests.ReadTimeout()
+
+    attempts.clear()
+    timeouts = get_sample(
+        "provider_request_timeouts_total", provider="t", operation="b"
+    )
+    with pytest.raises(requests.ReadTimeout):
+        call_provider("t", "b", time_out)
+    # the provider may have received the message: sending it again could send it twice
+    assert len(attempts) == 1
+    assert get_sample(
+        "provider_request_timeouts_total", provider="t", operation="b"
+    ) == (timeouts + 1)
+
+    def disconnect():
+        attempts.append(1)
+        raise requests.ConnectionError("Connection aborted.")
+
+    attempts.clear()
+    with pytest.raises(requests.ConnectionError):
+        call_provider("t", "c", disconnect)
+    assert len(attempts) == 1
+    attempts.clear()
+    with pytest.raises(requests.ConnectionError):
+        call_provider("t", "c", disconnect, idempotent=True, max_retries=2)
+    assert len(attempts) == 3
+
+
+def test_idempotent_calls_are_retried_on_server_errors(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BACKOFF_SECONDS", 0)
+    statuses = [502, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            statuses.pop(0), json={"status": True, "data": []}, request=request
+        )
+
+    monkeypatch.setattr(
+        bank,
+        "get_paystack_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    labels = {"provider": "paystack", "operation": "get_bank_list"}
+    errors = get_sample("provider_request_seconds_count", status_class="5xx", **labels)
+    assert asyncio.run(bank.get_bank_list(country="ghana")) == []
+    assert statuses == []
+    assert get_sample(
+        "provider_request_seconds_count", status_class="5xx", **labels
+    ) == (errors + 1)
@@ -0,0 +1,86 @@
+"""The :mod:`app.tests.test_query_metrics.` module contains tests for the per-request
+SQL statement metrics and query budgets
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Statements differing only in their parameters have the same shape
+# Requests over the query budget, or repeating a statement, are reported
+# Request statements are observed in the histograms of their route
+# In "raise" mode, the statement putting a request over budget fails it
+
+import pytest
+from app.api import deps
+from app.core.config import settings
+from app.core.query_metrics import (
+    QueryBudgetExceeded,
+    QueryStats,
+    get_statement_shape,
+    instrument_engine,
+)
+from app.core.session import async_db_url
+from app.main import app
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+
+@pytest.fixture
+def client(test_client):
+    """The test client, with database sessions which do not share connections with
+    other test clients (and their event loops)"""
+    engine = create_async_engine(async_db_url, poolclass=NullPool)
+    instrument_engine(engine.sync_engine)
+
+    async def get_async_db():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+
+    app.dependency_overrides[deps.get_async_db] = get_async_db
+    yield test_client
+    app.dependency_overrides.pop(deps.get_async_db)
+
+
+def test_statement_shapes_collapse_parameters():
+    assert get_statement_shape(
+        "SELECT wallets.uuid FROM wallets\n WHERE wallets.owner_id = $1::UUID"
+    ) == get_statement_shape(
+        "SELECT wallets.uuid FROM wallets WHERE wallets.owner_id = $2::UUID"
+    )
+    assert get_statement_shape(
+        "SELECT * FROM users WHERE users.uuid IN ($1, $2, $3)"
+    ) == get_statement_shape("SELECT * FROM users WHERE users.uuid IN ($1)")
+
+
+def test_stats_report_budget_violations(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET", 5)
+    monkeypatch.setattr(settings, "SQL_REPEATED_STATEMENT_LIMIT", 2)
+    stats = QueryStats("GET /v1/wallets/")
+    stats.record("SELECT * FROM users WHERE uuid = $1", 0.01)
+    stats.record("SELECT * FROM wallets WHERE owner_id = $1", 0.2)
+    assert stats.get_violations() == []
+    assert stats.slowest_seconds == 0.2
+    for i in range(4):
+        stats.record(f"SELECT * FROM wallets WHERE owner_id = ${i + 1}", 0.01)
+    assert stats.count == 6
+    violations = stats.get_violations()
+    assert len(violations) == 2
+    assert "over the budget of 5" in violations[0]
+    assert "the same statement 5 times" in violations[1]
+
+
+def test_request_statements_are_observed(client):
+    labels = {"route": "GET /v1/auth/check-user-status"}
+    before = REGISTRY.get_sample_value("http_request_db_queries_count", labels) or 0
+    client.get("/v1/auth/check-user-status", params={"mobile": "+233200000001"})
+    assert REGISTRY.get_sample_value("http_request_db_queries_count", labels) == (
+        before + 1
+    )
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", labels) >= 1
+
+
+def test_raise_mode_fails_requests_over_budget(client, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET_MODE", "raise")
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET", 0)
+    with pytest.raises(QueryBudgetExceeded, match="check-user-status"):
+        client.get("/v1/auth/check-user-status", params={"mobile": "+233200000001"})
@@ -0,0 +1,152 @@
+"""The :mod:`app.tests.test_rate_limit.` module contains tests for the token bucket
+rate limiter
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Buckets allow bursts, then refill at their rate
+# Requests over the limit are rejected with a 429 and a Retry-After header
+# Every key of a request is limited separately
+# The client IP is read from X-Forwarded-For entries added by trusted proxies only
+# OTPs are limited per user and per the mobile or email they are sent to
+# While the backend is unavailable, requests are let through or answered with a 503
+
+import asyncio
+import uuid
+
+import pytest
+from app import crud, models
+from app.api.api_v1.endpoints import auth
+from app.core.config import settings
+from app.core.rate_limit import (
+    InMemoryTokenBuckets,
+    RateLimit,
+    get_client_ip,
+    rate_limit,
+    take_token,
+)
+from app.utils import ModeOfMessageDelivery
+from fastapi import HTTPException, Request
+
+
+def get_request(client: str, *forwarded: str) -> Request:
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "client": (client, 1234), "headers": headers})
+
+
+def test_buckets_allow_bursts_then_refill():
+    limit = RateLimit(burst=2, per_minute=6)
+    tokens, retry_after = take_token(2, 0, 0, limit)
+    assert (tokens, retry_after) == (1, 0)
+    tokens, retry_after = take_token(tokens, 0, 0, limit)
+    assert (tokens, retry_after) == (0, 0)
+    tokens, retry_after = take_token(tokens, 0, 0, limit)
+    assert (tokens, retry_after) == (0, 10)
+    # a token every 10 seconds, up to the burst
+    assert take_token(tokens, 0, 10, limit) == (0, 0)
+    assert take_token(tokens, 0, 3600, limit) == (1, 0)
+
+
+def test_requests_over_the_limit_are_rejected():
+    now = [0.0]
+    buckets = InMemoryTokenBuckets(clock=lambda: now[0])
+    keys = [("ip", "10.0.0.1", RateLimit(burst=1, per_minute=2))]
+    asyncio.run(rate_limit("otp", keys, buckets=buckets))
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(rate_limit("otp", keys, buckets=buckets))
+    assert e.value.status_code == 429
+    assert e.value.headers == {"Retry-After": "30"}
+    now[0] += 30
+    asyncio.run(rate_limit("otp", keys, buckets=buckets))
+
+
+def test_keys_are_limited_separately():
+    buckets = InMemoryTokenBuckets(clock=lambda: 0.0)
+    limit = RateLimit(burst=1, per_minute=1)
+    asyncio.run(rate_limit("otp", [("ip", "10.0.0.1", limit)], buckets=buckets))
+    asyncio.run(rate_limit("otp", [("ip", "10.0.0.2", limit)], buckets=buckets))
+    asyncio.run(rate_limit("login", [("ip", "10.0.0.1", limit)], buckets=buckets))
+    asyncio.run(
+        rate_limit(
+            "otp",
+            [("ip", "10.0.0.3", limit), ("destination", "a@b.com", limit)],
+            buckets=buckets,
+        )
+    )
+    # a new IP does not get around the limit of a destination
+    with pytest.raises(HTTPException):
+        asyncio.run(
+            rate_limit(
+                "otp",
+                [("ip", "10.0.0.4", limit), ("destination", "a@b.com", limit)],
+                buckets=buckets,
+            )
+        )
+
+
+def test_client_ip_is_forwarded_by_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+    assert get_client_ip(get_request("203.0.113.7")) == "203.0.113.7"
+    # the proxy of the API, in front of another trusted proxy
+    assert get_client_ip(get_request("10.0.0.2", "203.0.113.7, 10.0.0.9")) == (
+        "203.0.113.7"
+    )
+    # entries before the first untrusted hop could be sent by the client itself
+    assert get_client_ip(get_request("10.0.0.2", "1.2.3.4, 203.0.113.7")) == (
+        "203.0.113.7"
+    )
+    assert get_client_ip(get_request("10.0.0.2", "1.2.3.4", "203.0.113.7")) == (
+        "203.0.113.7"
+    )
+    # nor are the headers of clients reaching the API directly trusted
+    assert get_client_ip(get_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+    assert get_client_ip(get_request("10.0.0.2", "unknown, 10.0.0.9")) == "unknown"
+
+
+def test_otps_are_limited_per_user_and_destination(monkeypatch):
+    user = models.User(
+        uuid=uuid.uuid4(), email="Ama@example.com", mobile="+233244000000"
+    )
+    limited = []
+
+    async def rate_limit(scope, keys):
+        limited.extend((name, value) for name, value, _ in keys)
+        # past the limit of the user, before any OTP is created
+        if limited[-1][0] == "destination":
+            raise HTTPException(status_code=429)
+
+    async def get_by_email(db, email):
+        return user
+
+    monkeypatch.setattr(auth, "rate_limit", rate_limit)
+    monkeypatch.setattr(crud.user, "get_by_email", get_by_email)
+    for mode, destination in [
+        (ModeOfMessageDelivery.SMS, "+233244000000"),
+        (ModeOfMessageDelivery.EMAIL, "ama@example.com"),
+    ]:
+        limited.clear()
+        otp_in = models.OTPCreate(email=user.email, mode=mode)
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(auth.generate_otp(get_request("203.0.113.7"), otp_in, None))
+        assert e.value.status_code == 429
+        assert limited == [
+            ("ip", "203.0.113.7"),
+            ("user", str(user.uuid)),
+            ("destination", destination),
+        ]
+
+
+class UnavailableTokenBuckets(InMemoryTokenBuckets):
+    async def take(self, key, limit):
+        raise ConnectionError("Connection refused")
+
+
+def test_unavailable_backend_fails_open_or_closed(monkeypatch):
+    keys = [("ip", "10.0.0.1", RateLimit(burst=1, per_minute=1))]
+    buckets = UnavailableTokenBuckets()
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIL_OPEN", True)
+    asyncio.run(rate_limit("login", keys, buckets=buckets))
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIL_OPEN", False)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(rate_limit("login", keys, buckets=buckets))
+    assert e.value.status_code == 503
@@ -0,0 +1,110 @@
+"""The :mod:`app.tests.test_response_cache.` module contains tests for the per-user
+response cache
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Responses are cached until one of their tags is invalidated
+# Only successful responses are cached
+# Tags marked on a session are invalidated once it commits
+# Responses are rendered, and invalidations dropped, while the backend is unavailable
+
+import asyncio
+
+from app.core.cache import TTLCache
+from app.core.response_cache import (
+    ResponseCache,
+    commit,
+    invalidate_on_commit,
+    wallets_tag,
+)
+from app.core.responses import FastJSONResponse
+
+
+class Renderer:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return FastJSONResponse({"calls": self.calls}, status_code=self.status_code)
+
+
+def test_responses_are_cached_until_invalidated():
+    cache = ResponseCache(TTLCache())
+    render = Renderer()
+    tags = [wallets_tag("user-1")]
+    miss = asyncio.run(cache.get_or_render("user-1:/wallets", tags, render))
+    hit = asyncio.run(cache.get_or_render("user-1:/wallets", tags, render))
+    assert (miss.headers["X-Cache"], hit.headers["X-Cache"]) == ("MISS", "HIT")
+    assert hit.body == miss.body == b'{"calls":1}'
+    # other users and other query parameters are cached separately
+    asyncio.run(cache.get_or_render("user-2:/wallets", tags, render))
+    assert render.calls == 2
+    asyncio.run(cache.invalidate(wallets_tag("user-2")))
+    asyncio.run(cache.get_or_render("user-1:/wallets", tags, render))
+    assert render.calls == 2
+    asyncio.run(cache.invalidate(wallets_tag("user-1")))
+    response = asyncio.run(cache.get_or_render("user-1:/wallets", tags, render))
+    assert response.body == b'{"calls":3}'
+
+
+def test_only_successful_responses_are_cached():
+    cache = ResponseCache(TTLCache())
+    render = Renderer(status_code=404)
+    asyncio.run(cache.get_or_render("user-1:/wallets", [], render))
+    asyncio.run(cache.get_or_render("user-1:/wallets", [], render))
+    assert render.calls == 2
+
+
+class UnavailableClient:
+    async def fail(self, *args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    mget = get = set = delete = fail
+
+
+class ReadOnlyClient(TTLCache):
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+
+def test_responses_are_rendered_while_the_backend_is_unavailable():
+    tags = [wallets_tag("user-1")]
+    render = Renderer()
+    cache = ResponseCache(UnavailableClient())
+    response = asyncio.run(cache.get_or_render("user-1:/wallets", tags, render))
+    assert (response.status_code, response.headers["X-Cache"]) == (200, "BYPASS")
+    asyncio.run(cache.invalidate(*tags))
+    # responses rendered once versions were read are still returned
+    cache = ResponseCache(ReadOnlyClient())
+    response = asyncio.run(cache.get_or_render("user-1:/wallets", [], render))
+    assert (response.body, response.headers["X-Cache"]) == (b'{"calls":2}', "MISS")
+
+
+class Session:
+    def __init__(self):
+        self.info = {}
+        self.committed = False
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_tags_are_invalidated_on_commit(monkeypatch):
+    invalidated = []
+
+    async def invalidate(*tags):
+        invalidated.extend(tags)
+
+    monkeypatch.setattr("app.core.response_cache.invalidate", invalidate)
+    db = Session()
+    invalidate_on_commit(db, wallets_tag("user-1"), wallets_tag("user-2"))
+    invalidate_on_commit(db, wallets_tag("user-1"))
+    assert not invalidated
+    asyncio.run(commit(db))
+    assert db.committed
+    assert sorted(invalidated) == [wallets_tag("user-1"), wallets_tag("user-2")]
+    asyncio.run(commit(db))
+    assert len(invalidated) == 2
@@ -0,0 +1,89 @@
+"""The :mod:`app.tests.test_responses.` module contains tests for the API's JSON response class
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Monetary amounts must be rendered exactly as jsonable_encoder renders them
+# Both JSON backends must produce identical output
+# Trusted ORM projections must render the same body as validated response models
+# ETags change with the object's version and match If-None-Match weakly
+
+import datetime
+import json
+import uuid as uuid_pkg
+from decimal import Decimal
+
+import pytest
+from app import models
+from app.core.responses import FastJSONResponse, dumps, etag_matches, make_etag, project
+from app.schemas import WalletCurrencyType
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+PAYLOAD = {
+    "uuid": uuid_pkg.UUID("8f7f1b9c-3b5e-4f8e-9f3a-0c7d1e2f3a4b"),
+    "balance": Decimal("1520.50"),
+    "deductible": Decimal("100"),
+    "coinsurance": Decimal("0.05"),
+    "copay_amount": Decimal("0.00"),
+    "currency": WalletCurrencyType.GHS,
+    "created_at": datetime.datetime(2024, 1, 2, 3, 4, 5, 678, datetime.timezone.utc),
+    "birth_date": datetime.date(1990, 5, 17),
+    "owner_name": "Kwame Nkrumah",
+}
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_money_formatting_matches_jsonable_encoder(backend):
+    expected = JSONResponse(jsonable_encoder(PAYLOAD)).body
+    assert dumps(PAYLOAD, backend=backend) == expected
+    assert json.loads(expected)["deductible"] == 100
+    assert b'"balance":1520.5,' in expected
+
+
+def test_pre_encoded_content_renders_identically():
+    content = jsonable_encoder(PAYLOAD)
+    assert FastJSONResponse(content).body == JSONResponse(content).body
+
+
+def test_trusted_projection_matches_validated_response():
+    wallet = models.Wallet(
+        uuid=PAYLOAD["uuid"],
+        status="active",
+        balance=PAYLOAD["balance"],
+        currency=WalletCurrencyType.GHS.value,
+        description="",
+        managing_organization_id=uuid_pkg.uuid4(),
+        managing_organization_name="Serenity Health",
+        policy_id=uuid_pkg.uuid4(),
+        policy_name="Default",
+        owner_id=uuid_pkg.uuid4(),
+        owner_name=PAYLOAD["owner_name"],
+        owner_mobile="+233506409457",
+        contribution_type="coinsurance",
+        coinsurance=PAYLOAD["coinsurance"],
+        copay_amount=PAYLOAD["copay_amount"],
+        deductible=PAYLOAD["deductible"],
+        out_of_pocket_limit=Decimal("5000.00"),
+    )
+    validated = jsonable_encoder(models.WalletRead.from_orm(wallet))
+    trusted = project(wallet, models.WalletRead)
+    assert FastJSONResponse(trusted).body == JSONResponse(validated).body
+
+
+def make_request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_etags_match_if_none_match():
+    uuid, updated_at = PAYLOAD["uuid"], PAYLOAD["created_at"]
+    etag = make_etag(uuid, updated_at)
+    assert etag.startswith('W/"') and etag == make_etag(uuid, updated_at)
+    assert etag != make_etag(uuid, updated_at + datetime.timedelta(microseconds=1))
+    assert etag_matches(make_request(etag), etag)
+    assert etag_matches(make_request(f'"other", {etag[2:]}'), etag)
+    assert etag_matches(make_request("*"), etag)
+    assert not etag_matches(make_request('W/"other"'), etag)
+    assert not etag_matches(make_request(), etag)
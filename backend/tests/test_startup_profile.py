@@ -0,0 +1,81 @@
+"""The :mod:`app.tests.test_startup_profile.` module contains tests for the startup
+import profile of the API
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Self import time is summed by top level package, ignoring the header and noise
+# Lazy modules are probed apart, so their import time is not charged to startup
+# The budget check reports slow, heavy and eager imports, and exits non zero
+
+from app import startup_profile
+from app.startup_profile import check_budget, parse_importtime, profile_startup
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | encodings
+import time:      1500 |       1500 |     sqlalchemy.util
+import time:      2500 |       4000 |   sqlalchemy
+import time:       700 |        700 | app.core.config
+some warning printed to stderr
+"""
+
+
+def get_report(**overrides) -> dict:
+    return {
+        "target": "app.main",
+        "import_ms": 900.0,
+        "import_rss_mb": 60.0,
+        "baseline_rss_mb": 13.0,
+        "packages": [],
+        "lazy_modules": [
+            {
+                "module": "numpy",
+                "ms": 50.0,
+                "rss_mb": 15.0,
+                "eager": False,
+                "error": None,
+            }
+        ],
+        **overrides,
+    }
+
+
+def test_parse_importtime():
+    assert parse_importtime(IMPORTTIME_OUTPUT) == {
+        "_io": 120,
+        "encodings": 300,
+        "sqlalchemy": 4000,
+        "app": 700,
+    }
+    assert parse_importtime("") == {}
+
+
+def test_lazy_modules_are_not_charged_to_startup():
+    # json does not import decimal, which is only loaded by the laziness probe
+    report = profile_startup(target="json", lazy_modules=["decimal"])
+    packages = [row["package"] for row in report["packages"]]
+    assert "json" in packages
+    assert "decimal" not in packages and "_pydecimal" not in packages
+    assert report["lazy_modules"][0]["module"] == "decimal"
+    assert not report["lazy_modules"][0]["eager"]
+
+
+def test_budget_check(monkeypatch, capsys):
+    assert check_budget(get_report(), budget_ms=1000, budget_mb=100) == []
+    assert check_budget(get_report(import_ms=5000.0, import_rss_mb=500.0)) == []
+    eager = {"module": "numpy", "ms": 0.0, "rss_mb": 0.0, "eager": True, "error": None}
+    assert check_budget(
+        get_report(import_ms=1200.0, lazy_modules=[eager]), budget_ms=1000
+    ) == ["import time 1200.0 ms exceeds 1000 ms", "numpy is imported eagerly"]
+    assert check_budget(get_report(), budget_mb=50) == [
+        "import memory 60.0 MB exceeds 50 MB"
+    ]
+
+    monkeypatch.setattr(
+        startup_profile, "profile_startup", lambda **kwargs: get_report()
+    )
+    assert startup_profile.main(["--budget-ms", "1000", "--json"]) == 0
+    assert startup_profile.main(["--budget-ms", "500"]) == 1
+    assert "import time 900.0 ms exceeds 500.0 ms" in capsys.readouterr().err
@@ -0,0 +1,60 @@
+"""The :mod:`app.tests.test_tracing.` module contains tests for the in-process spans
+breaking down request latency
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Spans outside of a trace do nothing
+# Sampled traces dump their spans in order, with their nesting
+# CRUD methods and dependencies are observed as spans of their route
+
+import asyncio
+import json
+
+from app import crud
+from app.core.tracing import Trace, current_trace, span, traced
+from prometheus_client import REGISTRY
+
+
+@traced("test.outer")
+async def outer():
+    with span("test.inner"):
+        return 42
+
+
+def test_spans_outside_traces_do_nothing():
+    assert current_trace.get() is None
+    assert asyncio.run(outer()) == 42
+
+
+def test_sampled_traces_dump_nested_spans():
+    trace = Trace(sampled=True)
+    token = current_trace.set(trace)
+    try:
+        assert asyncio.run(outer()) == 42
+    finally:
+        current_trace.reset(token)
+    dump = json.loads(trace.dump())
+    # spans are recorded as they end, so inner spans come first
+    assert [(s["name"], s["depth"]) for s in dump["spans"]] == [
+        ("test.inner", 1),
+        ("test.outer", 0),
+    ]
+    inner, outer_span = dump["spans"]
+    assert outer_span["duration_ms"] >= inner["duration_ms"]
+
+
+def test_crud_methods_and_dependencies_are_spans(test_client):
+    # CRUD classes trace their methods, keeping them coroutine functions
+    assert asyncio.iscoroutinefunction(crud.user.get_by_email_or_mobile)
+    assert crud.user.get_by_email_or_mobile.__wrapped__
+
+    labels = {"route": "GET /v1/users/me", "span": "deps.get_current_user"}
+    before = REGISTRY.get_sample_value("http_request_span_seconds_count", labels) or 0
+    response = test_client.get(
+        "/v1/users/me", headers={"Authorization": "Bearer not-a-token"}
+    )
+    assert response.status_code == 403
+    assert REGISTRY.get_sample_value("http_request_span_seconds_count", labels) == (
+        before + 1
+    )
@@ -0,0 +1,40 @@
+"""The :mod:`app.tests.test_wallet_accumulator.` module contains tests for wallet
+deductible and out-of-pocket accumulators
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Plan years roll over on the first day of the configured start month
+# Bill settlements reject negative amounts and quantize amounts
+
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from app.models import BillSettlementCreate
+from app.utils import get_plan_period
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize(
+    "day, start_month, period",
+    [
+        ("2022-01-01", 1, ("2022-01-01", "2022-12-31")),
+        ("2022-12-31", 1, ("2022-01-01", "2022-12-31")),
+        ("2022-06-30", 7, ("2021-07-01", "2022-06-30")),
+        ("2022-07-01", 7, ("2022-07-01", "2023-06-30")),
+        ("2024-02-29", 3, ("2023-03-01", "2024-02-29")),
+    ],
+)
+def test_plan_period_rolls_over_on_start_month(day, start_month, period):
+    day = datetime.date.fromisoformat(day)
+    start, end = (datetime.date.fromisoformat(d) for d in period)
+    assert get_plan_period(day, start_month) == (start, end)
+
+
+def test_bill_settlement_amounts_are_validated():
+    bill = BillSettlementCreate(reference="B-1", wallet_id=uuid.uuid4(), amount="10.5")
+    assert bill.amount == Decimal("10.50")
+    with pytest.raises(ValidationError):
+        BillSettlementCreate(reference="B-2", wallet_id=uuid.uuid4(), amount="-1")
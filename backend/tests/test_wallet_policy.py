@@ -0,0 +1,256 @@
+"""The :mod:`app.tests.test_wallet_policy.` module contains tests for applying healthcare
+policies to wallets
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Applying a policy copies the terms of its contribution type and clears the other
+# Bulk application walks the wallets in keyset chunks, one UPDATE ... FROM per chunk,
+# which only rewrites wallets whose terms differ from the policy's
+# Chunks whose wallets stay locked are rolled back to a savepoint, skipped and counted
+# A policy edit and the propagation of its terms are committed together, or not at all
+# Propagations left pending are claimed once stale, to be sent again
+# Policy names are unique per organization only, so every organization has a "Default"
+
+import asyncio
+import contextlib
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Any, List
+
+import pytest
+import sqlalchemy as sa
+from app import crud, models
+from app.schemas import PaymentContributionType, WalletCurrencyType
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+
+
+def make_policy(contribution_type: PaymentContributionType) -> models.WalletPolicy:
+    return models.WalletPolicy(
+        uuid=uuid.uuid4(),
+        name="Gold",
+        managing_organization_id=uuid.uuid4(),
+        currency=WalletCurrencyType.GHS,
+        contribution_type=contribution_type,
+        coinsurance=Decimal("0.20"),
+        copay_amount=Decimal("15.00"),
+        deductible=Decimal("100.00"),
+        out_of_pocket_limit=Decimal("900.00"),
+    )
+
+
+def test_policy_values_follow_contribution_type():
+    copay = make_policy(PaymentContributionType.COPAY)
+    values = crud.wallet.get_policy_values(copay)
+    assert values["coinsurance"] is None
+    assert values["copay_amount"] == Decimal("15.00")
+    assert (values["policy_id"], values["policy_name"]) == (copay.uuid, "Gold")
+
+    values = crud.wallet.get_policy_values(
+        make_policy(PaymentContributionType.COINSURANCE)
+    )
+    assert values["coinsurance"] == Decimal("0.20")
+    assert values["copay_amount"] is None
+    assert values["deductible"] == Decimal("100.00")
+
+
+class Result:
+    def __init__(self, rows: List[Any]):
+        self.rows = rows
+
+    def all(self) -> List[Any]:
+        return self.rows
+
+    def scalars(self) -> "Result":
+        return self
+
+    def scalar_one(self) -> Any:
+        (row,) = self.rows
+        return row
+
+
+class RecordingSession:
+    """Records the statements executed and the session calls made, answering the
+    selects with `chunks` (raising those which are errors) and the updates with the
+    owners of every wallet of the last chunk, or the next of `update_errors`"""
+
+    def __init__(self, chunks: List[Any], update_errors: List[Any] = None):
+        self.chunks = chunks
+        self.update_errors = update_errors or []
+        self.statements: List[Any] = []
+        self.calls: List[str] = []
+        self.added: List[Any] = []
+        self.info = {}
+        self.chunk: List[Any] = []
+
+    def add(self, obj: Any) -> None:
+        self.calls.append("add")
+        self.added.append(obj)
+
+    async def commit(self) -> None:
+        self.calls.append("commit")
+
+    async def rollback(self) -> None:
+        self.calls.append("rollback")
+
+    async def refresh(self, obj: Any) -> None:
+        self.calls.append("refresh")
+
+    @contextlib.asynccontextmanager
+    async def begin_nested(self):
+        self.calls.append("savepoint")
+        try:
+            yield
+        except Exception:
+            self.calls.append("rollback to savepoint")
+            raise
+        self.calls.append("release savepoint")
+
+    async def execute(self, statement, *args, **kwargs) -> Result:
+        self.calls.append("execute")
+        self.statements.append(statement)
+        if isinstance(statement, sa.sql.Select):
+            self.chunk = self.chunks.pop(0)
+            if isinstance(self.chunk, Exception):
+                raise self.chunk
+            return Result(self.chunk)
+        if isinstance(statement, sa.sql.Update):
+            error = self.update_errors.pop(0) if self.update_errors else None
+            if error is not None:
+                raise error
+            return Result([uuid.uuid4() for _ in self.chunk])
+        return Result([])
+
+
+def compile_statement(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_bulk_application_runs_keyset_chunks():
+    policy = make_policy(PaymentContributionType.COPAY)
+    db = RecordingSession(
+        [[(1, "GHS"), (2, "NGN")], [(5, "GHS"), (9, "GHS")], [(12, "GHS")]]
+    )
+    report = asyncio.run(
+        crud.wallet.apply_policy_bulk(db, policy_obj=policy, batch_size=2, commit=False)
+    )
+    # the last chunk is short, so no further chunk is selected
+    assert db.chunks == []
+    assert (report.matched, report.updated, report.currency_mismatch) == (5, 5, 1)
+
+    selects = [s for s in db.statements if isinstance(s, sa.sql.Select)]
+    updates = [s for s in db.statements if isinstance(s, sa.sql.Update)]
+    assert len(selects) == len(updates) == 3
+    # every chunk starts after the last wallet of the previous one
+    assert [s.compile().params["pk_1"] for s in selects] == [0, 2, 9]
+    select = compile_statement(selects[0])
+    assert "wallets.pk > %(pk_1)s" in select
+    assert "ORDER BY wallets.pk" in select and "LIMIT %(param_1)s" in select
+
+    update = compile_statement(updates[1])
+    assert update.startswith("UPDATE wallets SET")
+    assert "FROM healthcare_policies" in update
+    assert "wallets.pk IN (__[POSTCOMPILE_pk_1])" in update
+    assert "wallets.currency = healthcare_policies.currency" in update
+    for field in ("copay_amount", "deductible", "policy_id", "policy_name"):
+        assert f"wallets.{field} IS DISTINCT FROM" in update
+    assert "RETURNING wallets.owner_id" in update
+    assert updates[1].compile().params["pk_1"] == [5, 9]
+
+
+class LockNotAvailableError(Exception):
+    sqlstate = "55P03"
+
+
+def test_bulk_application_skips_locked_chunks():
+    policy = make_policy(PaymentContributionType.COPAY)
+    chunks = [[(1, "GHS"), (2, "NGN")], [(5, "GHS"), (9, "GHS")], [(12, "GHS")]]
+    lock_timeout = DBAPIError("UPDATE wallets", {}, LockNotAvailableError())
+    db = RecordingSession(list(chunks), update_errors=[None, lock_timeout])
+    report = asyncio.run(
+        crud.wallet.apply_policy_bulk(db, policy_obj=policy, batch_size=2)
+    )
+    # the chunk after the locked one is still applied
+    assert db.chunks == []
+    assert (report.matched, report.updated, report.locked) == (5, 3, 2)
+    assert report.currency_mismatch == 1
+    assert db.calls.count("rollback to savepoint") == 1
+    assert db.calls.count("commit") == 3
+
+    # other errors are raised
+    error = DBAPIError("UPDATE wallets", {}, RuntimeError("connection lost"))
+    db = RecordingSession(list(chunks), update_errors=[error])
+    with pytest.raises(DBAPIError):
+        asyncio.run(crud.wallet.apply_policy_bulk(db, policy_obj=policy, batch_size=2))
+    assert "commit" not in db.calls
+
+
+def test_policy_edit_and_propagation_are_committed_together():
+    policy = make_policy(PaymentContributionType.COPAY)
+    # the count of wallets on the policy
+    db = RecordingSession([[4]])
+    propagation = asyncio.run(
+        crud.wallet_policy_propagation.update_policy(
+            db,
+            policy_obj=policy,
+            obj_in=models.WalletPolicyUpdate(deductible=Decimal("50.00")),
+        )
+    )
+    assert policy.deductible == Decimal("50.00")
+    assert (propagation.policy_id, propagation.total_wallets) == (policy.uuid, 4)
+    assert db.added == [policy, propagation]
+    assert db.calls == ["add", "execute", "add", "commit", "refresh"]
+
+    db = RecordingSession([RuntimeError("connection lost")])
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            crud.wallet_policy_propagation.update_policy(
+                db,
+                policy_obj=make_policy(PaymentContributionType.COPAY),
+                obj_in=models.WalletPolicyUpdate(deductible=Decimal("50.00")),
+            )
+        )
+    # the edited policy is rolled back with the propagation
+    assert "commit" not in db.calls and db.calls[-1] == "rollback"
+
+
+def test_stale_propagations_are_claimed():
+    db = RecordingSession([])
+    stale_before = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    asyncio.run(
+        crud.wallet_policy_propagation.claim_stale(db, stale_before=stale_before)
+    )
+    (statement,) = db.statements
+    claim = compile_statement(statement)
+    assert claim.startswith("UPDATE wallet_policy_propagations SET updated_at=")
+    assert "wallet_policy_propagations.status = %(status_1)s" in claim
+    assert "wallet_policy_propagations.updated_at < %(updated_at_1)s" in claim
+    assert "RETURNING wallet_policy_propagations.uuid" in claim
+    params = statement.compile().params
+    assert (params["status_1"], params["updated_at_1"]) == ("pending", stale_before)
+    assert db.calls == ["execute", "commit"]
+
+
+def test_policy_names_are_unique_per_organization():
+    table = models.WalletPolicy.__table__
+    unique_columns = {
+        tuple(column.name for column in constraint.columns)
+        for constraint in table.constraints
+        if isinstance(constraint, sa.UniqueConstraint)
+    } | {
+        tuple(column.name for column in index.columns)
+        for index in table.indexes
+        if index.unique
+    }
+    assert ("name",) not in unique_columns
+    assert ("name_chars",) not in unique_columns
+    assert ("name", "managing_organization_id") in unique_columns
+    assert ("name_chars", "managing_organization_id") in unique_columns
+    # nor are the (empty, by default) descriptions of wallets unique
+    assert not any(
+        index.unique
+        for index in models.Wallet.__table__.indexes
+        if "description" in index.columns
+    )
@@ -0,0 +1,44 @@
+"""The :mod:`app.tests.test_worker.` module contains tests for the background jobs run by
+the celery worker
+"""
+# Author: Christopher Dare
+
+### Test cases
+# Tasks run back to back in the same worker process, each in its own event loop
+# Stale wallet policy propagations are sent again
+
+import datetime
+import uuid
+
+from app import crud, worker
+from app.core.config import settings
+from sqlalchemy import text
+
+
+def test_tasks_run_back_to_back(monkeypatch):
+    async def compact(db) -> int:
+        result = await db.execute(text("SELECT 1"))
+        return result.scalar_one()
+
+    monkeypatch.setattr(crud.wallet_balance, "compact", compact)
+    # every task runs in a new event loop (asyncio.run): connections opened by one
+    # task must not be handed to the next
+    assert worker.compact_wallet_balances() == "Took 1 wallet balance snapshots"
+    assert worker.compact_wallet_balances() == "Took 1 wallet balance snapshots"
+
+
+def test_stale_propagations_are_sent_again(monkeypatch):
+    propagation_ids, claimed, sent = [uuid.uuid4(), uuid.uuid4()], [], []
+
+    async def claim_stale(db, *, stale_before) -> list:
+        claimed.append(stale_before)
+        return propagation_ids
+
+    monkeypatch.setattr(crud.wallet_policy_propagation, "claim_stale", claim_stale)
+    monkeypatch.setattr(worker.propagate_wallet_policy, "delay", sent.append)
+    assert worker.resume_wallet_policy_propagations() == (
+        "Resumed 2 wallet policy propagations"
+    )
+    assert sent == [str(propagation_id) for propagation_id in propagation_ids]
+    age = datetime.datetime.now(datetime.timezone.utc) - claimed[0]
+    assert age.total_seconds() >= settings.WALLET_POLICY_PROPAGATION_STALE_SECONDS